@@ -0,0 +1,153 @@
+import os
+import re
+import sys
+import logging
+import unicodedata
+from functools import lru_cache
+from types import MappingProxyType
+from typing import Dict, List, Mapping, Optional, Tuple
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+# CEFR levels from easiest to hardest
+CEFR_LEVELS = ("A1", "A2", "B1", "B2", "C1", "C2")
+
+# Compiled per-language indexes (<language>.tsv) and the word lists they are built from
+INDEX_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "data", "cefr")
+SOURCE_DIR = os.path.join(INDEX_DIR, "sources")
+
+def normalize_word(word: str) -> str:
+    """
+    Normalize a word the same way for building and looking up the index
+
+    Args:
+        word: The word to normalize
+
+    Returns:
+        Lowercased, NFC-normalized word
+    """
+    return unicodedata.normalize("NFC", word.strip().lower())
+
+@lru_cache(maxsize=None)
+def load_index(language: str) -> Mapping[str, str]:
+    """
+    Load the compiled CEFR index of a language (loaded once per process)
+
+    Args:
+        language: The language name (e.g. "German")
+
+    Returns:
+        Read-only mapping of normalized word to CEFR level, empty if the language has no index
+    """
+    index_file = os.path.join(INDEX_DIR, f"{language.lower()}.tsv")
+    index: Dict[str, str] = {}
+
+    if os.path.exists(index_file):
+        try:
+            with open(index_file, 'r', encoding='utf-8') as f:
+                for line in f:
+                    word, _, level = line.rstrip('\n').partition('\t')
+                    if word and level:
+                        index[word] = level
+            logger.info(f"Loaded CEFR index for {language} with {len(index)} words")
+        except Exception as e:
+            logger.error(f"Error loading CEFR index for {language}: {e}")
+
+    return MappingProxyType(index)
+
+def get_level(word: str, language: str) -> Optional[str]:
+    """
+    Get the CEFR level of a word
+
+    Args:
+        word: The word to look up
+        language: The language of the word
+
+    Returns:
+        The CEFR level, or None if the index has never seen the word
+    """
+    return load_index(language).get(normalize_word(word))
+
+def classify_words(words: List[str], language: str) -> Tuple[List[str], List[str], List[str]]:
+    """
+    Split words into A1 words, known harder words and words the index has never seen
+
+    Args:
+        words: The words to classify
+        language: The language of the words
+
+    Returns:
+        Tuple of (a1_words, uncommon_words, unseen_words), each in input order
+    """
+    index = load_index(language)
+    a1_words, uncommon_words, unseen_words = [], [], []
+
+    for word in words:
+        level = index.get(normalize_word(word))
+        if level is None:
+            unseen_words.append(word)
+        elif level == "A1":
+            a1_words.append(word)
+        else:
+            uncommon_words.append(word)
+
+    return a1_words, uncommon_words, unseen_words
+
+def build_index(source_dir: str = SOURCE_DIR, output_dir: str = INDEX_DIR) -> Dict[str, int]:
+    """
+    Compile the word lists in source_dir into one sorted index file per language
+
+    Source files are named <language>_<level>.txt and contain one word or phrase
+    per line. Phrases are split into the same tokens the translation pipeline sees,
+    and a word listed at several levels keeps the easiest one.
+
+    Args:
+        source_dir: Directory with the source word lists
+        output_dir: Directory that receives the <language>.tsv index files
+
+    Returns:
+        Dictionary mapping each language to the number of indexed words
+    """
+    indexes: Dict[str, Dict[str, str]] = {}
+
+    for file_name in sorted(os.listdir(source_dir)):
+        match = re.fullmatch(r'([a-z]+)_([abc][12])\.txt', file_name.lower())
+        if not match:
+            logger.warning(f"Skipping CEFR source file with unexpected name: {file_name}")
+            continue
+
+        language, level = match.group(1), match.group(2).upper()
+        index = indexes.setdefault(language, {})
+
+        with open(os.path.join(source_dir, file_name), 'r', encoding='utf-8') as f:
+            for line in f:
+                for word in re.findall(r'\b\w+\b', normalize_word(line)):
+                    current = index.get(word)
+                    if current is None or CEFR_LEVELS.index(level) < CEFR_LEVELS.index(current):
+                        index[word] = level
+
+    os.makedirs(output_dir, exist_ok=True)
+    counts = {}
+    for language, index in indexes.items():
+        index_file = os.path.join(output_dir, f"{language}.tsv")
+        temp_file = f"{index_file}.tmp"
+        with open(temp_file, 'w', encoding='utf-8') as f:
+            for word in sorted(index):
+                f.write(f"{word}\t{index[word]}\n")
+        os.replace(temp_file, index_file)
+        counts[language] = len(index)
+        logger.info(f"Built CEFR index for {language} with {len(index)} words")
+
+    # Drop any indexes already loaded in this process
+    load_index.cache_clear()
+    return counts
+
+if __name__ == "__main__":
+    # Usage: python cefr_index.py build [source_dir] [output_dir]
+    logging.basicConfig(level=logging.INFO)
+    if len(sys.argv) < 2 or sys.argv[1] != "build":
+        print("Usage: python cefr_index.py build [source_dir] [output_dir]")
+        sys.exit(1)
+    for language, count in build_index(*sys.argv[2:4]).items():
+        print(f"{language}: {count} words")
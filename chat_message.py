@@ -0,0 +1,116 @@
+import sys
+import time
+import logging
+from collections.abc import Mapping
+from typing import Any, Dict, Iterator, Optional, Tuple, Union
+from token_budget import estimate_tokens
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+class ChatMessage(Mapping):
+    """
+    Immutable record of one stored chat message
+
+    Memory keeps up to LONG_MEMORY_SIZE of these for every resident chat, so the
+    record uses __slots__ instead of a per-message dict, interns the role string
+    (roles loaded from JSON are otherwise one string object per message) and
+    stores the timestamp as a float. Since a record can't change, history views
+    hand out the records themselves instead of read-only copies.
+
+    The content is kept as the body given by Memory: the string itself, or
+    its lines when some of them are shared bodies from the content store, in
+    which case the content property joins them.
+
+    For the code that treats messages as dicts, a record is also a read-only
+    mapping: message["content"], message.get("tokens") and dict(message) work.
+    """
+    __slots__ = ("role", "body", "timestamp", "tokens")
+
+    # Keys of the mapping interface, in the order they are stored
+    FIELDS = ("role", "content", "timestamp", "tokens")
+
+    def __init__(self, role: str, content: Union[str, Tuple[str, ...]], timestamp: Optional[float] = None,
+                 tokens: Optional[int] = None):
+        """
+        Create a message record
+
+        Args:
+            role: Either 'user' or 'model'
+            content: The message content, or its lines (see ContentStore.intern)
+            timestamp: When the message was added, defaults to now
+            tokens: Prompt token count, estimated from the content if not given
+        """
+        set_field = object.__setattr__
+        set_field(self, "role", sys.intern(role))
+        set_field(self, "body", content)
+        set_field(self, "timestamp", float(timestamp) if timestamp is not None else time.time())
+        set_field(self, "tokens", tokens if tokens is not None else estimate_tokens(self.content))
+
+    @property
+    def content(self) -> str:
+        """
+        The message content
+        """
+        body = self.body
+        return body if isinstance(body, str) else "\n".join(body)
+
+    @classmethod
+    def from_dict(cls, data: Mapping) -> "ChatMessage":
+        """
+        Create a record from a stored message
+
+        The token count is always recomputed, since journal updates may have changed the content.
+
+        Args:
+            data: Message with 'role', 'content' and optionally 'timestamp' keys
+
+        Returns:
+            The message record
+        """
+        return cls(data["role"], data["content"], data.get("timestamp"))
+
+    def replace(self, content: Union[str, Tuple[str, ...]]) -> "ChatMessage":
+        """
+        Create a copy of this message with new content
+
+        Args:
+            content: The new message content, or its lines
+
+        Returns:
+            A record with the same role and timestamp
+        """
+        return ChatMessage(self.role, content, self.timestamp)
+
+    def to_dict(self) -> Dict[str, Any]:
+        """
+        Convert the record to a plain dict, e.g. for JSON
+
+        Returns:
+            Dictionary with 'role', 'content', 'timestamp' and 'tokens' keys
+        """
+        return {"role": self.role, "content": self.content, "timestamp": self.timestamp, "tokens": self.tokens}
+
+    def __setattr__(self, name: str, value: Any) -> None:
+        raise AttributeError(f"ChatMessage is immutable, use replace() instead of setting '{name}'")
+
+    def __delattr__(self, name: str) -> None:
+        raise AttributeError(f"ChatMessage is immutable, can't delete '{name}'")
+
+    def __reduce__(self):
+        # Slots plus the blocked __setattr__ need an explicit recipe for pickle and copy
+        return (ChatMessage, (self.role, self.body, self.timestamp, self.tokens))
+
+    def __getitem__(self, key: str) -> Any:
+        if key in self.FIELDS:
+            return getattr(self, key)
+        raise KeyError(key)
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self.FIELDS)
+
+    def __len__(self) -> int:
+        return len(self.FIELDS)
+
+    def __repr__(self) -> str:
+        return f"ChatMessage(role={self.role!r}, content={self.content[:40]!r}, timestamp={self.timestamp}, tokens={self.tokens})"
@@ -16,9 +16,44 @@ GEMINI_API_KEY = os.getenv("GEMINI_API_KEY")
 # Memory settings
 SHORT_MEMORY_SIZE = int(os.getenv("SHORT_MEMORY_SIZE", "25"))
 LONG_MEMORY_SIZE = int(os.getenv("LONG_MEMORY_SIZE", "100"))
+# Prompt tokens the chat history may use (0 = only limited by SHORT_MEMORY_SIZE); deep-search
+# prompts carry large search results, so their history gets a smaller budget
+HISTORY_TOKEN_BUDGET = int(os.getenv("HISTORY_TOKEN_BUDGET", "6000"))
+DEEP_SEARCH_HISTORY_TOKEN_BUDGET = int(os.getenv("DEEP_SEARCH_HISTORY_TOKEN_BUDGET", "3000"))
+# Add the older messages most related to the current one (local TF-IDF index over the long memory)
+# to the prompt; at most RETRIEVAL_TOP_K of them, matching at least RETRIEVAL_MIN_SCORE of its term weight
+RETRIEVAL_ENABLED = os.getenv("RETRIEVAL_ENABLED", "true").lower() == "true"
+RETRIEVAL_TOP_K = int(os.getenv("RETRIEVAL_TOP_K", "3"))
+RETRIEVAL_MIN_SCORE = float(os.getenv("RETRIEVAL_MIN_SCORE", "0.08"))
+RETRIEVAL_DIM = int(os.getenv("RETRIEVAL_DIM", "4096"))  # hash buckets of the index
 MEMORY_DIR = os.getenv("MEMORY_DIR", "user_memories")
 MEMORY_AUTOSAVE_INTERVAL = int(os.getenv("MEMORY_AUTOSAVE_INTERVAL", "60"))  # seconds
-MEMORY_CACHE_SIZE = int(os.getenv("MEMORY_CACHE_SIZE", "32"))  # number of chats to cache
+MEMORY_CACHE_SIZE = int(os.getenv("MEMORY_CACHE_SIZE", "1000"))  # chats kept in memory, colder ones are evicted (0 = unlimited)
+# Append each new message to a per-chat journal instead of rewriting the whole memory file;
+# the snapshot is rewritten in the background once the journal has this many records
+MEMORY_JOURNAL_MODE = os.getenv("MEMORY_JOURNAL_MODE", "true").lower() == "true"
+MEMORY_JOURNAL_COMPACT_RECORDS = int(os.getenv("MEMORY_JOURNAL_COMPACT_RECORDS", "50"))
+# Only index the chats with memory files at startup and load each conversation on first access
+MEMORY_LAZY_LOADING = os.getenv("MEMORY_LAZY_LOADING", "true").lower() == "true"
+# Where conversations are stored: "json" (one file per chat) or "sqlite" (one WAL-mode database)
+MEMORY_BACKEND = os.getenv("MEMORY_BACKEND", "json")
+MEMORY_DB_PATH = os.getenv("MEMORY_DB_PATH", os.path.join(MEMORY_DIR, "memories.db"))
+# Format of the json backend's memory files: "none" (pretty-printed JSON), "gzip" or "zstd"
+# (needs the zstandard package); files in any format are read. Optional trained zstd dictionary
+MEMORY_COMPRESSION = os.getenv("MEMORY_COMPRESSION", "none")
+MEMORY_ZSTD_DICT = os.getenv("MEMORY_ZSTD_DICT", "")
+# When saved memories are flushed to disk: "none" (left to the OS), "batch" (once per autosave
+# batch) or "write" (every snapshot and journal record); threads writing autosave batches
+MEMORY_FSYNC = os.getenv("MEMORY_FSYNC", "none")
+MEMORY_SAVE_WORKERS = int(os.getenv("MEMORY_SAVE_WORKERS", "2"))
+# Number of striped locks chats are spread over (1 serializes all chats like a single lock)
+MEMORY_LOCK_STRIPES = int(os.getenv("MEMORY_LOCK_STRIPES", "64"))
+# Message lines of at least this many characters that repeat (e.g. the welcome message) are kept
+# once in a shared, refcounted store in memory and on disk instead of once per chat (0 disables)
+MEMORY_DEDUP_MIN_CHARS = int(os.getenv("MEMORY_DEDUP_MIN_CHARS", "40"))
+# Warm-state handoff for restarts: on shutdown the resident chats are written to this archive
+# (see memory_archive.py) and the next start loads them from it in one read (empty = disabled)
+MEMORY_HANDOFF_PATH = os.getenv("MEMORY_HANDOFF_PATH", "")
 
 # Web search settings
 MAX_SEARCH_RESULTS = int(os.getenv("MAX_SEARCH_RESULTS", "100"))
@@ -55,6 +90,43 @@ WORD_TRANSLATION_TEMPERATURE = 0.1
 WORD_TRANSLATION_TOP_P = 0.95
 WORD_TRANSLATION_TOP_K = 40
 WORD_TRANSLATION_MAX_OUTPUT_TOKENS = 200
+# Identify and translate the uncommon words of a whole response in one request
+# instead of two requests per sentence (falls back to per-sentence on failure)
+WORD_TRANSLATION_BATCH_MODE = os.getenv("WORD_TRANSLATION_BATCH_MODE", "true").lower() == "true"
+WORD_TRANSLATION_BATCH_MAX_OUTPUT_TOKENS = int(os.getenv("WORD_TRANSLATION_BATCH_MAX_OUTPUT_TOKENS", "2048"))
+# Maximum number of responses being annotated with translations at the same time
+TRANSLATION_MAX_CONCURRENCY = int(os.getenv("TRANSLATION_MAX_CONCURRENCY", "4"))
+# Send the answer as soon as it is generated and deliver the "wort schatz" glossary afterwards
+TWO_PHASE_DELIVERY = os.getenv("TWO_PHASE_DELIVERY", "true").lower() == "true"
+# Persistent word translation store shared by all bot processes (SQLite, WAL mode), by default
+# in the data directory next to the code rather than wherever the bot is started from
+TRANSLATION_STORE_PATH = os.getenv("TRANSLATION_STORE_PATH",
+                                   os.path.join(os.path.dirname(os.path.abspath(__file__)), "data", "word_translations.db"))
+TRANSLATION_STORE_MAX_ENTRIES = int(os.getenv("TRANSLATION_STORE_MAX_ENTRIES", "200000"))
+TRANSLATION_CACHE_SIZE = int(os.getenv("TRANSLATION_CACHE_SIZE", "5000"))  # in-process LRU front, also warm-loaded at startup
+# Per-chat vocabulary ledger: skip words a learner was shown this many times within the last days (0 disables)
+VOCAB_SKIP_AFTER_SEEN = int(os.getenv("VOCAB_SKIP_AFTER_SEEN", "3"))
+VOCAB_RECENT_DAYS = int(os.getenv("VOCAB_RECENT_DAYS", "30"))
+# Bloom filter of words Gemini judged not uncommon, per language (two generations of this many words each)
+NEGATIVE_CACHE_CAPACITY = int(os.getenv("NEGATIVE_CACHE_CAPACITY", "50000"))
+NEGATIVE_CACHE_ERROR_RATE = float(os.getenv("NEGATIVE_CACHE_ERROR_RATE", "0.001"))
+# Long texts (e.g. deep-search answers) are translated in concurrent batches of this many words
+GLOSSARY_BATCH_WORDS = int(os.getenv("GLOSSARY_BATCH_WORDS", "120"))
+GLOSSARY_MAX_IN_FLIGHT = int(os.getenv("GLOSSARY_MAX_IN_FLIGHT", "4"))  # batches requested at the same time
+GLOSSARY_DEADLINE = float(os.getenv("GLOSSARY_DEADLINE", "45"))  # seconds, unfinished batches are left out
+
+# Rolling conversation summaries: once this many messages left the prompt history window, they are
+# folded into a per-chat summary in the background, up to SUMMARY_MAX_CHATS_PER_REQUEST chats per request
+SUMMARY_ENABLED = os.getenv("SUMMARY_ENABLED", "true").lower() == "true"
+SUMMARY_BATCH_MESSAGES = int(os.getenv("SUMMARY_BATCH_MESSAGES", "10"))
+SUMMARY_MAX_CHATS_PER_REQUEST = int(os.getenv("SUMMARY_MAX_CHATS_PER_REQUEST", "8"))
+SUMMARY_INTERVAL = float(os.getenv("SUMMARY_INTERVAL", "30"))  # seconds to gather due chats into one request
+SUMMARY_MAX_WORDS = int(os.getenv("SUMMARY_MAX_WORDS", "150"))
+
+# Specific model settings for conversation summaries
+SUMMARY_MODEL = "gemini-2.0-flash-lite"
+SUMMARY_TEMPERATURE = 0.2
+SUMMARY_MAX_OUTPUT_TOKENS = 2048
 
 # Specific model settings for search query generation
 SEARCH_QUERY_MODEL = "gemini-2.0-flash-lite"
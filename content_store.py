@@ -0,0 +1,249 @@
+import hashlib
+import logging
+import threading
+from typing import Any, Dict, Iterable, List, Optional, Tuple, Union
+import config
+from negative_cache import BloomFilter
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+# Lines of at least MEMORY_DEDUP_MIN_CHARS characters seen once are remembered in a Bloom filter
+# generation of this many lines; the second sighting makes a line a shared body
+DEDUP_CANDIDATES = 100000
+DEDUP_CANDIDATE_ERROR_RATE = 0.001
+
+# A message body: the content itself, or its lines when some of them are shared bodies
+Body = Union[str, Tuple[str, ...]]
+
+def body_digest(text: str) -> str:
+    """
+    Get the content address of a shared body
+
+    Args:
+        text: The body text
+
+    Returns:
+        A 96-bit BLAKE2b digest in hex
+    """
+    return hashlib.blake2b(text.encode('utf-8'), digest_size=12).hexdigest()
+
+class ContentStore:
+    """
+    Process-wide registry of message lines that repeat across messages and chats
+
+    Stock texts like the welcome message or error replies are stored once per
+    chat otherwise. Lines of at least min_chars characters are tracked by
+    content address: a line seen a second time becomes a shared body. In RAM,
+    the records of resident messages then hold one canonical string per shared
+    body, refcounted and dropped once no resident message uses it. The storage
+    backends write shared bodies once and let their snapshots refer to them by
+    digest (see encode_segments), with refcounts of their own on disk.
+    """
+    def __init__(self, min_chars: int = config.MEMORY_DEDUP_MIN_CHARS, candidates: int = DEDUP_CANDIDATES,
+                 error_rate: float = DEDUP_CANDIDATE_ERROR_RATE):
+        self.min_chars = min_chars
+        self.candidates = candidates
+        self.error_rate = error_rate
+
+        # Canonical strings of the shared bodies used by resident messages, and their reference counts
+        self.bodies: Dict[str, str] = {}
+        self.refs: Dict[str, int] = {}
+
+        # Digests of all shared bodies, including those only referenced on disk
+        self.shared = set()
+
+        # Digests of lines seen once (current and previous Bloom filter generation)
+        self.seen = (BloomFilter(candidates, error_rate), None)
+
+        self.stats: Dict[str, int] = {
+            "promotions": 0,
+            "interned_lines": 0
+        }
+
+        # Thread lock for thread safety
+        self.lock = threading.RLock()
+
+    def _is_candidate(self, length: int) -> bool:
+        """
+        Check whether a line is long enough to be deduplicated
+        """
+        return 0 < self.min_chars <= length
+
+    def _check_shared(self, digest: str) -> bool:
+        """
+        Check whether a line is a shared body, promoting it on its second sighting
+
+        The caller must hold the lock.
+        """
+        if digest in self.shared:
+            return True
+
+        current, previous = self.seen
+        if digest in current or (previous is not None and digest in previous):
+            self.shared.add(digest)
+            self.stats["promotions"] += 1
+            return True
+
+        if current.count >= self.candidates:
+            # Rotate generations, dropping the oldest one
+            current, previous = BloomFilter(self.candidates, self.error_rate), current
+            self.seen = (current, previous)
+        current.add(digest)
+        return False
+
+    def intern(self, content: str) -> Body:
+        """
+        Share the repeated lines of a message's content
+
+        Every shared line of the returned body holds a reference that must be
+        given back with release() once the message leaves memory.
+
+        Args:
+            content: The message content
+
+        Returns:
+            The content unchanged, or a tuple of its lines if at least one of them is a shared body
+        """
+        if not self._is_candidate(len(content)):
+            return content
+
+        lines = content.split("\n")
+        shared = False
+        with self.lock:
+            for i, line in enumerate(lines):
+                if not self._is_candidate(len(line)):
+                    continue
+                digest = body_digest(line)
+                if self._check_shared(digest):
+                    lines[i] = self.bodies.setdefault(digest, line)
+                    self.refs[digest] = self.refs.get(digest, 0) + 1
+                    self.stats["interned_lines"] += 1
+                    shared = True
+
+        return tuple(lines) if shared else content
+
+    def release(self, body: Body) -> None:
+        """
+        Give back the references a body got from intern()
+
+        Args:
+            body: A body returned by intern()
+        """
+        if isinstance(body, str):
+            return
+
+        with self.lock:
+            for line in body:
+                if not self._is_candidate(len(line)):
+                    continue
+                digest = body_digest(line)
+                if self.bodies.get(digest) is line:
+                    self.refs[digest] -= 1
+                    if self.refs[digest] <= 0:
+                        del self.bodies[digest]
+                        del self.refs[digest]
+
+    def lookup(self, digest: str) -> Optional[str]:
+        """
+        Get the canonical string of a shared body used by a resident message
+
+        Args:
+            digest: The body's digest
+
+        Returns:
+            The body text, or None if no resident message uses it
+        """
+        with self.lock:
+            return self.bodies.get(digest)
+
+    def mark_shared(self, digests: Iterable[str]) -> None:
+        """
+        Register bodies that are already shared on disk
+
+        Args:
+            digests: Digests of the stored shared bodies
+        """
+        with self.lock:
+            self.shared.update(digests)
+
+    def forget(self, digests: Iterable[str]) -> None:
+        """
+        Unregister bodies that are no longer referenced on disk
+
+        Resident messages keep their references; the line is shared again when it repeats.
+
+        Args:
+            digests: Digests of the deleted shared bodies
+        """
+        with self.lock:
+            self.shared.difference_update(digests)
+
+    def encode_segments(self, content: str) -> Optional[Tuple[List[Union[str, Dict[str, str]]], Dict[str, str]]]:
+        """
+        Split a message's content for storage, replacing shared lines with references
+
+        Args:
+            content: The message content
+
+        Returns:
+            (segments, {digest: text}) where segments are the lines with each shared one replaced by
+            {"body": digest}, or None if the content has no shared line and is stored as it is
+        """
+        if not self._is_candidate(len(content)):
+            return None
+
+        segments: List[Union[str, Dict[str, str]]] = []
+        bodies = {}
+        for line in content.split("\n"):
+            if self._is_candidate(len(line)):
+                digest = body_digest(line)
+                with self.lock:
+                    shared = digest in self.shared
+                if shared:
+                    segments.append({"body": digest})
+                    bodies[digest] = line
+                    continue
+            segments.append(line)
+
+        return (segments, bodies) if bodies else None
+
+    def get_stats(self) -> Dict[str, Any]:
+        """
+        Get statistics of the shared bodies
+
+        Returns:
+            Dictionary with the shared bodies in memory and in total, their references and the promotions
+        """
+        with self.lock:
+            stats = dict(self.stats)
+            stats["resident_bodies"] = len(self.bodies)
+            stats["resident_references"] = sum(self.refs.values())
+            stats["shared_bodies"] = len(self.shared)
+        return stats
+
+def join_segments(segments: List[Union[str, Dict[str, str]]], bodies: Dict[str, Optional[str]]) -> str:
+    """
+    Rebuild a message's content from its stored segments
+
+    Args:
+        segments: Lines and {"body": digest} references, as written by encode_segments
+        bodies: Texts of the referenced bodies; missing ones are logged and left out
+
+    Returns:
+        The message content
+    """
+    lines = []
+    for segment in segments:
+        if isinstance(segment, dict):
+            text = bodies.get(segment["body"])
+            if text is None:
+                logger.error(f"Shared message body {segment['body']} is missing")
+                text = ""
+            lines.append(text)
+        else:
+            lines.append(segment)
+    return "\n".join(lines)
+
+# Create a singleton instance
+content_store = ContentStore()
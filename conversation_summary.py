@@ -0,0 +1,203 @@
+import re
+import logging
+import threading
+from typing import Dict, List, Optional, Tuple
+import google.generativeai as genai
+import config
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+# Long messages (e.g. deep-search answers) are cut to this many characters in the summary prompt
+SUMMARY_MESSAGE_CHARS = 1500
+
+def _generate_summary_content(prompt: str) -> Optional[str]:
+    """
+    Send a prompt to the summary model
+
+    Args:
+        prompt: The prompt to send
+
+    Returns:
+        The response text, or None if the response has no usable content
+    """
+    model = genai.GenerativeModel(
+        model_name=config.SUMMARY_MODEL,
+        generation_config={
+            "temperature": config.SUMMARY_TEMPERATURE,
+            "max_output_tokens": config.SUMMARY_MAX_OUTPUT_TOKENS,
+        },
+        safety_settings=config.SAFETY_SETTINGS
+    )
+    response = model.generate_content(prompt)
+
+    try:
+        return response.text.strip()
+    except ValueError:
+        # No text part, e.g. the prompt was blocked
+        logger.warning(f"Gemini returned no summary: {getattr(response, 'prompt_feedback', None)}")
+        return None
+
+def build_summary_prompt(batch: List[Tuple[int, Optional[str], List[Tuple[str, str]], float]]) -> str:
+    """
+    Build one prompt that updates the summaries of several chats
+
+    Args:
+        batch: Work items from Memory.take_summary_batch
+
+    Returns:
+        The prompt, with the chats numbered from 1 in batch order
+    """
+    conversations = []
+    for number, (_, previous, messages, _) in enumerate(batch, 1):
+        lines = [f"### CONVERSATION {number}", f"Previous summary: {previous or 'NONE'}", "New messages:"]
+        for role, content in messages:
+            if len(content) > SUMMARY_MESSAGE_CHARS:
+                content = content[:SUMMARY_MESSAGE_CHARS] + " [...]"
+            lines.append(f"{'User' if role == 'user' else 'Tails'}: {content}")
+        conversations.append("\n".join(lines))
+
+    return f"""
+    Update the running summaries of the following conversations between a language learner (User) and the assistant Tails.
+
+    For each conversation, merge the previous summary and the new messages into one summary of at most {config.SUMMARY_MAX_WORDS} words.
+    Keep what matters for later replies: facts about the user (name, interests, language level, plans), topics discussed,
+    questions that are still open and anything the user asked to remember. Leave out greetings and small talk.
+    Write the summary in English, in short plain sentences.
+
+    Respond with one block per conversation, in exactly this format:
+    ### CONVERSATION <number>
+    <summary>
+
+{chr(10).join(conversations)}
+    """
+
+def parse_summary_response(text: str, count: int) -> Dict[int, str]:
+    """
+    Parse the per-conversation summaries of a batched response
+
+    Args:
+        text: The response text
+        count: Number of conversations in the request
+
+    Returns:
+        Dictionary mapping conversation numbers (from 1) to their summaries
+    """
+    summaries = {}
+    blocks = re.split(r'^\s*#+\s*CONVERSATION\s+(\d+)\s*:?\s*$', text, flags=re.MULTILINE | re.IGNORECASE)
+
+    # re.split gives [preamble, number, summary, number, summary, ...]
+    for number, summary in zip(blocks[1::2], blocks[2::2]):
+        number = int(number)
+        summary = summary.strip()
+        if 1 <= number <= count and summary:
+            summaries[number] = summary
+    return summaries
+
+class ConversationSummarizer:
+    """
+    Background worker that folds messages leaving the short history window into
+    a rolling per-chat summary
+
+    Memory queues chats once SUMMARY_BATCH_MESSAGES messages have left the window.
+    The worker waits SUMMARY_INTERVAL seconds so more chats become due, then
+    summarizes up to SUMMARY_MAX_CHATS_PER_REQUEST chats per Gemini request, off
+    the path of any reply.
+    """
+    def __init__(self, memory, interval: float = config.SUMMARY_INTERVAL,
+                 max_chats: int = config.SUMMARY_MAX_CHATS_PER_REQUEST):
+        self.memory = memory
+        self.interval = interval
+        self.max_chats = max(1, max_chats)
+
+        # Request counters
+        self.stats: Dict[str, int] = {
+            "requests": 0,
+            "summarized_chats": 0,
+            "failed_requests": 0
+        }
+
+        self.stop_event = threading.Event()
+        self.thread: Optional[threading.Thread] = None
+
+    def start(self) -> None:
+        """
+        Start the background worker
+        """
+        if self.thread is None or not self.thread.is_alive():
+            self.stop_event.clear()
+            self.thread = threading.Thread(target=self._run, daemon=True)
+            self.thread.start()
+            logger.info("Conversation summarizer started")
+
+    def stop(self) -> None:
+        """
+        Stop the background worker, unfinished summaries are picked up again after a restart
+        """
+        self.stop_event.set()
+        self.memory.summary_ready.set()
+        if self.thread is not None:
+            self.thread.join(timeout=10)
+        logger.info(f"Conversation summarizer stopped: {self.stats}")
+
+    def _run(self) -> None:
+        """
+        Wait for due chats and summarize them in batches
+        """
+        while not self.stop_event.is_set():
+            self.memory.summary_ready.wait()
+
+            # Give other chats time to become due, so they share the request
+            if self.stop_event.wait(self.interval):
+                break
+
+            try:
+                self.run_once()
+            except Exception as e:
+                logger.error(f"Error in conversation summarizer: {e}")
+
+    def run_once(self) -> int:
+        """
+        Summarize all chats that are currently due
+
+        Returns:
+            Number of chats whose summary was updated
+        """
+        updated = 0
+        while not self.stop_event.is_set():
+            batch = self.memory.take_summary_batch(self.max_chats)
+            if not batch:
+                break
+            updated += self.summarize_batch(batch)
+        return updated
+
+    def summarize_batch(self, batch: List[Tuple[int, Optional[str], List[Tuple[str, str]], float]]) -> int:
+        """
+        Update the summaries of a batch of chats with one Gemini request
+
+        Args:
+            batch: Work items from Memory.take_summary_batch
+
+        Returns:
+            Number of chats whose summary was updated
+        """
+        self.stats["requests"] += 1
+        try:
+            text = _generate_summary_content(build_summary_prompt(batch))
+        except Exception as e:
+            logger.error(f"Error summarizing {len(batch)} conversations: {e}")
+            text = None
+
+        if not text:
+            # The chats are queued again when their next message arrives
+            self.stats["failed_requests"] += 1
+            return 0
+
+        summaries = parse_summary_response(text, len(batch))
+        for number, (chat_id, _, _, until) in enumerate(batch, 1):
+            if number in summaries:
+                self.memory.set_summary(chat_id, summaries[number], until)
+
+        self.stats["summarized_chats"] += len(summaries)
+        logger.info(f"Updated the summaries of {len(summaries)}/{len(batch)} conversations in one request")
+        return len(summaries)
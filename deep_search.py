@@ -1,7 +1,7 @@
 import asyncio
 import logging
 import time
-from typing import List, Dict, Any, Optional
+from typing import List, Dict, Any, Mapping, Optional, Sequence
 import random
 
 import google.generativeai as genai
@@ -351,7 +351,12 @@ async def generate_response_with_deep_search(
     chat_history: List[Dict[str, str]],
     search_results: Dict[str, Any],
     language: str,
-    time_context: Optional[Dict[str, Any]] = None
+    time_context: Optional[Dict[str, Any]] = None,
+    post_process: bool = True,
+    chat_id: Optional[int] = None,
+    history_token_budget: Optional[int] = None,
+    conversation_summary: Optional[str] = None,
+    relevant_messages: Optional[Sequence[Mapping[str, Any]]] = None
 ) -> str:
     """
     Generate a detailed response using Gemini with deep search results
@@ -362,11 +367,16 @@ async def generate_response_with_deep_search(
         search_results: Deep search results
         language: Detected language
         time_context: Optional time awareness context
+        post_process: Add the Turkish glossary; if False, only strip any glossary the model wrote
+        chat_id: Optional chat whose already learned words are left out of the glossary
+        history_token_budget: Optional maximum tokens of chat history in the prompt
+        conversation_summary: Optional summary of the older messages, added to the context turn
+        relevant_messages: Optional older messages related to the query, added to the context turn
 
     Returns:
         Generated detailed response in the user's language
     """
-    from personality import format_messages_for_gemini
+    from personality import format_messages_for_gemini, format_summary_context, format_relevant_context
 
     # Create a special deep search system prompt
     deep_search_system_prompt = f"""
@@ -396,7 +406,7 @@ async def generate_response_with_deep_search(
 
     # Format message history for Gemini (returns a list)
     # The system prompt is handled separately below
-    history_messages = format_messages_for_gemini(chat_history, deep_search_system_prompt) # system_prompt is not used by the new format_messages
+    history_messages = format_messages_for_gemini(chat_history, deep_search_system_prompt, token_budget=history_token_budget) # system_prompt is not used by the new format_messages
 
     # Format citations for reference
     citations_info = ""
@@ -461,6 +471,10 @@ async def generate_response_with_deep_search(
 
     # Add additional context (search results, time info) as a user message
     additional_context_parts = []
+    if conversation_summary:
+        additional_context_parts.append(format_summary_context(conversation_summary))
+    if relevant_messages:
+        additional_context_parts.append(format_relevant_context(relevant_messages))
     if time_awareness_info:
         additional_context_parts.append(time_awareness_info)
     additional_context_parts.append(search_context) # Includes search results and citations
@@ -510,11 +524,17 @@ async def generate_response_with_deep_search(
             processed_response = re.sub(r'\[\d+\]', '', response)
 
             # Import word translation module here to avoid circular imports
-            from word_translation import post_process_response
+            from word_translation import post_process_response_async, remove_glossary_sections
+
+            # With two-phase delivery the glossary is built after the answer is sent
+            if not post_process:
+                return remove_glossary_sections(processed_response)
 
             # Post-process response to add Turkish translations for uncommon words
-            final_response = post_process_response(processed_response, language)
-            logger.info(f"Post-processed deep search response with Turkish translations for uncommon words")
+            glossary_start_time = time.time()
+            final_response = await post_process_response_async(processed_response, language, chat_id=chat_id)
+            search_results['stats']['glossary_time'] = time.time() - glossary_start_time
+            logger.info(f"Post-processed deep search response with Turkish translations for uncommon words in {search_results['stats']['glossary_time']:.1f} seconds")
 
             logger.info(f"Successfully generated deep search response with length: {len(final_response)}")
             return final_response
@@ -0,0 +1,238 @@
+import os
+import re
+import sys
+import mmap
+import logging
+import threading
+from array import array
+from typing import Dict, List, Any, Optional, Tuple
+from cefr_index import normalize_word
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+# Compiled per-language dictionaries (<language>.tsv with "word<TAB>turkish" lines sorted by UTF-8 bytes)
+DICTIONARY_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "data", "dictionary")
+
+class LocalDictionary:
+    """
+    Read-only bilingual dictionary of source word to Turkish translation
+
+    Each language is a sorted TSV file that is memory-mapped on first use and
+    searched with a binary search over its line offsets, so lookups are
+    O(log n) and the entries themselves are never copied into Python objects.
+    """
+    def __init__(self, dictionary_dir: str = DICTIONARY_DIR):
+        self.dictionary_dir = dictionary_dir
+
+        # language -> (mapped file, line start offsets), or None if the language has no dictionary
+        self.tables: Dict[str, Optional[Tuple[mmap.mmap, array]]] = {}
+
+        # Hit/miss counters
+        self.stats: Dict[str, int] = {
+            "hits": 0,
+            "misses": 0
+        }
+
+        # Thread lock for thread safety
+        self.lock = threading.RLock()
+
+    def _get_dictionary_file_path(self, language: str) -> str:
+        """
+        Get the file path of a language's dictionary
+        """
+        return os.path.join(self.dictionary_dir, f"{language.lower()}.tsv")
+
+    def _get_table(self, language: str) -> Optional[Tuple[mmap.mmap, array]]:
+        """
+        Get the mapped dictionary of a language, mapping it on first use
+        """
+        language = language.lower()
+        with self.lock:
+            if language in self.tables:
+                return self.tables[language]
+
+            table = None
+            dictionary_file = self._get_dictionary_file_path(language)
+            if os.path.exists(dictionary_file) and os.path.getsize(dictionary_file) > 0:
+                try:
+                    with open(dictionary_file, 'rb') as f:
+                        data = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+                    # Index the start of every line
+                    offsets = array('Q', [0])
+                    position = data.find(b'\n')
+                    while position != -1 and position + 1 < len(data):
+                        offsets.append(position + 1)
+                        position = data.find(b'\n', position + 1)
+
+                    table = (data, offsets)
+                    logger.info(f"Loaded local dictionary for {language} with {len(offsets)} entries")
+                except Exception as e:
+                    logger.error(f"Error loading local dictionary for {language}: {e}")
+
+            self.tables[language] = table
+            return table
+
+    @staticmethod
+    def _read_line(data: mmap.mmap, start: int) -> Tuple[bytes, bytes]:
+        """
+        Read the (word, translation) pair of the line starting at an offset
+        """
+        end = data.find(b'\n', start)
+        if end == -1:
+            end = len(data)
+        word, _, translation = data[start:end].partition(b'\t')
+        return word, translation
+
+    def lookup(self, word: str, language: str) -> Optional[str]:
+        """
+        Look up the Turkish translation of a word
+
+        Args:
+            word: The word to look up
+            language: The language of the word
+
+        Returns:
+            The translation, or None if the dictionary doesn't contain the word
+        """
+        table = self._get_table(language)
+        translation = None
+
+        if table is not None:
+            data, offsets = table
+            key = normalize_word(word).encode('utf-8')
+            low, high = 0, len(offsets)
+            while low < high:
+                middle = (low + high) // 2
+                entry, value = self._read_line(data, offsets[middle])
+                if entry < key:
+                    low = middle + 1
+                elif entry > key:
+                    high = middle
+                else:
+                    translation = value.decode('utf-8')
+                    break
+
+        with self.lock:
+            self.stats["hits" if translation is not None else "misses"] += 1
+        return translation
+
+    def lookup_many(self, words: List[str], language: str) -> Dict[str, str]:
+        """
+        Look up the Turkish translations of several words
+
+        Args:
+            words: The words to look up
+            language: The language of the words
+
+        Returns:
+            Dictionary mapping each found word (as given) to its translation
+        """
+        found = {}
+        for word in words:
+            translation = self.lookup(word, language)
+            if translation is not None:
+                found[word] = translation
+        return found
+
+    def get_stats(self) -> Dict[str, Any]:
+        """
+        Get hit/miss statistics of the dictionary
+
+        Returns:
+            Dictionary with the counters, the hit rate and the loaded entries per language
+        """
+        with self.lock:
+            stats = dict(self.stats)
+            stats["entries"] = {language: len(table[1]) for language, table in self.tables.items() if table is not None}
+
+        lookups = stats["hits"] + stats["misses"]
+        stats["hit_rate"] = stats["hits"] / lookups if lookups else 0.0
+        return stats
+
+    def reload(self, language: Optional[str] = None) -> None:
+        """
+        Drop one or all dictionaries so they are mapped again on next use
+
+        The old mappings are not closed here, because lookups in other threads
+        search them without holding the lock. A mapping is unmapped once the
+        last lookup still using it has finished and released it.
+        """
+        with self.lock:
+            languages = [language.lower()] if language else list(self.tables)
+            for name in languages:
+                self.tables.pop(name, None)
+
+    def close(self) -> None:
+        """
+        Drop all dictionaries, unmapping them once no lookup uses them anymore
+        """
+        self.reload()
+        logger.info(f"Local dictionary closed: {self.get_stats()}")
+
+def _parse_entry(line: str) -> Optional[Tuple[str, str]]:
+    """
+    Parse a "word<TAB>translation", "word,translation", "word: translation" or "word = translation" line
+    """
+    line = line.strip()
+    if not line or line.startswith('#'):
+        return None
+
+    parts = re.split(r'\t|\s*[,:=]\s*', line, maxsplit=1)
+    if len(parts) != 2:
+        return None
+
+    word, translation = normalize_word(parts[0]), parts[1].strip()
+    if not word or not translation:
+        return None
+    return word, translation
+
+def import_entries(language: str, source_files: List[str], dictionary_dir: str = DICTIONARY_DIR) -> int:
+    """
+    Merge word lists into a language's compiled dictionary
+
+    Imported entries replace existing entries for the same word. The result is
+    written sorted by UTF-8 bytes, which is the order lookups rely on.
+
+    Args:
+        language: The language of the source words
+        source_files: Files with one entry per line (TAB, comma, colon or "=" separated)
+        dictionary_dir: Directory that holds the <language>.tsv dictionaries
+
+    Returns:
+        Number of entries in the dictionary after the import
+    """
+    dictionary_file = os.path.join(dictionary_dir, f"{language.lower()}.tsv")
+    entries: Dict[str, str] = {}
+
+    for path in ([dictionary_file] if os.path.exists(dictionary_file) else []) + list(source_files):
+        with open(path, 'r', encoding='utf-8') as f:
+            for line in f:
+                entry = _parse_entry(line)
+                if entry:
+                    entries[entry[0]] = entry[1]
+
+    os.makedirs(dictionary_dir, exist_ok=True)
+    temp_file = f"{dictionary_file}.tmp"
+    with open(temp_file, 'w', encoding='utf-8') as f:
+        for word in sorted(entries, key=lambda w: w.encode('utf-8')):
+            f.write(f"{word}\t{entries[word]}\n")
+    os.replace(temp_file, dictionary_file)
+
+    # Drop the old mapping in this process
+    local_dictionary.reload(language)
+
+    logger.info(f"Imported local dictionary for {language} with {len(entries)} entries")
+    return len(entries)
+
+# Create a singleton instance
+local_dictionary = LocalDictionary()
+
+if __name__ == "__main__":
+    # Usage: python local_dictionary.py import <language> <file> [<file> ...]
+    logging.basicConfig(level=logging.INFO)
+    if len(sys.argv) < 4 or sys.argv[1] != "import":
+        print("Usage: python local_dictionary.py import <language> <file> [<file> ...]")
+        sys.exit(1)
+    print(f"{sys.argv[2]}: {import_entries(sys.argv[2], sys.argv[3:])} entries")
@@ -4,11 +4,11 @@ import os
 import math
 import time
 import concurrent.futures
-from typing import Dict, List, Any, Optional, Union, Tuple
+from typing import Dict, List, Any, Mapping, Optional, Sequence, Union, Tuple, Set
 
 import google.generativeai as genai
 import torch
-from telegram import Update, Bot
+from telegram import Update, Bot, Message
 from telegram.ext import Application, MessageHandler, CommandHandler, filters, ContextTypes
 from telegram.constants import ChatAction
 
@@ -18,13 +18,19 @@ MAX_MESSAGE_LENGTH = 4096
 import config
 from memory import Memory
 from web_search import generate_search_queries, search_with_duckduckgo
-from personality import create_system_prompt, format_messages_for_gemini
+from personality import create_system_prompt, format_messages_for_gemini, format_summary_context, format_relevant_context
+from conversation_summary import ConversationSummarizer
 from language_detection import detect_language_with_gemini
 from media_analysis import analyze_image, analyze_video, download_media_from_message
 from deep_search import deep_search_with_progress, generate_response_with_deep_search
 from time_awareness import get_time_awareness_context
 from gpu_utils import gpu_manager
-from word_translation import post_process_response
+from word_translation import (
+    post_process_response_async, build_glossary_async, remove_glossary_sections,
+    append_glossary, format_glossary, translation_executor, glossary_batch_executor
+)
+from translation_store import translation_store
+from local_dictionary import local_dictionary
 # Action translation no longer needed as we've removed physical action descriptions
 
 # Configure logging with more detailed format and DEBUG level for better debugging
@@ -56,6 +62,9 @@ thread_pool = concurrent.futures.ThreadPoolExecutor(max_workers=8)
 # Initialize memory
 memory = Memory()
 
+# Folds messages that left the short history window into per-chat summaries
+summarizer = ConversationSummarizer(memory)
+
 # Initialize Gemini
 genai.configure(api_key=config.GEMINI_API_KEY)
 
@@ -65,6 +74,9 @@ user_languages: Dict[int, str] = {}
 # Response time tracking
 response_times: Dict[int, Dict[str, float]] = {}
 
+# Background glossary deliveries (kept referenced until they finish)
+glossary_tasks: Set[asyncio.Task] = set()
+
 def split_long_message(text: str, max_length: int = MAX_MESSAGE_LENGTH - 100) -> List[str]:
     """
     Split a long message into chunks that respect Telegram's message length limit.
@@ -183,6 +195,83 @@ async def keep_typing(chat_id: int, bot: Bot, cancel_event: asyncio.Event) -> No
         await bot.send_chat_action(chat_id=chat_id, action=ChatAction.TYPING)
         await asyncio.sleep(4)  # Telegram typing indicator lasts about 5 seconds
 
+async def deliver_glossary(
+    bot: Bot,
+    chat_id: int,
+    last_message: Optional[Message],
+    response: str,
+    language: str,
+    message_timestamp: float,
+    status_message: Optional[Message] = None
+) -> None:
+    """
+    Second phase of two-phase delivery: build the "wort schatz" glossary for an
+    answer that was already sent, then append it to the last sent message (or send
+    it as a follow-up) and update the stored memory entry.
+
+    Args:
+        bot: The Telegram bot
+        chat_id: The chat ID
+        last_message: The last message chunk that was sent for the answer
+        response: The cleaned answer that was sent
+        language: Detected language
+        message_timestamp: Timestamp of the stored memory entry for the answer
+        status_message: Optional progress message that gets the glossary time appended
+    """
+    try:
+        start_time = time.time()
+        stats = {}
+        translations = await build_glossary_async(response, language, stats, chat_id)
+        glossary_time = time.time() - start_time
+
+        # Report how long the glossary stage took (used by /deepsearch)
+        if getattr(status_message, "text", None):
+            try:
+                await status_message.edit_text(f"{status_message.text}\nGlossary time: {glossary_time:.1f} seconds")
+            except Exception as e:
+                logger.error(f"Error updating status message with glossary time: {e}")
+
+        if not translations:
+            return
+
+        glossary = format_glossary(translations)
+        logger.info(f"Built glossary with {len(translations)} words using {stats.get('gemini_calls', 0)} Gemini call(s) in {glossary_time:.2f} seconds for chat {chat_id}")
+
+        # Edit the last chunk if the glossary still fits, otherwise send a follow-up message
+        edited = False
+        if last_message and last_message.text and len(last_message.text) + len(glossary) + 2 <= MAX_MESSAGE_LENGTH - 100:
+            try:
+                await last_message.edit_text(f"{last_message.text}\n\n{glossary}")
+                edited = True
+            except Exception as e:
+                logger.error(f"Error editing message to add glossary: {e}")
+        if not edited:
+            await bot.send_message(chat_id=chat_id, text=glossary)
+
+        # Store the full answer including the glossary
+        memory.update_message(chat_id, message_timestamp, append_glossary(response, translations))
+    except Exception as e:
+        logger.error(f"Error delivering glossary for chat {chat_id}: {e}")
+
+def schedule_glossary_delivery(
+    bot: Bot,
+    chat_id: int,
+    last_message: Optional[Message],
+    response: str,
+    language: str,
+    message_timestamp: float,
+    status_message: Optional[Message] = None
+) -> None:
+    """Start the glossary delivery for an already sent answer in the background."""
+    if language.lower() == "turkish":
+        return
+
+    task = asyncio.create_task(
+        deliver_glossary(bot, chat_id, last_message, response, language, message_timestamp, status_message)
+    )
+    glossary_tasks.add(task)
+    task.add_done_callback(glossary_tasks.discard)
+
 async def handle_message(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
     """Handle incoming messages."""
     try:
@@ -199,7 +288,7 @@ async def handle_message(update: Update, context: ContextTypes.DEFAULT_TYPE) ->
         response_times[chat_id]['start_time'] = start_time
 
         # Check if this is the first message
-        if chat_id not in memory.conversations or not memory.conversations[chat_id]:
+        if not memory.has_conversation(chat_id):
             # Detect language (default to English for first message)
             detected_language = "English"
             try:
@@ -209,7 +298,7 @@ async def handle_message(update: Update, context: ContextTypes.DEFAULT_TYPE) ->
             except Exception as e:
                 logger.error(f"Error detecting language for first message: {e}")
 
-            welcome_message = f"Hello, {user.first_name}! I'm Miles Prower, but everyone calls me Tails! I'm an 8-year-old fox with twin tails from the Sonic the Hedgehog universe. I'm a mechanical genius and inventor who loves to build gadgets and solve problems! I can fly by spinning my two tails like helicopter rotors, and I'm Sonic's best friend and trusted sidekick. I can search the internet to help answer your questions and provide useful information! What would you like to talk about today, friend? 😊"
+            welcome_message = f"Hello, {user.first_name}!\nI'm Miles Prower, but everyone calls me Tails! I'm an 8-year-old fox with twin tails from the Sonic the Hedgehog universe. I'm a mechanical genius and inventor who loves to build gadgets and solve problems! I can fly by spinning my two tails like helicopter rotors, and I'm Sonic's best friend and trusted sidekick. I can search the internet to help answer your questions and provide useful information! What would you like to talk about today, friend? 😊"
             try:
                 await message.reply_text(welcome_message)
                 memory.add_message(chat_id, "model", welcome_message)
@@ -287,9 +376,14 @@ async def handle_message(update: Update, context: ContextTypes.DEFAULT_TYPE) ->
                     await typing_task
                 return
 
-            # Get chat history
-            chat_history = memory.get_short_memory(chat_id)
-            logger.debug(f"Retrieved {len(chat_history)} messages from short memory for chat {chat_id}")
+            # Get the newest chat history that fits the prompt token budget
+            chat_history = memory.get_history_window(chat_id, config.HISTORY_TOKEN_BUDGET)
+            logger.debug(f"Retrieved {len(chat_history)} messages ({sum(msg['tokens'] for msg in chat_history)} tokens) "
+                         f"from short memory for chat {chat_id}")
+
+            # Look up older messages the current one may refer to, outside the history window
+            relevant_messages = memory.get_relevant_messages(chat_id, user_message, exclude_recent=len(chat_history))
+            logger.debug(f"Retrieved {len(relevant_messages)} relevant earlier messages for chat {chat_id}")
 
             # Get time awareness context if enabled
             time_context = None
@@ -342,7 +436,11 @@ async def handle_message(update: Update, context: ContextTypes.DEFAULT_TYPE) ->
                 detected_language,
                 media_analysis if media_type in ("photo", "video") else None,
                 time_context if config.TIME_AWARENESS_ENABLED else None,
-                chat_id  # Pass chat_id for response time tracking
+                chat_id,  # Pass chat_id for response time tracking
+                post_process=not config.TWO_PHASE_DELIVERY,
+                history_token_budget=config.HISTORY_TOKEN_BUDGET,
+                conversation_summary=memory.get_summary(chat_id),
+                relevant_messages=relevant_messages
             )
 
             # Stop typing indicator
@@ -355,17 +453,23 @@ async def handle_message(update: Update, context: ContextTypes.DEFAULT_TYPE) ->
 
             # Send each chunk as a separate message
             first_chunk = True
+            sent_message = None
             for chunk in response_chunks:
                 if first_chunk:
                     # Send the first chunk as a reply to the original message
-                    await message.reply_text(chunk)
+                    sent_message = await message.reply_text(chunk)
                     first_chunk = False
+                    logger.info(f"First message sent in {time.time() - start_time:.2f} seconds for chat {chat_id}")
                 else:
                     # Send subsequent chunks as regular messages
-                    await context.bot.send_message(chat_id=chat_id, text=chunk)
+                    sent_message = await context.bot.send_message(chat_id=chat_id, text=chunk)
 
             # Add model response to memory (store the full response)
-            memory.add_message(chat_id, "model", response)
+            message_timestamp = memory.add_message(chat_id, "model", response)
+
+            # Deliver the glossary in the background once it's ready
+            if config.TWO_PHASE_DELIVERY:
+                schedule_glossary_delivery(context.bot, chat_id, sent_message, response, detected_language, message_timestamp)
 
             # Clean up temporary files if needed
             if media_type in ("photo", "video") and file_path and os.path.exists(file_path):
@@ -436,7 +540,11 @@ async def generate_response(
     _: str,  # user_message not used directly but kept for consistent interface
     chat_history: List[Dict[str, str]],
     language: str,
-    chat_id: int = 0  # Added chat_id parameter for tracking response times
+    chat_id: int = 0,  # Added chat_id parameter for tracking response times
+    post_process: bool = True,
+    history_token_budget: Optional[int] = None,
+    conversation_summary: Optional[str] = None,
+    relevant_messages: Optional[Sequence[Mapping[str, Any]]] = None
 ) -> str:
     """
     Generate a response using Gemini
@@ -446,6 +554,10 @@ async def generate_response(
         chat_history: Recent chat history
         language: Detected language
         chat_id: The chat ID for tracking response times
+        post_process: Add the Turkish glossary; if False, only strip any glossary the model wrote
+        history_token_budget: Optional maximum tokens of chat history in the prompt
+        conversation_summary: Optional summary of the older messages, added as one context turn
+        relevant_messages: Optional older messages related to the current one, added to the same context turn
 
     Returns:
         Generated response
@@ -456,7 +568,11 @@ async def generate_response(
     system_prompt = create_system_prompt(language)
 
     # Format messages for Gemini
-    prompt = format_messages_for_gemini(chat_history, system_prompt)
+    prompt = format_messages_for_gemini(chat_history, system_prompt, token_budget=history_token_budget)
+    earlier_context = format_summary_context(conversation_summary) + format_relevant_context(relevant_messages)
+    if earlier_context:
+        prompt = [{'role': 'user', 'parts': [earlier_context]},
+                  {'role': 'model', 'parts': ["Okay, I remember our earlier conversation."]}] + prompt
 
     try:
         # Configure Gemini with optimized settings
@@ -489,8 +605,12 @@ async def generate_response(
             response_times[chat_id]['last_response_time'] = end_time - start_time
             logger.info(f"Response generated in {end_time - start_time:.2f} seconds for chat {chat_id}")
 
+        # With two-phase delivery the glossary is built after the answer is sent
+        if not post_process:
+            return remove_glossary_sections(response)
+
         # Post-process response to add Turkish translations for uncommon words
-        processed_response = post_process_response(response, language)
+        processed_response = await post_process_response_async(response, language, chat_id=chat_id or None)
         logger.info(f"Post-processed response with Turkish translations for uncommon words")
 
         return processed_response
@@ -506,7 +626,11 @@ async def generate_response_with_search(
     language: str,
     media_analysis: Optional[Dict[str, Any]] = None,
     time_context: Optional[Dict[str, Any]] = None,
-    chat_id: int = 0  # Added chat_id parameter for tracking response times
+    chat_id: int = 0,  # Added chat_id parameter for tracking response times
+    post_process: bool = True,
+    history_token_budget: Optional[int] = None,
+    conversation_summary: Optional[str] = None,
+    relevant_messages: Optional[Sequence[Mapping[str, Any]]] = None
 ) -> str:
     """
     Generate a response using Gemini with search results
@@ -519,6 +643,10 @@ async def generate_response_with_search(
         media_analysis: Optional media analysis results
         time_context: Optional time awareness context
         chat_id: The chat ID for tracking response times
+        post_process: Add the Turkish glossary; if False, only strip any glossary the model wrote
+        history_token_budget: Optional maximum tokens of chat history in the prompt
+        conversation_summary: Optional summary of the older messages, added to the context turn
+        relevant_messages: Optional older messages related to the current one, added to the context turn
 
     Returns:
         Generated response
@@ -537,7 +665,7 @@ async def generate_response_with_search(
     logger.debug(f"Created system prompt for language: {language}")
 
     # Format messages for Gemini (now returns a list)
-    history_messages = format_messages_for_gemini(chat_history, system_prompt) # system_prompt is not used by the new format_messages
+    history_messages = format_messages_for_gemini(chat_history, system_prompt, token_budget=history_token_budget) # system_prompt is not used by the new format_messages
     logger.debug(f"Formatted message history: {len(history_messages)} messages")
 
     # Construct the full message list for Gemini, including system prompt and context
@@ -553,6 +681,16 @@ async def generate_response_with_search(
     # Add additional context before the actual history
     additional_context = "" # Initialize additional_context as an empty string
 
+    # Add the summary of the older messages, which are no longer part of the history
+    if conversation_summary:
+        logger.debug("Adding conversation summary to prompt")
+        additional_context += format_summary_context(conversation_summary) + "\n\n"
+
+    # Add the older messages that relate to the current one
+    if relevant_messages:
+        logger.debug(f"Adding {len(relevant_messages)} relevant earlier messages to prompt")
+        additional_context += format_relevant_context(relevant_messages) + "\n\n"
+
     # Add time awareness context if available
     if time_context and config.TIME_AWARENESS_ENABLED:
         logger.debug("Adding time awareness context to prompt")
@@ -686,8 +824,12 @@ async def generate_response_with_search(
             if gpu_manager.gpu_available and end_time - start_time > 10:  # If response took more than 10 seconds
                 gpu_manager.clear_cache()
 
+        # With two-phase delivery the glossary is built after the answer is sent
+        if not post_process:
+            return remove_glossary_sections(response)
+
         # Post-process response to add Turkish translations for uncommon words
-        processed_response = post_process_response(response, language)
+        processed_response = await post_process_response_async(response, language, chat_id=chat_id or None)
         logger.info(f"Post-processed response with Turkish translations for uncommon words")
 
         return processed_response
@@ -736,8 +878,9 @@ async def handle_deepsearch_command(update: Update, context: ContextTypes.DEFAUL
                 detected_language = "English"
             logger.error(f"Error detecting language for deep search: {e}, using {detected_language}")
 
-        # Get chat history
-        chat_history = memory.get_short_memory(chat_id)
+        # Get the newest chat history that fits the deep-search prompt token budget
+        chat_history = memory.get_history_window(chat_id, config.DEEP_SEARCH_HISTORY_TOKEN_BUDGET)
+        relevant_messages = memory.get_relevant_messages(chat_id, search_query, exclude_recent=len(chat_history))
 
         # Get time awareness context if enabled
         time_context = None
@@ -791,7 +934,12 @@ async def handle_deepsearch_command(update: Update, context: ContextTypes.DEFAUL
                     chat_history,
                     search_results,
                     detected_language,
-                    time_context if config.TIME_AWARENESS_ENABLED else None
+                    time_context if config.TIME_AWARENESS_ENABLED else None,
+                    post_process=not config.TWO_PHASE_DELIVERY,
+                    chat_id=chat_id,
+                    history_token_budget=config.DEEP_SEARCH_HISTORY_TOKEN_BUDGET,
+                    conversation_summary=memory.get_summary(chat_id),
+                    relevant_messages=relevant_messages
                 )
 
                 if not response or len(response.strip()) == 0:
@@ -813,7 +961,7 @@ async def handle_deepsearch_command(update: Update, context: ContextTypes.DEFAUL
 
             # Update the progress message with completion notice in the appropriate language
             if detected_language.lower() == "turkish":
-                await initial_message.edit_text(
+                completion_message = await initial_message.edit_text(
                     f"'{search_query}' için derin arama tamamlandı!\n\n"
                     f"{search_results['stats']['queries_used']} farklı arama sorgusu kullanarak "
                     f"{search_results['stats']['unique_urls']} benzersiz web sitesi arandı.\n"
@@ -822,13 +970,15 @@ async def handle_deepsearch_command(update: Update, context: ContextTypes.DEFAUL
                     f"Kapsamlı cevabınız hazırlanıyor..."
                 )
             else:
-                await initial_message.edit_text(
+                completion_message = await initial_message.edit_text(
                     f"Deep search completed for: '{search_query}'\n\n"
                     f"Searched {search_results['stats']['unique_urls']} unique websites using "
                     f"{search_results['stats']['queries_used']} different search queries.\n"
                     f"Total search time: {int(search_results['stats']['total_time']//60)} minutes "
-                    f"{int(search_results['stats']['total_time']%60)} seconds\n\n"
-                    f"Preparing your comprehensive answer..."
+                    f"{int(search_results['stats']['total_time']%60)} seconds\n"
+                    + (f"Glossary time: {search_results['stats']['glossary_time']:.1f} seconds\n"
+                       if 'glossary_time' in search_results['stats'] else "")
+                    + f"\nPreparing your comprehensive answer..."
                 )
 
             # Split the response into chunks if it's too long
@@ -850,16 +1000,17 @@ async def handle_deepsearch_command(update: Update, context: ContextTypes.DEFAUL
 
             # Send each chunk as a separate message
             first_chunk = True
+            sent_message = None
             for chunk in response_chunks:
                 try:
                     if first_chunk:
                         # Send the first chunk as a reply to the original message
-                        await message.reply_text(chunk)
+                        sent_message = await message.reply_text(chunk)
                         logger.info(f"Sent first chunk with length {len(chunk)}")
                         first_chunk = False
                     else:
                         # Send subsequent chunks as regular messages
-                        await context.bot.send_message(chat_id=chat_id, text=chunk)
+                        sent_message = await context.bot.send_message(chat_id=chat_id, text=chunk)
                         logger.info(f"Sent additional chunk with length {len(chunk)}")
 
                     # Add a small delay between messages to avoid rate limiting
@@ -877,7 +1028,11 @@ async def handle_deepsearch_command(update: Update, context: ContextTypes.DEFAUL
                     break
 
             # Add model response to memory (store the full response)
-            memory.add_message(chat_id, "model", response)
+            message_timestamp = memory.add_message(chat_id, "model", response)
+
+            # Deliver the glossary in the background once it's ready
+            if config.TWO_PHASE_DELIVERY:
+                schedule_glossary_delivery(context.bot, chat_id, sent_message, response, detected_language, message_timestamp, completion_message)
 
         except Exception as e:
             # Stop typing indicator if it's running
@@ -923,6 +1078,10 @@ def main() -> None:
     # Register error handler
     application.add_error_handler(error_handler)
 
+    # Summarize older messages in the background
+    if config.SUMMARY_ENABLED:
+        summarizer.start()
+
     try:
         # Start the Bot
         logger.info("Starting bot polling")
@@ -930,10 +1089,17 @@ def main() -> None:
     finally:
         # Shutdown memory system properly
         logger.info("Shutting down bot")
+        summarizer.stop()
         memory.shutdown()
 
-        # Clean up thread pool
+        # Clean up thread pools
         thread_pool.shutdown(wait=False)
+        translation_executor.shutdown(wait=False)
+        glossary_batch_executor.shutdown(wait=False)
+
+        # Close the word translation store
+        translation_store.close()
+        local_dictionary.close()
 
         # Log final GPU stats if available
         if gpu_manager.gpu_available:
@@ -1,46 +1,130 @@
 import os
-import json
 import logging
 import time
 import threading
 import hashlib
-from typing import Dict, List, Any, Optional, Set
-from functools import lru_cache
+from collections import OrderedDict, deque
+from concurrent.futures import ThreadPoolExecutor
+from itertools import islice
+from typing import Deque, Dict, List, Any, Optional, Set, Tuple
 import config
+from chat_message import ChatMessage
+from content_store import content_store
+from memory_archive import MemoryArchive, write_archive
+from memory_storage import MemoryStorage, create_storage
+from retrieval_index import ChatRetrievalIndex
+from token_budget import select_within_budget
 
 # Configure logging
 logger = logging.getLogger(__name__)
 
 class Memory:
     def __init__(self):
-        # Dictionary to store conversations by chat_id
-        self.conversations: Dict[int, List[Dict[str, str]]] = {}
+        # Dictionary to store conversations by chat_id, each a ring buffer of the last LONG_MEMORY_SIZE
+        # immutable message records. Ordered from least to most recently used, at most MEMORY_CACHE_SIZE
+        # chats stay resident
+        self.conversations: "OrderedDict[int, Deque[ChatMessage]]" = OrderedDict()
 
-        # Memory cache to reduce disk I/O
-        self.memory_cache: Dict[int, Dict[str, Any]] = {}
+        # History views per chat_id and kind ("short", "long" or a token-budget window), tagged with the
+        # chat version they were built from. Each change of a chat bumps only that chat's version. Views
+        # are tuples of the stored records, which are immutable, so no message is copied
+        self.chat_versions: Dict[int, int] = {}
+        self.view_cache: Dict[int, Dict[Any, Tuple[int, Tuple[ChatMessage, ...]]]] = {}
+        self.cache_stats: Dict[str, int] = {
+            "hits": 0,
+            "misses": 0,
+            "invalidations": 0
+        }
 
         # Set to track modified conversations that need saving
         self.modified_chats: Set[int] = set()
 
-        # Thread lock for thread safety
+        # Chats with a memory file on disk that haven't been loaded yet (lazy loading)
+        self.unloaded_chats: Set[int] = set()
+
+        # Journal mode: chats whose journal is due for compaction
+        self.compaction_pending: Set[int] = set()
+
+        # Rolling summaries of the messages that left the short window ({"text", "until"} per chat),
+        # chats with enough unsummarized messages, and an event that wakes the summarizer
+        self.summaries: Dict[int, Dict[str, Any]] = {}
+        self.summary_pending: Set[int] = set()
+        self.summary_ready = threading.Event()
+
+        # Retrieval indexes over the long memory of the chats that were queried, built on the
+        # first query and then updated with each added or changed message
+        self.retrieval_indexes: Dict[int, ChatRetrievalIndex] = {}
+
+        # Resident chat counters (evictions of cold chats and on-demand loads from storage)
+        self.resident_stats: Dict[str, float] = {
+            "evictions": 0,
+            "reloads": 0,
+            "reload_time": 0.0,
+            "max_reload_time": 0.0
+        }
+
+        # Global lock for the chat index, the bookkeeping sets and the counters. It is only
+        # held for short in-memory updates, never while reading or writing storage
         self.lock = threading.RLock()
 
+        # Striped locks guarding each chat's messages, views, loading and journal appends, so
+        # work on one chat (including its disk I/O) doesn't block the others. Lock order is
+        # chat lock, then global lock; a thread never waits for a second chat lock
+        self.chat_locks = [threading.RLock() for _ in range(max(1, config.MEMORY_LOCK_STRIPES))]
+
+        # Signalled when a chat becomes dirty or a save finishes, wakes the autosave scheduler
+        self.dirty_condition = threading.Condition(self.lock)
+
+        # Chats whose snapshot is being written right now
+        self.saving_chats: Set[int] = set()
+
+        # Autosave batches are written by a worker pool, outside the lock
+        self.save_executor = ThreadPoolExecutor(max_workers=max(1, config.MEMORY_SAVE_WORKERS),
+                                                thread_name_prefix="memory-save")
+        self.save_stats: Dict[str, float] = {
+            "batches": 0,
+            "chats_saved": 0,
+            "save_time": 0.0
+        }
+
         # Auto-save timer
         self.last_save_time = time.time()
-        self.save_interval = 60  # seconds
+        self.save_interval = config.MEMORY_AUTOSAVE_INTERVAL  # seconds
 
         # Create memory directory if it doesn't exist
         os.makedirs(config.MEMORY_DIR, exist_ok=True)
 
-        # Load existing memories
-        self._load_all_memories()
+        # Where conversations are stored (JSON files or SQLite, see MEMORY_BACKEND)
+        self.storage: MemoryStorage = create_storage()
+
+        # Load existing memories, or only index them and load each chat on first access
+        if config.MEMORY_LAZY_LOADING:
+            self._index_all_memories()
+        else:
+            self._load_all_memories()
+
+        # Take over the chats the previous process had in memory
+        if config.MEMORY_HANDOFF_PATH and os.path.exists(config.MEMORY_HANDOFF_PATH):
+            self._restore_handoff(config.MEMORY_HANDOFF_PATH)
 
         # Start background auto-save thread
         self.running = True
         self.save_thread = threading.Thread(target=self._auto_save_thread, daemon=True)
         self.save_thread.start()
 
-    def add_message(self, chat_id: int, role: str, content: str) -> None:
+    def _chat_lock(self, chat_id: int) -> threading.RLock:
+        """
+        Get the striped lock that guards a chat's messages
+
+        Args:
+            chat_id: The Telegram chat ID
+
+        Returns:
+            The lock shared by all chats of the same stripe
+        """
+        return self.chat_locks[hash(chat_id) % len(self.chat_locks)]
+
+    def add_message(self, chat_id: int, role: str, content: str) -> float:
         """
         Add a message to the conversation history for a specific chat
 
@@ -48,38 +132,99 @@ class Memory:
             chat_id: The Telegram chat ID
             role: Either 'user' or 'model'
             content: The message content
-        """
-        with self.lock:
-            if chat_id not in self.conversations:
-                self.conversations[chat_id] = []
 
-            # Create message object
-            message = {
-                "role": role,
-                "content": content,
-                "timestamp": time.time()
-            }
+        Returns:
+            The message timestamp, which identifies the message for update_message
+        """
+        first_snapshot = None
+        with self._chat_lock(chat_id):
+            self._ensure_loaded(chat_id)
+            with self.lock:
+                conversation = self.conversations.get(chat_id)
+                if conversation is None:
+                    conversation = self.conversations[chat_id] = deque(maxlen=config.LONG_MEMORY_SIZE)
 
-            # Add message to conversation
-            self.conversations[chat_id].append(message)
+            # Create message record, with its prompt token count computed once and its repeated
+            # lines shared with the other messages
+            message = ChatMessage(role, content_store.intern(content), time.time())
 
-            # Trim the conversation if it exceeds the long memory size
-            if len(self.conversations[chat_id]) > config.LONG_MEMORY_SIZE:
-                self.conversations[chat_id] = self.conversations[chat_id][-config.LONG_MEMORY_SIZE:]
+            # Add message to conversation, the ring buffer drops the oldest one once it is full
+            dropped = conversation[0] if len(conversation) == conversation.maxlen else None
+            conversation.append(message)
+            if dropped is not None:
+                content_store.release(dropped.body)
 
-            # Mark this chat as modified
-            self.modified_chats.add(chat_id)
+            # Keep the chat's retrieval index in step with the ring buffer
+            index = self.retrieval_indexes.get(chat_id)
+            if index is not None:
+                index.add(message)
 
             # Clear any cached results for this chat
             self._clear_cache_for_chat(chat_id)
 
-            # Save immediately if this is the first message
-            if len(self.conversations[chat_id]) == 1:
-                self._save_memory(chat_id)
-            # Otherwise, let the auto-save handle it
+            # Save immediately if this is the first message. The copy is taken here, which keeps
+            # the chat from being evicted or saved by the workers, and written after the lock is released
+            if len(conversation) == 1:
+                first_snapshot = self._snapshot_chats([chat_id])
+            # In journal mode, append just this message to the chat's journal
+            elif config.MEMORY_JOURNAL_MODE and self.storage.supports_journal:
+                self._append_journal(chat_id, {"op": "add", **message.to_dict()})
+            # Otherwise, mark this chat as modified and let the auto-save handle it
+            else:
+                self._mark_modified(chat_id)
+
+            # Queue the chat for the summarizer once enough messages left the short window
+            if config.SUMMARY_ENABLED:
+                self._check_summary_due(chat_id, conversation)
+
+        if first_snapshot is not None:
+            self._write_snapshot(*first_snapshot)
 
-    @lru_cache(maxsize=32)
-    def get_short_memory(self, chat_id: int) -> List[Dict[str, str]]:
+        # A new chat may push the least recently used one out
+        self._evict_cold_chats()
+
+        return message.timestamp
+
+    def update_message(self, chat_id: int, timestamp: float, content: str) -> bool:
+        """
+        Replace the content of a stored message, e.g. once its glossary has arrived
+
+        Args:
+            chat_id: The Telegram chat ID
+            timestamp: The timestamp returned by add_message
+            content: The new message content
+
+        Returns:
+            True if the message was found and updated
+        """
+        updated = False
+        with self._chat_lock(chat_id):
+            self._ensure_loaded(chat_id)
+            with self.lock:
+                conversation = self.conversations.get(chat_id, ())
+
+            # Recent messages are at the end, so search backwards
+            for offset, message in enumerate(reversed(conversation)):
+                if message.timestamp == timestamp:
+                    # Records are immutable, replace this one in place in the ring buffer
+                    updated_message = message.replace(content_store.intern(content))
+                    conversation[len(conversation) - 1 - offset] = updated_message
+                    content_store.release(message.body)
+                    index = self.retrieval_indexes.get(chat_id)
+                    if index is not None:
+                        index.update(message, updated_message)
+                    if config.MEMORY_JOURNAL_MODE and self.storage.supports_journal:
+                        self._append_journal(chat_id, {"op": "update", "timestamp": timestamp, "content": content})
+                    else:
+                        self._mark_modified(chat_id)
+                    self._clear_cache_for_chat(chat_id)
+                    updated = True
+                    break
+
+        self._evict_cold_chats()
+        return updated
+
+    def get_short_memory(self, chat_id: int) -> Tuple[ChatMessage, ...]:
         """
         Get the short-term memory (most recent messages) for a specific chat
 
@@ -87,142 +232,620 @@ class Memory:
             chat_id: The Telegram chat ID
 
         Returns:
-            List of message dictionaries with 'role' and 'content' keys
+            Read-only sequence of message records, also readable as mappings with 'role', 'content',
+            'timestamp' and 'tokens' keys
+        """
+        return self._get_view(chat_id, "short")
+
+    def get_long_memory(self, chat_id: int) -> Tuple[ChatMessage, ...]:
+        """
+        Get the long-term memory (all stored messages) for a specific chat
+
+        Args:
+            chat_id: The Telegram chat ID
+
+        Returns:
+            Read-only sequence of message records, also readable as mappings with 'role', 'content',
+            'timestamp' and 'tokens' keys
+        """
+        return self._get_view(chat_id, "long")
+
+    def get_history_window(self, chat_id: int, token_budget: Optional[int] = None,
+                           max_messages: Optional[int] = None) -> Tuple[ChatMessage, ...]:
+        """
+        Get the newest messages of a chat that fit a prompt token budget
+
+        Token counts are computed once when a message is added, so selecting a
+        window only sums cached numbers. The newest message is always included.
+
+        Args:
+            chat_id: The Telegram chat ID
+            token_budget: Maximum total tokens, defaults to HISTORY_TOKEN_BUDGET (0 for no limit)
+            max_messages: Maximum number of messages, defaults to SHORT_MEMORY_SIZE
+
+        Returns:
+            Read-only sequence of message records, also readable as mappings with 'role', 'content',
+            'timestamp' and 'tokens' keys
+        """
+        if token_budget is None:
+            token_budget = config.HISTORY_TOKEN_BUDGET
+        if max_messages is None:
+            max_messages = config.SHORT_MEMORY_SIZE
+        return self._get_view(chat_id, ("window", token_budget, max_messages))
+
+    def _get_view(self, chat_id: int, kind: Any) -> Tuple[ChatMessage, ...]:
+        """
+        Get a cached read-only view of a chat's history, rebuilding it if the chat changed
+
+        Args:
+            chat_id: The Telegram chat ID
+            kind: "short" for the last SHORT_MEMORY_SIZE messages, "long" for all of them,
+                or ("window", token_budget, max_messages) for a token-budget window
+
+        Returns:
+            Tuple of message records
+        """
+        with self._chat_lock(chat_id):
+            self._ensure_loaded(chat_id)
+
+            version = self.chat_versions.get(chat_id, 0)
+            cached = self.view_cache.get(chat_id, {}).get(kind)
+            if cached is not None and cached[0] == version:
+                with self.lock:
+                    self.cache_stats["hits"] += 1
+                view = cached[1]
+            else:
+                with self.lock:
+                    self.cache_stats["misses"] += 1
+                    messages = self.conversations.get(chat_id, ())
+                if kind == "short":
+                    # Walk back from the newest message, so this costs O(SHORT_MEMORY_SIZE) however long the chat is
+                    view = tuple(islice(reversed(messages), config.SHORT_MEMORY_SIZE))[::-1]
+                elif kind == "long":
+                    view = tuple(messages)
+                else:
+                    _, token_budget, max_messages = kind
+                    view = tuple(select_within_budget(reversed(messages), token_budget, max_messages))
+                self.view_cache.setdefault(chat_id, {})[kind] = (version, view)
+
+        self._evict_cold_chats()
+        return view
+
+    def get_relevant_messages(self, chat_id: int, query: str, k: Optional[int] = None,
+                              exclude_recent: int = 0) -> Tuple[ChatMessage, ...]:
+        """
+        Find the older messages of a chat that are most related to a text
+
+        Uses a TF-IDF index over the chat's long memory, built on the first call
+        and updated incrementally by add_message, so a lookup doesn't call any API.
+
+        Args:
+            chat_id: The Telegram chat ID
+            query: The text to match, usually the message being answered
+            k: Maximum number of messages, defaults to RETRIEVAL_TOP_K
+            exclude_recent: Skip this many of the newest messages, e.g. those already in the history window
+
+        Returns:
+            Read-only sequence of message records, oldest first
+        """
+        if not config.RETRIEVAL_ENABLED:
+            return ()
+        if k is None:
+            k = config.RETRIEVAL_TOP_K
+
+        with self._chat_lock(chat_id):
+            self._ensure_loaded(chat_id)
+            with self.lock:
+                conversation = self.conversations.get(chat_id, ())
+
+            index = self.retrieval_indexes.get(chat_id)
+            if index is None and conversation:
+                index = ChatRetrievalIndex(conversation.maxlen or config.LONG_MEMORY_SIZE, config.RETRIEVAL_DIM)
+                for message in conversation:
+                    index.add(message)
+                self.retrieval_indexes[chat_id] = index
+
+            view = tuple(index.query(query, k, exclude_recent, config.RETRIEVAL_MIN_SCORE)) if index is not None else ()
+
+        self._evict_cold_chats()
+        return view
+
+    def get_summary(self, chat_id: int) -> Optional[str]:
+        """
+        Get the rolling summary of a chat's older messages
+
+        Args:
+            chat_id: The Telegram chat ID
+
+        Returns:
+            The summary text, or None if nothing has been summarized yet
+        """
+        with self._chat_lock(chat_id):
+            self._ensure_loaded(chat_id)
+            summary = self.summaries.get(chat_id)
+
+        self._evict_cold_chats()
+        return summary["text"] if summary else None
+
+    @staticmethod
+    def _count_outside_history_window(conversation: Deque[ChatMessage]) -> int:
+        """
+        Count the oldest messages of a chat that no prompt's history window includes
+
+        Prompts carry the newest messages that fit HISTORY_TOKEN_BUDGET (or the
+        smaller DEEP_SEARCH_HISTORY_TOKEN_BUDGET for deep searches), at most
+        SHORT_MEMORY_SIZE of them. Everything older than the narrowest of these
+        windows belongs in the summary, so no message is left out of both.
+
+        Args:
+            conversation: The chat's messages
+
+        Returns:
+            Number of messages at the start of the conversation that are outside the window
+        """
+        budgets = [budget for budget in (config.HISTORY_TOKEN_BUDGET, config.DEEP_SEARCH_HISTORY_TOKEN_BUDGET) if budget > 0]
+        window = select_within_budget(reversed(conversation), min(budgets) if budgets else None, config.SHORT_MEMORY_SIZE)
+        return len(conversation) - len(window)
+
+    def _check_summary_due(self, chat_id: int, conversation: Deque[ChatMessage]) -> None:
+        """
+        Queue a chat for summarization if SUMMARY_BATCH_MESSAGES messages left the history window unsummarized
+
+        The caller must hold the chat's lock.
+
+        Args:
+            chat_id: The Telegram chat ID
+            conversation: The chat's messages
+        """
+        overflow = self._count_outside_history_window(conversation)
+        if overflow < config.SUMMARY_BATCH_MESSAGES or chat_id in self.summary_pending:
+            return
+
+        until = self.summaries.get(chat_id, {}).get("until", 0.0)
+        unsummarized = sum(1 for msg in islice(conversation, overflow) if msg.timestamp > until)
+        if unsummarized >= config.SUMMARY_BATCH_MESSAGES:
+            with self.lock:
+                self.summary_pending.add(chat_id)
+            self.summary_ready.set()
+
+    def take_summary_batch(self, max_chats: int) -> List[Tuple[int, Optional[str], List[Tuple[str, str]], float]]:
+        """
+        Take the work for one summarization request off the queue
+
+        Args:
+            max_chats: Maximum number of chats in the batch
+
+        Returns:
+            (chat_id, previous summary, [(role, content), ...] messages to fold in, timestamp of the
+            last of them) per chat; an empty list when no chat is due
         """
         with self.lock:
-            if chat_id not in self.conversations:
-                return []
+            chat_ids = list(islice(self.summary_pending, max_chats))
+            self.summary_pending.difference_update(chat_ids)
+            if not self.summary_pending:
+                self.summary_ready.clear()
 
-            # Get the most recent messages up to SHORT_MEMORY_SIZE
-            messages = self.conversations[chat_id][-config.SHORT_MEMORY_SIZE:]
+        batch = []
+        for chat_id in chat_ids:
+            with self._chat_lock(chat_id):
+                with self.lock:
+                    conversation = self.conversations.get(chat_id)
+                if not conversation:
+                    continue
 
-            # For compatibility with the rest of the code, return only role and content
-            return [{'role': msg['role'], 'content': msg['content']} for msg in messages]
+                summary = self.summaries.get(chat_id)
+                until = summary["until"] if summary else 0.0
+                overflow = self._count_outside_history_window(conversation)
+                messages = [msg for msg in islice(conversation, overflow) if msg.timestamp > until]
+                if messages:
+                    batch.append((chat_id, summary["text"] if summary else None,
+                                  [(msg.role, msg.content) for msg in messages], messages[-1].timestamp))
+        return batch
 
-    @lru_cache(maxsize=32)
-    def get_long_memory(self, chat_id: int) -> List[Dict[str, str]]:
+    def set_summary(self, chat_id: int, text: str, until: float) -> None:
         """
-        Get the long-term memory (all stored messages) for a specific chat
+        Store a chat's new rolling summary
 
         Args:
             chat_id: The Telegram chat ID
+            text: The summary text
+            until: Timestamp of the last message the summary covers
+        """
+        with self._chat_lock(chat_id):
+            current = self.summaries.get(chat_id)
+            if current and current["until"] >= until:
+                return
+
+            summary = {"text": text, "until": until}
+            with self.lock:
+                # A chat evicted meanwhile loads its summary from storage again
+                if chat_id in self.conversations:
+                    self.summaries[chat_id] = summary
+            try:
+                self.storage.save_summary(chat_id, summary)
+            except Exception as e:
+                logger.error(f"Error saving summary for chat {chat_id}: {e}")
+
+    def get_cache_stats(self) -> Dict[str, Any]:
+        """
+        Get hit/miss statistics of the history view cache
+
+        Returns:
+            Dictionary with the counters, the hit rate and the number of cached views
+        """
+        with self.lock:
+            stats = dict(self.cache_stats)
+            stats["cached_views"] = sum(len(views) for views in self.view_cache.values())
+
+        lookups = stats["hits"] + stats["misses"]
+        stats["hit_rate"] = stats["hits"] / lookups if lookups else 0.0
+        return stats
+
+    def get_resident_stats(self) -> Dict[str, Any]:
+        """
+        Get statistics of the chats kept in memory
 
         Returns:
-            List of message dictionaries with 'role' and 'content' keys
+            Dictionary with the resident count and limit, evictions, reloads and reload latency
         """
         with self.lock:
-            if chat_id not in self.conversations:
-                return []
+            stats = dict(self.resident_stats)
+            stats["resident"] = len(self.conversations)
+            stats["limit"] = config.MEMORY_CACHE_SIZE
 
-            # For compatibility with the rest of the code, return only role and content
-            return [{'role': msg['role'], 'content': msg['content']} for msg in self.conversations[chat_id]]
+        stats["avg_reload_time"] = stats["reload_time"] / stats["reloads"] if stats["reloads"] else 0.0
+        return stats
 
-    def _get_memory_file_path(self, chat_id: int) -> str:
+    def has_conversation(self, chat_id: int) -> bool:
         """
-        Get the file path for a specific chat's memory file
+        Check whether a chat has any stored messages
 
         Args:
             chat_id: The Telegram chat ID
 
         Returns:
-            Path to the memory file
+            True if the chat has at least one message
         """
-        return os.path.join(config.MEMORY_DIR, f"memory_{chat_id}.json")
+        with self._chat_lock(chat_id):
+            self._ensure_loaded(chat_id)
+            with self.lock:
+                found = bool(self.conversations.get(chat_id))
 
-    def _save_memory(self, chat_id: int) -> None:
+        self._evict_cold_chats()
+        return found
+
+    def _ensure_loaded(self, chat_id: int) -> None:
         """
-        Save a specific chat's memory to disk
+        Load a chat's memory from disk if it is known but hasn't been loaded yet
+
+        The caller must hold the chat's lock.
 
         Args:
             chat_id: The Telegram chat ID
         """
         with self.lock:
-            if chat_id not in self.conversations:
+            if chat_id in self.conversations:
+                # Mark the chat as most recently used
+                self.conversations.move_to_end(chat_id)
                 return
+            if chat_id not in self.unloaded_chats:
+                return
+            self.unloaded_chats.discard(chat_id)
+
+        # Read outside the global lock, other chats stay available meanwhile
+        start_time = time.time()
+        self._load_memory(chat_id)
+        load_time = time.time() - start_time
 
+        with self.lock:
+            self.resident_stats["reloads"] += 1
+            self.resident_stats["reload_time"] += load_time
+            self.resident_stats["max_reload_time"] = max(self.resident_stats["max_reload_time"], load_time)
+
+    def _evict_cold_chats(self) -> None:
+        """
+        Flush and drop the least recently used chats once more than MEMORY_CACHE_SIZE are resident
+
+        Evicted chats go back to the unloaded set and are reloaded from storage on their
+        next access. A chat whose unsaved changes can't be written stays resident. Must be
+        called without holding a chat lock.
+        """
+        with self.lock:
+            excess = len(self.conversations) - config.MEMORY_CACHE_SIZE
+            if config.MEMORY_CACHE_SIZE <= 0 or excess <= 0:
+                return
+
+            # Never evict the most recently used chat, it is the one being accessed,
+            # nor chats that are being written by the autosave workers
+            cold = [chat_id for chat_id in islice(self.conversations, len(self.conversations) - 1)
+                    if chat_id not in self.saving_chats][:excess]
+
+        for chat_id in cold:
+            chat_lock = self._chat_lock(chat_id)
+
+            # A chat another thread is using right now isn't cold, leave it
+            if not chat_lock.acquire(blocking=False):
+                continue
             try:
-                memory_file = self._get_memory_file_path(chat_id)
-                temp_file = f"{memory_file}.tmp"
+                # Write pending changes (full saves and journal compactions) first
+                if chat_id in self.modified_chats or chat_id in self.compaction_pending:
+                    self._save_chats([chat_id])
 
-                # First write to a temporary file
-                with open(temp_file, 'w', encoding='utf-8') as f:
-                    json.dump(self.conversations[chat_id], f, ensure_ascii=False, indent=2)
+                with self.lock:
+                    if (len(self.conversations) <= config.MEMORY_CACHE_SIZE or chat_id not in self.conversations
+                            or chat_id in self.modified_chats or chat_id in self.compaction_pending
+                            or chat_id in self.saving_chats):
+                        continue
+                    conversation = self.conversations.pop(chat_id)
+                    self.chat_versions.pop(chat_id, None)
+                    self.unloaded_chats.add(chat_id)
+                    self.summary_pending.discard(chat_id)
+                    self.resident_stats["evictions"] += 1
 
-                # Then rename it to the actual file (atomic operation)
-                os.replace(temp_file, memory_file)
+                # The summary is already stored, it is loaded again with the chat
+                self.summaries.pop(chat_id, None)
+                self.view_cache.pop(chat_id, None)
+                self.retrieval_indexes.pop(chat_id, None)
+                for message in conversation:
+                    content_store.release(message.body)
+            finally:
+                chat_lock.release()
 
-                # Remove from modified set
-                if chat_id in self.modified_chats:
-                    self.modified_chats.remove(chat_id)
+    def _append_journal(self, chat_id: int, record: Dict[str, Any]) -> None:
+        """
+        Append one record to a chat's journal instead of rewriting its memory file
 
-                logger.debug(f"Saved memory for chat {chat_id} to {memory_file}")
-            except Exception as e:
-                logger.error(f"Error saving memory for chat {chat_id}: {e}")
+        The caller must hold the chat's lock.
 
-    def _load_memory(self, chat_id: int) -> None:
+        Args:
+            chat_id: The Telegram chat ID
+            record: An {"op": "add", ...message} or {"op": "update", "timestamp", "content"} record
+        """
+        try:
+            self.storage.append(chat_id, record)
+
+            # Let the background compactor rewrite the snapshot once the journal is long enough
+            if self.storage.needs_compaction(chat_id):
+                with self.dirty_condition:
+                    if chat_id not in self.compaction_pending:
+                        self.compaction_pending.add(chat_id)
+                        self.dirty_condition.notify()
+        except Exception as e:
+            logger.error(f"Error appending to journal for chat {chat_id}: {e}")
+            # Fall back to a full save
+            self._mark_modified(chat_id)
+
+    def _mark_modified(self, chat_id: int) -> None:
         """
-        Load a specific chat's memory from disk
+        Mark a chat as needing a full save and wake the autosave scheduler
 
         Args:
             chat_id: The Telegram chat ID
         """
-        memory_file = self._get_memory_file_path(chat_id)
-        if os.path.exists(memory_file):
-            try:
-                with open(memory_file, 'r', encoding='utf-8') as f:
-                    loaded_data = json.load(f)
+        with self.dirty_condition:
+            if chat_id not in self.modified_chats:
+                self.modified_chats.add(chat_id)
+                self.dirty_condition.notify()
+
+    def _save_chats(self, chat_ids: List[int]) -> None:
+        """
+        Save several chats' memories now, with one storage call (one transaction for SQLite)
 
-                # Ensure all messages have a timestamp
-                for msg in loaded_data:
-                    if 'timestamp' not in msg:
-                        msg['timestamp'] = time.time()
+        Args:
+            chat_ids: The Telegram chat IDs
+        """
+        batch = self._snapshot_chats(chat_ids)
+        if batch is not None:
+            self._write_snapshot(*batch)
 
-                with self.lock:
-                    self.conversations[chat_id] = loaded_data
+    def _snapshot_chats(self, chat_ids: List[int]) -> Optional[Tuple[Dict[int, List[ChatMessage]], Dict[int, int], Dict[int, int]]]:
+        """
+        Copy the messages of several chats so they can be written without holding the lock
 
-                logger.info(f"Loaded memory for chat {chat_id} with {len(self.conversations[chat_id])} messages")
-            except Exception as e:
-                logger.error(f"Error loading memory for chat {chat_id}: {e}")
-                # Initialize empty conversation if loading fails
+        Chats that are already being written are skipped, they stay dirty and are
+        picked up by the next save. Each chat is copied under its own lock, so the
+        caller must not hold the lock of another chat.
+
+        Args:
+            chat_ids: The Telegram chat IDs
+
+        Returns:
+            (messages, chat versions, journal marks) per chat, or None if there is nothing to write
+        """
+        conversations, versions, journal_marks = {}, {}, {}
+        for chat_id in chat_ids:
+            with self._chat_lock(chat_id):
                 with self.lock:
-                    self.conversations[chat_id] = []
+                    conversation = self.conversations.get(chat_id)
+                    if conversation is None:
+                        # Only resident chats have anything to write
+                        self.modified_chats.discard(chat_id)
+                        self.compaction_pending.discard(chat_id)
+                        continue
+                    if chat_id in self.saving_chats:
+                        continue
+                    self.saving_chats.add(chat_id)
+
+                # The records are immutable, so copying the list is enough
+                conversations[chat_id] = list(conversation)
+                versions[chat_id] = self.chat_versions.get(chat_id, 0)
+                journal_marks[chat_id] = self.storage.journal_mark(chat_id)
+
+        if not conversations:
+            return None
+        return conversations, versions, journal_marks
+
+    def _write_snapshot(self, conversations: Dict[int, List[ChatMessage]], versions: Dict[int, int],
+                        journal_marks: Dict[int, int]) -> None:
+        """
+        Write a snapshot taken by _snapshot_chats and mark the chats clean if they didn't change since
+
+        Args:
+            conversations: The copied messages per chat
+            versions: The chat versions the copies were taken at
+            journal_marks: The journal positions the copies include
+        """
+        saved = False
+        start_time = time.time()
+        try:
+            self.storage.save_many(conversations, journal_marks)
+            saved = True
+        except Exception as e:
+            logger.error(f"Error saving memory for chats {list(conversations)}: {e}")
+
+        with self.dirty_condition:
+            self.saving_chats.difference_update(conversations)
+            if saved:
+                self.save_stats["batches"] += 1
+                self.save_stats["chats_saved"] += len(conversations)
+                self.save_stats["save_time"] += time.time() - start_time
+
+                # Remove from modified and pending sets, unless the chat changed in the meantime
+                for chat_id in conversations:
+                    if self.chat_versions.get(chat_id, 0) == versions[chat_id]:
+                        self.modified_chats.discard(chat_id)
+                    if not self.storage.needs_compaction(chat_id):
+                        self.compaction_pending.discard(chat_id)
+
+            # Let the scheduler pick up chats that became dirty during the write
+            self.dirty_condition.notify_all()
+
+    def _load_memory(self, chat_id: int) -> None:
+        """
+        Load a specific chat's memory from storage
+
+        Args:
+            chat_id: The Telegram chat ID
+        """
+        try:
+            loaded_data = self.storage.load(chat_id)
+            if loaded_data is None:
+                return
+            # Records get a timestamp if the stored message has none, count their tokens and share
+            # their repeated lines
+            loaded_data = deque(
+                (ChatMessage(msg["role"], content_store.intern(msg["content"]), msg.get("timestamp"))
+                 for msg in loaded_data[-config.LONG_MEMORY_SIZE:]),
+                maxlen=config.LONG_MEMORY_SIZE
+            )
+
+            summary = self.storage.load_summary(chat_id)
+            if summary:
+                self.summaries[chat_id] = summary
+
+            with self.dirty_condition:
+                self.conversations[chat_id] = loaded_data
+                if self.storage.needs_compaction(chat_id):
+                    self.compaction_pending.add(chat_id)
+                    self.dirty_condition.notify()
+
+            logger.info(f"Loaded memory for chat {chat_id} with {len(loaded_data)} messages")
+        except Exception as e:
+            logger.error(f"Error loading memory for chat {chat_id}: {e}")
+            # Initialize empty conversation if loading fails
+            with self.lock:
+                self.conversations[chat_id] = deque(maxlen=config.LONG_MEMORY_SIZE)
+
+    def _index_all_memories(self) -> None:
+        """
+        Record which chats have memories on disk without loading them
+        """
+        try:
+            chat_ids = self.storage.list_chats()
+            with self.lock:
+                self.unloaded_chats.update(chat_ids)
+            logger.info(f"Indexed {len(chat_ids)} memory files for lazy loading")
+        except Exception as e:
+            logger.error(f"Error indexing memories: {e}")
 
     def _load_all_memories(self) -> None:
         """
         Load all memories from disk
         """
         try:
-            # Get all memory files
-            memory_files = [f for f in os.listdir(config.MEMORY_DIR) if f.startswith("memory_") and f.endswith(".json")]
-            logger.info(f"Found {len(memory_files)} memory files to load")
+            # Get all stored chats
+            chat_ids = self.storage.list_chats()
+            logger.info(f"Found {len(chat_ids)} memory files to load")
 
-            # Load each memory file
-            for memory_file in memory_files:
+            # Load each memory file, the chats beyond MEMORY_CACHE_SIZE are loaded on first access
+            limit = config.MEMORY_CACHE_SIZE if config.MEMORY_CACHE_SIZE > 0 else len(chat_ids)
+            with self.lock:
+                self.unloaded_chats.update(chat_ids[limit:])
+            for chat_id in chat_ids[:limit]:
                 try:
-                    # Extract chat_id from filename (memory_CHATID.json)
-                    chat_id = int(memory_file.split('_')[1].split('.')[0])
                     self._load_memory(chat_id)
                 except Exception as e:
-                    logger.error(f"Error processing memory file {memory_file}: {e}")
+                    logger.error(f"Error processing memory file for chat {chat_id}: {e}")
         except Exception as e:
             logger.error(f"Error loading memories: {e}")
 
     def _auto_save_thread(self) -> None:
         """
-        Background thread that periodically saves modified conversations
+        Background scheduler that saves dirty conversations
+
+        It sleeps until a chat becomes dirty. Journals due for compaction are
+        written right away, modified chats at most once per save_interval, so a
+        burst of changes is coalesced into one batch. Batches are written by the
+        worker pool, so the scheduler and add_message never wait for the disk.
         """
-        while self.running:
+        while True:
             try:
-                # Sleep for a short interval
-                time.sleep(5)
-
-                # Check if it's time to save
-                current_time = time.time()
-                if current_time - self.last_save_time >= self.save_interval:
-                    self._save_all_modified()
-                    self.last_save_time = current_time
+                with self.dirty_condition:
+                    while self.running:
+                        pending = self.compaction_pending - self.saving_chats
+                        modified = self.modified_chats - self.saving_chats
+                        wait_time = self.last_save_time + self.save_interval - time.time()
+                        if pending or (modified and wait_time <= 0):
+                            break
+                        # With nothing due, sleep until notified (or until the interval is over)
+                        self.dirty_condition.wait(timeout=wait_time if modified else None)
+
+                    if not self.running:
+                        return
+
+                    chat_ids = set(pending)
+                    if modified and wait_time <= 0:
+                        chat_ids |= modified
+                        self.last_save_time = time.time()
+
+                # Copy the chats under their own locks, after releasing the global one
+                batch = self._snapshot_chats(list(chat_ids))
+                if batch is not None:
+                    self._submit_batch(*batch)
             except Exception as e:
                 logger.error(f"Error in auto-save thread: {e}")
+                time.sleep(1)
+
+    def _submit_batch(self, conversations: Dict[int, List[ChatMessage]], versions: Dict[int, int],
+                      journal_marks: Dict[int, int]) -> None:
+        """
+        Hand a snapshot to the save workers, split across them if the backend allows parallel writes
+        """
+        chat_ids = list(conversations)
+        chunks = max(1, config.MEMORY_SAVE_WORKERS) if self.storage.supports_parallel_writes else 1
+        logger.debug(f"Auto-saving {len(chat_ids)} conversations in {min(chunks, len(chat_ids))} batches")
+
+        for i in range(min(chunks, len(chat_ids))):
+            part = chat_ids[i::chunks]
+            self.save_executor.submit(
+                self._write_snapshot,
+                {chat_id: conversations[chat_id] for chat_id in part},
+                {chat_id: versions[chat_id] for chat_id in part},
+                {chat_id: journal_marks[chat_id] for chat_id in part}
+            )
+
+    def get_save_stats(self) -> Dict[str, Any]:
+        """
+        Get statistics of the autosave
+
+        Returns:
+            Dictionary with the written batches and chats, the time spent writing and the dirty chat count
+        """
+        with self.lock:
+            stats = dict(self.save_stats)
+            stats["dirty"] = len(self.modified_chats | self.compaction_pending)
+            stats["in_flight"] = len(self.saving_chats)
+        return stats
 
     def _save_all_modified(self) -> None:
         """
@@ -233,24 +856,187 @@ class Memory:
 
         if modified:
             logger.debug(f"Auto-saving {len(modified)} modified conversations")
-            for chat_id in modified:
-                self._save_memory(chat_id)
+            self._save_chats(modified)
+
+    def _compact_pending(self) -> None:
+        """
+        Rewrite the snapshots of chats whose journals reached MEMORY_JOURNAL_COMPACT_RECORDS
+        """
+        with self.lock:
+            pending = list(self.compaction_pending)
+
+        if pending:
+            logger.debug(f"Compacting journals of {len(pending)} conversations")
+            self._save_chats(pending)
 
     def _clear_cache_for_chat(self, chat_id: int) -> None:
         """
         Clear cached memory results for a specific chat
         """
-        # Clear the LRU cache for this chat
-        self.get_short_memory.cache_clear()
-        self.get_long_memory.cache_clear()
+        with self.lock:
+            # Bump the chat's version so its cached views are rebuilt; other chats keep theirs
+            self.chat_versions[chat_id] = self.chat_versions.get(chat_id, 0) + 1
+            self.view_cache.pop(chat_id, None)
+            self.cache_stats["invalidations"] += 1
+
+    def export_snapshot(self, path: str, resident_only: bool = False) -> int:
+        """
+        Write all conversations and summaries into one archive file (see memory_archive.py)
+
+        Resident chats are archived as they are in memory, including unsaved
+        changes; the others are read from storage one at a time without
+        becoming resident.
+
+        Args:
+            path: The archive to write
+            resident_only: Only archive the chats currently in memory
+
+        Returns:
+            Number of archived chats
+        """
+        with self.lock:
+            chat_ids = list(self.conversations)
+            if not resident_only:
+                chat_ids.extend(sorted(self.unloaded_chats))
+
+        def chats():
+            for chat_id in chat_ids:
+                with self._chat_lock(chat_id):
+                    with self.lock:
+                        conversation = self.conversations.get(chat_id)
+                    try:
+                        if conversation is not None:
+                            messages = list(conversation)
+                            summary = self.summaries.get(chat_id)
+                        else:
+                            messages = self.storage.load(chat_id) or []
+                            summary = self.storage.load_summary(chat_id)
+                    except Exception as e:
+                        logger.error(f"Skipping chat {chat_id} during export: {e}")
+                        continue
+                if messages:
+                    yield chat_id, messages[-config.LONG_MEMORY_SIZE:], summary
+
+        return write_archive(path, chats())
+
+    def import_snapshot(self, path: str, chat_ids: Optional[List[int]] = None, persist: bool = True) -> int:
+        """
+        Restore conversations from an archive written by export_snapshot
+
+        Each chat's frame is read by its offset, so single chats can be
+        restored from a large archive. Restored chats replace the current ones
+        and become resident; colder chats are evicted as usual.
+
+        Args:
+            path: The archive to read
+            chat_ids: Chats to restore, defaults to all archived chats
+            persist: Write the restored chats to storage with the next autosave; False for archives
+                that match storage already, like a warm-state handoff
+
+        Returns:
+            Number of restored chats
+        """
+        restored = 0
+        with MemoryArchive(path) as archive:
+            for chat_id in (chat_ids if chat_ids is not None else archive.chat_ids()):
+                if chat_id not in archive:
+                    logger.warning(f"Chat {chat_id} is not in memory archive {path}")
+                    continue
+                try:
+                    messages, summary = archive.read(chat_id)
+                except ValueError as e:
+                    logger.error(f"Skipping chat {chat_id} during restore: {e}")
+                    continue
+                self._restore_chat(chat_id, messages, summary, persist)
+                restored += 1
+
+        self._evict_cold_chats()
+        logger.info(f"Restored {restored} chats from memory archive {path}")
+        return restored
+
+    def _restore_chat(self, chat_id: int, messages: List[Dict[str, Any]], summary: Optional[Dict[str, Any]],
+                      persist: bool) -> None:
+        """
+        Replace a chat's conversation and summary with archived ones
+
+        Args:
+            chat_id: The Telegram chat ID
+            messages: The archived messages
+            summary: The archived summary, or None
+            persist: Also write them to storage
+        """
+        conversation = deque(
+            (ChatMessage(msg["role"], content_store.intern(msg["content"]), msg.get("timestamp"))
+             for msg in messages[-config.LONG_MEMORY_SIZE:]),
+            maxlen=config.LONG_MEMORY_SIZE
+        )
+        with self._chat_lock(chat_id):
+            with self.lock:
+                previous = self.conversations.pop(chat_id, ())
+                self.conversations[chat_id] = conversation
+                self.unloaded_chats.discard(chat_id)
+            for message in previous:
+                content_store.release(message.body)
+
+            if summary:
+                self.summaries[chat_id] = summary
+            else:
+                self.summaries.pop(chat_id, None)
+            self.retrieval_indexes.pop(chat_id, None)
+            self._clear_cache_for_chat(chat_id)
+
+            if persist:
+                if summary:
+                    try:
+                        self.storage.save_summary(chat_id, summary)
+                    except Exception as e:
+                        logger.error(f"Error saving summary for chat {chat_id}: {e}")
+                self._mark_modified(chat_id)
+
+    def _restore_handoff(self, path: str) -> None:
+        """
+        Load the chats a previous process left in a warm-state handoff archive, then remove it
+
+        The archive is written by shutdown after the final save, so storage
+        already has the same messages and nothing needs to be written back.
+
+        Args:
+            path: The handoff archive
+        """
+        start_time = time.time()
+        try:
+            restored = self.import_snapshot(path, persist=False)
+            logger.info(f"Warm start: took over {restored} chats in {time.time() - start_time:.3f}s")
+        except Exception as e:
+            logger.error(f"Error restoring memory handoff from {path}: {e}")
+        try:
+            os.remove(path)
+        except OSError as e:
+            logger.error(f"Error removing memory handoff {path}: {e}")
 
     def shutdown(self) -> None:
         """
         Properly shut down the memory system, saving any pending changes
         """
         logger.info("Shutting down memory system")
-        self.running = False
+        with self.dirty_condition:
+            self.running = False
+            self.dirty_condition.notify_all()
         if hasattr(self, 'save_thread') and self.save_thread.is_alive():
             self.save_thread.join(timeout=10)
+
+        # Wait for the batches in flight, then write whatever is still dirty
+        self.save_executor.shutdown(wait=True)
         self._save_all_modified()
-        logger.info("Memory system shutdown complete")
+        self._compact_pending()
+
+        # Hand the resident chats over to the next start, unless storage is behind them
+        if config.MEMORY_HANDOFF_PATH and self.modified_chats:
+            logger.warning("Not writing a memory handoff, some chats couldn't be saved")
+        elif config.MEMORY_HANDOFF_PATH:
+            try:
+                self.export_snapshot(config.MEMORY_HANDOFF_PATH, resident_only=True)
+            except Exception as e:
+                logger.error(f"Error writing memory handoff to {config.MEMORY_HANDOFF_PATH}: {e}")
+        self.storage.close()
+        logger.info(f"Memory system shutdown complete: {self.get_resident_stats()}, {self.get_save_stats()}")
@@ -0,0 +1,236 @@
+import os
+import sys
+import json
+import time
+import zlib
+import struct
+import logging
+from typing import Any, Dict, Iterable, List, Mapping, Optional, Tuple
+import config
+from memory_storage import create_storage
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+# Archive layout: header, one frame per chat, the index of the frames, footer.
+# Frames and index are compact UTF-8 JSON; header and footer are fixed-size big-endian structs
+ARCHIVE_MAGIC = b"TAILSMEM"
+ARCHIVE_VERSION = 1
+HEADER = struct.Struct(">8sHd")   # magic, version, creation time
+FOOTER = struct.Struct(">QQ8s")   # index offset, index length, magic
+
+# A chat as stored in an archive: its messages and its rolling summary (or None)
+ArchivedChat = Tuple[List[Dict[str, Any]], Optional[Dict[str, Any]]]
+
+def write_archive(path: str, chats: Iterable[Tuple[int, List[Mapping[str, Any]], Optional[Dict[str, Any]]]]) -> int:
+    """
+    Stream conversations into one archive file
+
+    Each chat is one frame, written as soon as it is produced, so the
+    conversations never have to be in memory all at once. The index of frame
+    offsets goes at the end. The archive is written to a temporary file and
+    renamed, so readers never see a partial archive.
+
+    Args:
+        path: The archive to write
+        chats: (chat_id, messages, summary) tuples; messages may be dicts or ChatMessage records
+
+    Returns:
+        Number of archived chats
+    """
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+
+    index: Dict[str, List[int]] = {}
+    temp_file = f"{path}.tmp"
+    with open(temp_file, 'wb') as f:
+        f.write(HEADER.pack(ARCHIVE_MAGIC, ARCHIVE_VERSION, time.time()))
+        for chat_id, messages, summary in chats:
+            frame = json.dumps({
+                "messages": [{"role": msg["role"], "content": msg["content"], "timestamp": msg.get("timestamp")}
+                             for msg in messages],
+                "summary": summary
+            }, ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+            index[str(chat_id)] = [f.tell(), len(frame), zlib.crc32(frame)]
+            f.write(frame)
+
+        index_data = json.dumps(index, separators=(',', ':')).encode('utf-8')
+        index_offset = f.tell()
+        f.write(index_data)
+        f.write(FOOTER.pack(index_offset, len(index_data), ARCHIVE_MAGIC))
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(temp_file, path)
+
+    logger.info(f"Wrote {len(index)} chats to memory archive {path}")
+    return len(index)
+
+class MemoryArchive:
+    """
+    Reader of an archive written by write_archive
+
+    Only the header and the index are read when it is opened; each chat is
+    read on request by seeking to its frame, so a restore can pick single
+    chats out of a large archive.
+    """
+    def __init__(self, path: str):
+        self.path = path
+        self.file = open(path, 'rb')
+        try:
+            magic, version, self.created = HEADER.unpack(self.file.read(HEADER.size))
+            if magic != ARCHIVE_MAGIC:
+                raise ValueError(f"{path} is not a memory archive")
+            if version != ARCHIVE_VERSION:
+                raise ValueError(f"Unsupported memory archive version {version} in {path}")
+
+            self.file.seek(-FOOTER.size, os.SEEK_END)
+            index_offset, index_length, magic = FOOTER.unpack(self.file.read(FOOTER.size))
+            if magic != ARCHIVE_MAGIC:
+                raise ValueError(f"Memory archive {path} is truncated")
+            self.file.seek(index_offset)
+            self.index: Dict[int, List[int]] = {
+                int(chat_id): entry for chat_id, entry in json.loads(self.file.read(index_length)).items()
+            }
+        except Exception:
+            self.file.close()
+            raise
+
+    def chat_ids(self) -> List[int]:
+        """
+        List the archived chats
+
+        Returns:
+            Chat IDs in archive order
+        """
+        return list(self.index)
+
+    def __contains__(self, chat_id: int) -> bool:
+        return chat_id in self.index
+
+    def __len__(self) -> int:
+        return len(self.index)
+
+    def read(self, chat_id: int) -> ArchivedChat:
+        """
+        Read one chat's frame
+
+        Args:
+            chat_id: The Telegram chat ID
+
+        Returns:
+            (messages, summary) of the chat
+
+        Raises:
+            KeyError: If the chat isn't in the archive
+            ValueError: If the frame is corrupted
+        """
+        offset, length, checksum = self.index[chat_id]
+        self.file.seek(offset)
+        frame = self.file.read(length)
+        if len(frame) != length or zlib.crc32(frame) != checksum:
+            raise ValueError(f"Frame of chat {chat_id} in memory archive {self.path} is corrupted")
+        data = json.loads(frame)
+        return data["messages"], data["summary"]
+
+    def close(self) -> None:
+        """
+        Close the archive file
+        """
+        self.file.close()
+
+    def __enter__(self) -> "MemoryArchive":
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
+
+def export_storage(path: str, backend: Optional[str] = None) -> int:
+    """
+    Archive every conversation of a storage backend, without starting a Memory
+
+    Args:
+        path: The archive to write
+        backend: "json" or "sqlite", defaults to config.MEMORY_BACKEND
+
+    Returns:
+        Number of archived chats
+    """
+    storage = create_storage(backend)
+
+    def chats():
+        for chat_id in storage.list_chats():
+            try:
+                messages = storage.load(chat_id)
+                summary = storage.load_summary(chat_id)
+            except Exception as e:
+                logger.error(f"Skipping chat {chat_id} during export: {e}")
+                continue
+            if messages:
+                yield chat_id, messages[-config.LONG_MEMORY_SIZE:], summary
+
+    try:
+        return write_archive(path, chats())
+    finally:
+        storage.close()
+
+def import_storage(path: str, chat_ids: Optional[List[int]] = None, backend: Optional[str] = None,
+                   batch_size: int = 500) -> int:
+    """
+    Write archived conversations into a storage backend, replacing the stored ones
+
+    Args:
+        path: The archive to read
+        chat_ids: Chats to restore, defaults to all archived chats
+        backend: "json" or "sqlite", defaults to config.MEMORY_BACKEND
+        batch_size: Number of chats written per save_many call
+
+    Returns:
+        Number of restored chats
+    """
+    storage = create_storage(backend)
+    restored = 0
+    try:
+        with MemoryArchive(path) as archive:
+            batch = {}
+            for chat_id in (chat_ids if chat_ids is not None else archive.chat_ids()):
+                if chat_id not in archive:
+                    logger.warning(f"Chat {chat_id} is not in memory archive {path}")
+                    continue
+                messages, summary = archive.read(chat_id)
+                batch[chat_id] = messages
+                if summary:
+                    storage.save_summary(chat_id, summary)
+                if len(batch) >= batch_size:
+                    storage.save_many(batch)
+                    restored += len(batch)
+                    batch = {}
+            storage.save_many(batch)
+            restored += len(batch)
+    finally:
+        storage.close()
+
+    logger.info(f"Restored {restored} chats from memory archive {path}")
+    return restored
+
+if __name__ == "__main__":
+    # Usage: python memory_archive.py export <archive>
+    #        python memory_archive.py import <archive> [chat_id ...]
+    #        python memory_archive.py list <archive>
+    logging.basicConfig(level=logging.INFO)
+    if len(sys.argv) < 3 or sys.argv[1] not in ("export", "import", "list"):
+        print("Usage: python memory_archive.py export <archive>")
+        print("       python memory_archive.py import <archive> [chat_id ...]")
+        print("       python memory_archive.py list <archive>")
+        sys.exit(1)
+    archive_path = sys.argv[2]
+    if sys.argv[1] == "export":
+        print(f"Exported {export_storage(archive_path)} chats")
+    elif sys.argv[1] == "import":
+        selected = [int(chat_id) for chat_id in sys.argv[3:]] or None
+        print(f"Imported {import_storage(archive_path, selected)} chats")
+    else:
+        with MemoryArchive(archive_path) as archive:
+            for chat_id in archive.chat_ids():
+                offset, length, _ = archive.index[chat_id]
+                print(f"{chat_id}\t{offset}\t{length}")
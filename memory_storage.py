@@ -0,0 +1,977 @@
+import os
+import sys
+import gzip
+import json
+import sqlite3
+import logging
+import threading
+import time
+from collections import Counter
+from typing import Dict, List, Any, Mapping, Optional, Tuple
+import config
+from content_store import content_store, join_segments
+
+try:
+    import zstandard
+except ImportError:  # Only needed for MEMORY_COMPRESSION=zstd
+    zstandard = None
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+# Leading bytes of compressed memory files, uncompressed files start with JSON
+GZIP_MAGIC = b'\x1f\x8b'
+ZSTD_MAGIC = b'\x28\xb5\x2f\xfd'
+
+# The json backend appends reference count changes of shared bodies to a journal and
+# folds them into bodies/refs.json once the journal has this many lines (and more lines
+# than twice the number of bodies)
+BODY_REFS_COMPACT_LINES = 1000
+
+class MemoryStorage:
+    """
+    Interface of the places Memory keeps conversations in
+
+    A conversation is a list of message dictionaries with 'role', 'content'
+    and 'timestamp' keys. Backends that support journaling can append single
+    records instead of rewriting a whole conversation.
+
+    Lines registered as shared bodies in the content store are written once
+    per backend and referenced by digest from the stored messages, with a
+    reference count per body; load() returns the full content again.
+    """
+    supports_journal = False
+
+    # Whether save_many may be called for different chats from several threads at once
+    supports_parallel_writes = False
+
+    def list_chats(self) -> List[int]:
+        """
+        List the chat IDs with a stored conversation
+
+        Returns:
+            Sorted chat IDs
+        """
+        raise NotImplementedError
+
+    def load(self, chat_id: int) -> Optional[List[Dict[str, Any]]]:
+        """
+        Load a chat's conversation
+
+        Args:
+            chat_id: The Telegram chat ID
+
+        Returns:
+            The messages, or None if the chat has no stored conversation
+        """
+        raise NotImplementedError
+
+    def save_many(self, conversations: Dict[int, List[Mapping[str, Any]]],
+                  journal_marks: Optional[Dict[int, int]] = None) -> None:
+        """
+        Replace the stored conversations of several chats
+
+        Args:
+            conversations: Dictionary mapping chat IDs to their full message lists (dicts or
+                other mappings, such as ChatMessage records)
+            journal_marks: Optional journal_mark() of each chat taken together with its
+                messages; journal records written after the mark are kept
+        """
+        raise NotImplementedError
+
+    def append(self, chat_id: int, record: Dict[str, Any]) -> None:
+        """
+        Append one journal record to a chat's conversation
+
+        Args:
+            chat_id: The Telegram chat ID
+            record: An {"op": "add", ...message} or {"op": "update", "timestamp", "content"} record
+        """
+        raise NotImplementedError
+
+    def load_summary(self, chat_id: int) -> Optional[Dict[str, Any]]:
+        """
+        Load a chat's rolling conversation summary
+
+        Args:
+            chat_id: The Telegram chat ID
+
+        Returns:
+            {"text": ..., "until": timestamp of the last summarized message}, or None
+        """
+        raise NotImplementedError
+
+    def save_summary(self, chat_id: int, summary: Dict[str, Any]) -> None:
+        """
+        Replace a chat's rolling conversation summary
+
+        Args:
+            chat_id: The Telegram chat ID
+            summary: {"text": ..., "until": timestamp of the last summarized message}
+        """
+        raise NotImplementedError
+
+    def journal_mark(self, chat_id: int) -> int:
+        """
+        Get the current end of a chat's journal
+
+        Args:
+            chat_id: The Telegram chat ID
+
+        Returns:
+            An opaque position to pass to save_many
+        """
+        return 0
+
+    def needs_compaction(self, chat_id: int) -> bool:
+        """
+        Check whether a chat's journal should be folded into a full save
+
+        Args:
+            chat_id: The Telegram chat ID
+
+        Returns:
+            True if the conversation should be saved in full soon
+        """
+        return False
+
+    def close(self) -> None:
+        """
+        Release any resources held by the backend
+        """
+
+class JsonMemoryStorage(MemoryStorage):
+    """
+    One memory_<chat_id>.json snapshot per chat, plus an optional append-only
+    memory_<chat_id>.journal with the changes made since the snapshot
+
+    Snapshots are written as pretty-printed JSON, or as compact JSON in a gzip
+    or zstd frame (see MEMORY_COMPRESSION). The format of each file is detected
+    when it is read, so chats written with any setting can be loaded.
+
+    With the "batch" fsync policy, the files of a save_many call are flushed to
+    disk before it returns. With "write", every snapshot and journal record is.
+    """
+    supports_journal = True
+    supports_parallel_writes = True
+
+    def __init__(self, memory_dir: str, compact_records: int = config.MEMORY_JOURNAL_COMPACT_RECORDS,
+                 compression: str = config.MEMORY_COMPRESSION, zstd_dict_path: str = config.MEMORY_ZSTD_DICT,
+                 fsync: str = config.MEMORY_FSYNC):
+        self.memory_dir = memory_dir
+        self.compact_records = compact_records
+        self.fsync = _check_fsync_policy(fsync)
+
+        self.compression = (compression or "none").lower()
+        if self.compression not in ("none", "gzip", "zstd"):
+            logger.warning(f"Unknown memory compression '{compression}', writing uncompressed files")
+            self.compression = "none"
+        if self.compression == "zstd" and zstandard is None:
+            logger.warning("zstandard is not installed, writing gzip compressed memory files instead")
+            self.compression = "gzip"
+
+        # Optional dictionary trained on existing conversations (see train_zstd_dictionary)
+        self.zstd_dict = None
+        if zstandard is not None and zstd_dict_path and os.path.exists(zstd_dict_path):
+            with open(zstd_dict_path, 'rb') as f:
+                self.zstd_dict = zstandard.ZstdCompressionDict(f.read())
+            logger.info(f"Loaded zstd dictionary from {zstd_dict_path}")
+
+        # Number of records in each chat's journal, and chats whose journal has a torn line
+        self.journal_counts: Dict[int, int] = {}
+        self.corrupted_journals = set()
+
+        # Shared bodies are stored as bodies/<digest>.txt. The number of snapshot references
+        # of each is kept in bodies/refs.json plus the changes appended to the journal of its
+        # generation since; the references of every loaded or saved snapshot
+        self.bodies_dir = os.path.join(self.memory_dir, "bodies")
+        self.body_refs: Dict[str, int] = {}
+        self.body_refs_generation = 0
+        self.body_refs_journal_lines = 0
+        self.chat_refs: Dict[int, Counter] = {}
+
+        # Thread lock for the shared counters and body references. A chat's snapshot and
+        # journal files are guarded by its striped lock, so writes for different chats
+        # don't wait on each other's disk I/O
+        self.lock = threading.RLock()
+        self.chat_locks = [threading.Lock() for _ in range(max(1, config.MEMORY_LOCK_STRIPES))]
+
+        os.makedirs(self.bodies_dir, exist_ok=True)
+        self._load_body_refs()
+
+    def _chat_lock(self, chat_id: int) -> threading.Lock:
+        """
+        Get the striped lock that guards a chat's snapshot and journal files
+        """
+        return self.chat_locks[hash(chat_id) % len(self.chat_locks)]
+
+    def _get_memory_file_path(self, chat_id: int) -> str:
+        """
+        Get the file path for a specific chat's memory file
+        """
+        return os.path.join(self.memory_dir, f"memory_{chat_id}.json")
+
+    def _get_journal_file_path(self, chat_id: int) -> str:
+        """
+        Get the file path for a specific chat's append-only journal (one JSON record per line)
+        """
+        return os.path.join(self.memory_dir, f"memory_{chat_id}.journal")
+
+    def _get_summary_file_path(self, chat_id: int) -> str:
+        """
+        Get the file path for a specific chat's rolling summary
+        """
+        return os.path.join(self.memory_dir, f"summary_{chat_id}.json")
+
+    def _get_body_file_path(self, digest: str) -> str:
+        """
+        Get the file path of a shared message body
+        """
+        return os.path.join(self.bodies_dir, f"{digest}.txt")
+
+    def _get_body_refs_path(self) -> str:
+        """
+        Get the file path of the shared bodies' reference counts
+        """
+        return os.path.join(self.bodies_dir, "refs.json")
+
+    def _get_body_refs_journal_path(self, generation: int) -> str:
+        """
+        Get the file path of the reference count changes made since refs.json of a generation was written
+        """
+        return os.path.join(self.bodies_dir, f"refs.{generation}.journal")
+
+    def _load_body_refs(self) -> None:
+        """
+        Read the reference counts of the shared bodies: refs.json plus the changes in its journal
+
+        Journals of other generations are left over from a compaction that was
+        interrupted after writing refs.json; their changes are already contained
+        in it, so they are deleted.
+        """
+        refs_file = self._get_body_refs_path()
+        if os.path.exists(refs_file):
+            with open(refs_file, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+            if isinstance(data.get("refs"), dict):
+                self.body_refs = data["refs"]
+                self.body_refs_generation = data.get("generation", 0)
+            else:
+                # Written before the journal existed: plain digest -> count
+                self.body_refs = data
+
+        torn = False
+        journal_file = self._get_body_refs_journal_path(self.body_refs_generation)
+        if os.path.exists(journal_file):
+            with open(journal_file, 'r', encoding='utf-8') as f:
+                for line in f:
+                    digest, _, delta = line.rstrip('\n').partition('\t')
+                    try:
+                        if not line.endswith('\n'):
+                            raise ValueError("incomplete line")
+                        count = self.body_refs.get(digest, 0) + int(delta)
+                    except ValueError:
+                        # A partially written last line: its batch didn't complete, and skipping a
+                        # change can only keep a body longer than needed
+                        logger.warning("Skipping unreadable shared body reference record")
+                        torn = True
+                        continue
+                    self.body_refs_journal_lines += 1
+                    if count > 0:
+                        self.body_refs[digest] = count
+                    else:
+                        self.body_refs.pop(digest, None)
+
+        for name in os.listdir(self.bodies_dir):
+            if name.startswith("refs.") and name.endswith(".journal") and \
+                    name != os.path.basename(journal_file):
+                os.remove(os.path.join(self.bodies_dir, name))
+
+        # Don't append new records to a torn line
+        if torn:
+            self._compact_body_refs_if_needed(force=True)
+
+        content_store.mark_shared(self.body_refs)
+
+    def _encode(self, messages: List[Mapping[str, Any]]) -> bytes:
+        """
+        Serialize a conversation in the configured format, messages that aren't dicts are converted with dict()
+        """
+        if self.compression == "none":
+            return json.dumps(messages, ensure_ascii=False, indent=2, default=dict).encode('utf-8')
+
+        data = json.dumps(messages, ensure_ascii=False, separators=(',', ':'), default=dict).encode('utf-8')
+        if self.compression == "zstd":
+            return zstandard.ZstdCompressor(dict_data=self.zstd_dict).compress(data)
+        # Fastest level, snapshots are rewritten on every autosave and compaction
+        return gzip.compress(data, compresslevel=1)
+
+    def _decode(self, data: bytes) -> List[Dict[str, Any]]:
+        """
+        Parse a memory file in any of the supported formats
+        """
+        if data.startswith(GZIP_MAGIC):
+            data = gzip.decompress(data)
+        elif data.startswith(ZSTD_MAGIC):
+            if zstandard is None:
+                raise RuntimeError("Memory file is zstd compressed but zstandard is not installed")
+            data = zstandard.ZstdDecompressor(dict_data=self.zstd_dict).decompress(data)
+        return json.loads(data.decode('utf-8'))
+
+    def list_chats(self) -> List[int]:
+        chat_ids = set()
+        with os.scandir(self.memory_dir) as entries:
+            for entry in entries:
+                name = entry.name
+                if not name.startswith("memory_") or not (name.endswith(".json") or name.endswith(".journal")):
+                    continue
+                try:
+                    # Extract chat_id from filename (memory_CHATID.json / memory_CHATID.journal)
+                    chat_ids.add(int(name[len("memory_"):].rsplit('.', 1)[0]))
+                except ValueError:
+                    logger.error(f"Skipping memory file with unexpected name: {name}")
+        return sorted(chat_ids)
+
+    def load(self, chat_id: int) -> Optional[List[Dict[str, Any]]]:
+        memory_file = self._get_memory_file_path(chat_id)
+        if not os.path.exists(memory_file) and not os.path.exists(self._get_journal_file_path(chat_id)):
+            return None
+
+        messages = []
+        if os.path.exists(memory_file):
+            with open(memory_file, 'rb') as f:
+                messages = self._decode(f.read())
+
+        # Journal updates replace the full content, so shared bodies are resolved first
+        refs = _count_body_refs(messages)
+        if refs:
+            bodies = {digest: content_store.lookup(digest) or self._read_body(digest) for digest in refs}
+            for msg in messages:
+                if "segments" in msg:
+                    msg["content"] = join_segments(msg.pop("segments"), bodies)
+        with self.lock:
+            self.chat_refs[chat_id] = refs
+
+        # Replay the journal written since the last snapshot
+        self._replay_journal(chat_id, messages)
+        return messages
+
+    def _replay_journal(self, chat_id: int, messages: List[Dict[str, Any]]) -> None:
+        """
+        Apply a chat's journal records on top of its loaded snapshot
+
+        Records already contained in the snapshot (e.g. after a crash between
+        writing the snapshot and removing the journal) are skipped, and a
+        partially written last line is ignored.
+
+        Args:
+            chat_id: The Telegram chat ID
+            messages: The snapshot messages, modified in place
+        """
+        journal_file = self._get_journal_file_path(chat_id)
+        if not os.path.exists(journal_file):
+            return
+
+        snapshot_timestamps = {msg.get('timestamp') for msg in messages}
+        count = 0
+        with open(journal_file, 'r', encoding='utf-8') as f:
+            for line in f:
+                try:
+                    record = json.loads(line)
+                except json.JSONDecodeError:
+                    logger.warning(f"Skipping unreadable journal record for chat {chat_id}")
+                    # Compact soon so new records aren't appended to a torn line
+                    with self.lock:
+                        self.corrupted_journals.add(chat_id)
+                    continue
+
+                count += 1
+                op = record.pop("op", None)
+                if op == "add" and record.get("timestamp") not in snapshot_timestamps:
+                    messages.append(record)
+                elif op == "update":
+                    for msg in reversed(messages):
+                        if msg.get("timestamp") == record.get("timestamp"):
+                            msg["content"] = record.get("content", msg.get("content"))
+                            break
+
+        with self.lock:
+            self.journal_counts[chat_id] = count
+
+    def save_many(self, conversations: Dict[int, List[Mapping[str, Any]]],
+                  journal_marks: Optional[Dict[int, int]] = None) -> None:
+        # New body references of the whole batch are stored before the snapshots using them and
+        # dropped ones after those replaced the old snapshots, so a crash can only leak a body,
+        # never lose one
+        batch = {}
+        increments = Counter()
+        texts = {}
+        for chat_id, messages in conversations.items():
+            stored, refs, chat_texts = _share_bodies(messages)
+            old_refs = self._get_chat_refs(chat_id)
+            batch[chat_id] = (stored, refs, old_refs)
+            increments.update(refs - old_refs)
+            texts.update(chat_texts)
+        with self.lock:
+            self._add_body_refs(increments, texts)
+
+        decrements = Counter()
+        for chat_id, (messages, refs, old_refs) in batch.items():
+            memory_file = self._get_memory_file_path(chat_id)
+            temp_file = f"{memory_file}.tmp"
+
+            # First write to a temporary file
+            with open(temp_file, 'wb') as f:
+                f.write(self._encode(messages))
+                if self.fsync != "none":
+                    f.flush()
+                    os.fsync(f.fileno())
+
+            with self._chat_lock(chat_id):
+                # Then rename it to the actual file (atomic operation)
+                os.replace(temp_file, memory_file)
+
+                # The snapshot now contains the journal up to the mark
+                self._trim_journal(chat_id, journal_marks.get(chat_id) if journal_marks is not None else None)
+            with self.lock:
+                self.chat_refs[chat_id] = refs
+            decrements.update(old_refs - refs)
+
+            if self.fsync == "write":
+                self._fsync_directory()
+
+            logger.debug(f"Saved memory for chat {chat_id} to {memory_file}")
+
+        if self.fsync == "batch" and conversations:
+            self._fsync_directory()
+
+        with self.lock:
+            self._drop_body_refs(decrements)
+            self._compact_body_refs_if_needed()
+
+    def _get_chat_refs(self, chat_id: int) -> Counter:
+        """
+        Get the shared bodies referenced by a chat's current snapshot, reading it if it wasn't loaded
+        """
+        with self.lock:
+            if chat_id in self.chat_refs:
+                return self.chat_refs[chat_id]
+            if not self.body_refs:
+                return Counter()
+
+        memory_file = self._get_memory_file_path(chat_id)
+        if not os.path.exists(memory_file):
+            return Counter()
+        with open(memory_file, 'rb') as f:
+            return _count_body_refs(self._decode(f.read()))
+
+    def _read_body(self, digest: str) -> Optional[str]:
+        """
+        Read a shared body from disk, None if it is missing
+        """
+        try:
+            with open(self._get_body_file_path(digest), 'rb') as f:
+                return f.read().decode('utf-8')
+        except FileNotFoundError:
+            return None
+
+    def _add_body_refs(self, increments: Counter, texts: Dict[str, str]) -> None:
+        """
+        Store new shared bodies and count new references, the caller must hold the lock
+        """
+        if not increments:
+            return
+        for digest, count in increments.items():
+            if digest not in self.body_refs:
+                body_file = self._get_body_file_path(digest)
+                self._write_file(body_file, texts[digest].encode('utf-8'))
+            self.body_refs[digest] = self.body_refs.get(digest, 0) + count
+        self._append_body_refs(increments)
+        if self.fsync != "none":
+            self._fsync_directory(self.bodies_dir)
+
+    def _drop_body_refs(self, decrements: Counter) -> None:
+        """
+        Count dropped references and delete unused shared bodies, the caller must hold the lock
+        """
+        if not decrements:
+            return
+        # Record the changes before deleting bodies, so a crash in between only leaks them
+        self._append_body_refs({digest: -count for digest, count in decrements.items()})
+        unused = []
+        for digest, count in decrements.items():
+            self.body_refs[digest] = self.body_refs.get(digest, 0) - count
+            if self.body_refs[digest] <= 0:
+                del self.body_refs[digest]
+                unused.append(digest)
+                try:
+                    os.remove(self._get_body_file_path(digest))
+                except FileNotFoundError:
+                    pass
+        content_store.forget(unused)
+
+    def _append_body_refs(self, deltas: Mapping[str, int]) -> None:
+        """
+        Append reference count changes to the journal of the current generation, the caller must hold the lock
+        """
+        journal_file = self._get_body_refs_journal_path(self.body_refs_generation)
+        with open(journal_file, 'a', encoding='utf-8') as f:
+            f.writelines(f"{digest}\t{delta:+d}\n" for digest, delta in deltas.items())
+            if self.fsync != "none":
+                f.flush()
+                os.fsync(f.fileno())
+        self.body_refs_journal_lines += len(deltas)
+
+    def _compact_body_refs_if_needed(self, force: bool = False) -> None:
+        """
+        Fold the journal into a new refs.json once it is mostly outdated lines, the caller must hold the lock
+
+        The counts are written as the next generation before the old journal is
+        removed, so a crash in between leaves a journal that is simply ignored.
+        """
+        old_journal = self._get_body_refs_journal_path(self.body_refs_generation)
+        if not os.path.exists(old_journal):
+            return
+        if not force and self.body_refs_journal_lines < max(BODY_REFS_COMPACT_LINES, 2 * len(self.body_refs)):
+            return
+
+        generation = self.body_refs_generation + 1
+        data = {"generation": generation, "refs": self.body_refs}
+        self._write_file(self._get_body_refs_path(), json.dumps(data).encode('utf-8'))
+        if self.fsync != "none":
+            self._fsync_directory(self.bodies_dir)
+
+        self.body_refs_generation = generation
+        self.body_refs_journal_lines = 0
+        try:
+            os.remove(old_journal)
+        except FileNotFoundError:
+            pass
+        logger.debug(f"Compacted shared body references to {len(self.body_refs)} bodies")
+
+    def _write_file(self, path: str, data: bytes) -> None:
+        """
+        Atomically replace a file, flushing it to disk unless the fsync policy is "none"
+        """
+        temp_file = f"{path}.tmp"
+        with open(temp_file, 'wb') as f:
+            f.write(data)
+            if self.fsync != "none":
+                f.flush()
+                os.fsync(f.fileno())
+        os.replace(temp_file, path)
+
+    def _trim_journal(self, chat_id: int, mark: Optional[int]) -> None:
+        """
+        Drop the journal records contained in a just written snapshot, the caller must hold the chat's lock
+
+        Args:
+            chat_id: The Telegram chat ID
+            mark: Journal size when the snapshot was taken, or None to drop the whole journal
+        """
+        journal_file = self._get_journal_file_path(chat_id)
+        if os.path.exists(journal_file) and mark is not None and os.path.getsize(journal_file) > mark:
+            # Keep the records appended while the snapshot was being written
+            with open(journal_file, 'rb') as f:
+                f.seek(mark)
+                tail = f.read()
+            temp_file = f"{journal_file}.tmp"
+            with open(temp_file, 'wb') as f:
+                f.write(tail)
+            os.replace(temp_file, journal_file)
+            count = tail.count(b"\n")
+        else:
+            if os.path.exists(journal_file):
+                os.remove(journal_file)
+            count = 0
+
+        with self.lock:
+            if count:
+                self.journal_counts[chat_id] = count
+            else:
+                self.journal_counts.pop(chat_id, None)
+            self.corrupted_journals.discard(chat_id)
+
+    def _fsync_directory(self, directory: Optional[str] = None) -> None:
+        """
+        Flush renames and removals in the memory directory (or another one) to disk
+        """
+        if not hasattr(os, "O_DIRECTORY"):
+            return
+        fd = os.open(directory or self.memory_dir, os.O_RDONLY | os.O_DIRECTORY)
+        try:
+            os.fsync(fd)
+        finally:
+            os.close(fd)
+
+    def append(self, chat_id: int, record: Dict[str, Any]) -> None:
+        line = json.dumps(record, ensure_ascii=False) + "\n"
+        with self._chat_lock(chat_id):
+            with open(self._get_journal_file_path(chat_id), 'a', encoding='utf-8') as f:
+                f.write(line)
+                if self.fsync == "write":
+                    f.flush()
+                    os.fsync(f.fileno())
+        with self.lock:
+            self.journal_counts[chat_id] = self.journal_counts.get(chat_id, 0) + 1
+
+    def load_summary(self, chat_id: int) -> Optional[Dict[str, Any]]:
+        summary_file = self._get_summary_file_path(chat_id)
+        if not os.path.exists(summary_file):
+            return None
+        with open(summary_file, 'r', encoding='utf-8') as f:
+            return json.load(f)
+
+    def save_summary(self, chat_id: int, summary: Dict[str, Any]) -> None:
+        summary_file = self._get_summary_file_path(chat_id)
+        temp_file = f"{summary_file}.tmp"
+        with open(temp_file, 'w', encoding='utf-8') as f:
+            json.dump(summary, f, ensure_ascii=False)
+            if self.fsync == "write":
+                f.flush()
+                os.fsync(f.fileno())
+        os.replace(temp_file, summary_file)
+
+    def journal_mark(self, chat_id: int) -> int:
+        with self._chat_lock(chat_id):
+            try:
+                return os.path.getsize(self._get_journal_file_path(chat_id))
+            except OSError:
+                return 0
+
+    def needs_compaction(self, chat_id: int) -> bool:
+        with self.lock:
+            return chat_id in self.corrupted_journals or self.journal_counts.get(chat_id, 0) >= self.compact_records
+
+    def close(self) -> None:
+        # Start the next run from refs.json alone
+        with self.lock:
+            self._compact_body_refs_if_needed(force=True)
+
+class SqliteMemoryStorage(MemoryStorage):
+    """
+    All conversations in one SQLite database (WAL mode)
+
+    Messages are rows keyed by (chat_id, position), so conversations can be
+    queried with an index, and save_many writes all dirty chats of an
+    autosave tick in a single transaction. The "batch" and "write" fsync
+    policies make every transaction durable (synchronous=FULL).
+
+    Shared bodies are rows of the bodies table with their reference count;
+    messages using them have their lines as JSON in the segments column
+    instead of content, and the counts change in the same transaction.
+    """
+    def __init__(self, db_path: str, fsync: str = config.MEMORY_FSYNC):
+        self.db_path = db_path
+        self.fsync = _check_fsync_policy(fsync)
+
+        # One connection shared by all threads, serialized by the lock
+        self.lock = threading.RLock()
+        directory = os.path.dirname(db_path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self.conn = sqlite3.connect(db_path, timeout=10, check_same_thread=False)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute(f"PRAGMA synchronous={'NORMAL' if self.fsync == 'none' else 'FULL'}")
+
+        with self.lock, self.conn:
+            self.conn.execute("""
+                CREATE TABLE IF NOT EXISTS messages (
+                    chat_id INTEGER NOT NULL,
+                    position INTEGER NOT NULL,
+                    role TEXT NOT NULL,
+                    content TEXT NOT NULL,
+                    timestamp REAL NOT NULL,
+                    segments TEXT,
+                    PRIMARY KEY (chat_id, position)
+                ) WITHOUT ROWID
+            """)
+            # Databases created before shared bodies lack the segments column
+            columns = {row[1] for row in self.conn.execute("PRAGMA table_info(messages)")}
+            if "segments" not in columns:
+                self.conn.execute("ALTER TABLE messages ADD COLUMN segments TEXT")
+            self.conn.execute("""
+                CREATE TABLE IF NOT EXISTS bodies (
+                    hash TEXT PRIMARY KEY,
+                    content TEXT NOT NULL,
+                    refs INTEGER NOT NULL
+                ) WITHOUT ROWID
+            """)
+            self.conn.execute("""
+                CREATE TABLE IF NOT EXISTS summaries (
+                    chat_id INTEGER PRIMARY KEY,
+                    text TEXT NOT NULL,
+                    until REAL NOT NULL
+                )
+            """)
+            content_store.mark_shared(row[0] for row in self.conn.execute("SELECT hash FROM bodies"))
+
+    def list_chats(self) -> List[int]:
+        with self.lock:
+            return [row[0] for row in self.conn.execute("SELECT DISTINCT chat_id FROM messages ORDER BY chat_id")]
+
+    def load(self, chat_id: int) -> Optional[List[Dict[str, Any]]]:
+        with self.lock:
+            rows = self.conn.execute(
+                "SELECT role, content, timestamp, segments FROM messages WHERE chat_id = ? ORDER BY position",
+                (chat_id,)
+            ).fetchall()
+
+        if not rows:
+            return None
+
+        messages = []
+        bodies: Dict[str, Optional[str]] = {}
+        for role, content, timestamp, segments in rows:
+            if segments is not None:
+                segments = json.loads(segments)
+                missing = [
+                    segment["body"] for segment in segments
+                    if isinstance(segment, dict) and segment["body"] not in bodies
+                ]
+                for digest in missing:
+                    bodies[digest] = content_store.lookup(digest) or self._read_body(digest)
+                content = join_segments(segments, bodies)
+            messages.append({"role": role, "content": content, "timestamp": timestamp})
+        return messages
+
+    def _read_body(self, digest: str) -> Optional[str]:
+        """
+        Read a shared body from the database, None if it is missing
+        """
+        with self.lock:
+            row = self.conn.execute("SELECT content FROM bodies WHERE hash = ?", (digest,)).fetchone()
+        return row[0] if row else None
+
+    def save_many(self, conversations: Dict[int, List[Mapping[str, Any]]],
+                  journal_marks: Optional[Dict[int, int]] = None) -> None:
+        if not conversations:
+            return
+
+        now = time.time()
+        rows = []
+        refs = Counter()
+        texts = {}
+        for chat_id, messages in conversations.items():
+            messages, chat_refs, chat_texts = _share_bodies(messages)
+            refs.update(chat_refs)
+            texts.update(chat_texts)
+            for position, msg in enumerate(messages):
+                segments = msg.get("segments")
+                rows.append((
+                    chat_id, position, msg["role"], msg.get("content", ""), msg.get("timestamp", now),
+                    json.dumps(segments, ensure_ascii=False) if segments is not None else None
+                ))
+
+        # Group commit: every chat of this batch is written in one transaction
+        with self.lock, self.conn:
+            old_refs = Counter()
+            for chat_id in conversations:
+                for (segments,) in self.conn.execute(
+                    "SELECT segments FROM messages WHERE chat_id = ? AND segments IS NOT NULL", (chat_id,)
+                ):
+                    old_refs.update(
+                        segment["body"] for segment in json.loads(segments) if isinstance(segment, dict)
+                    )
+
+            self.conn.executemany("DELETE FROM messages WHERE chat_id = ?", [(chat_id,) for chat_id in conversations])
+            self.conn.executemany(
+                "INSERT INTO messages (chat_id, position, role, content, timestamp, segments) VALUES (?, ?, ?, ?, ?, ?)",
+                rows
+            )
+
+            unused = []
+            if refs or old_refs:
+                self.conn.executemany(
+                    "INSERT INTO bodies (hash, content, refs) VALUES (?, ?, ?) "
+                    "ON CONFLICT (hash) DO UPDATE SET refs = refs + excluded.refs",
+                    [(digest, texts[digest], count) for digest, count in (refs - old_refs).items()]
+                )
+                for digest, count in (old_refs - refs).items():
+                    self.conn.execute("UPDATE bodies SET refs = refs - ? WHERE hash = ?", (count, digest))
+                    if self.conn.execute("DELETE FROM bodies WHERE hash = ? AND refs <= 0", (digest,)).rowcount:
+                        unused.append(digest)
+
+        content_store.forget(unused)
+        logger.debug(f"Saved memory for {len(conversations)} chats to {self.db_path} in one transaction")
+
+    def load_summary(self, chat_id: int) -> Optional[Dict[str, Any]]:
+        with self.lock:
+            row = self.conn.execute("SELECT text, until FROM summaries WHERE chat_id = ?", (chat_id,)).fetchone()
+        return {"text": row[0], "until": row[1]} if row else None
+
+    def save_summary(self, chat_id: int, summary: Dict[str, Any]) -> None:
+        with self.lock, self.conn:
+            self.conn.execute(
+                "INSERT OR REPLACE INTO summaries (chat_id, text, until) VALUES (?, ?, ?)",
+                (chat_id, summary["text"], summary["until"])
+            )
+
+    def close(self) -> None:
+        with self.lock:
+            self.conn.close()
+
+def _share_bodies(messages: List[Mapping[str, Any]]) -> Tuple[List[Mapping[str, Any]], Counter, Dict[str, str]]:
+    """
+    Replace the shared lines of messages with references to their bodies
+
+    Args:
+        messages: The messages to store
+
+    Returns:
+        (messages, references, texts): the messages, those with shared lines as dicts
+        with a 'segments' list instead of 'content'; the number of references to each
+        shared body; and the text of each referenced body
+    """
+    stored = []
+    refs = Counter()
+    texts = {}
+    for msg in messages:
+        encoded = content_store.encode_segments(msg["content"])
+        if encoded is None:
+            stored.append(msg)
+            continue
+        segments, bodies = encoded
+        record = {key: value for key, value in dict(msg).items() if key != "content"}
+        record["segments"] = segments
+        stored.append(record)
+        refs.update(segment["body"] for segment in segments if isinstance(segment, dict))
+        texts.update(bodies)
+    return stored, refs, texts
+
+def _count_body_refs(messages: List[Mapping[str, Any]]) -> Counter:
+    """
+    Count the references to shared bodies in stored messages
+    """
+    return Counter(
+        segment["body"]
+        for msg in messages if "segments" in msg
+        for segment in msg["segments"] if isinstance(segment, dict)
+    )
+
+def _check_fsync_policy(fsync: str) -> str:
+    """
+    Validate an fsync policy ("none", "batch" or "write")
+    """
+    fsync = (fsync or "none").lower()
+    if fsync not in ("none", "batch", "write"):
+        logger.warning(f"Unknown memory fsync policy '{fsync}', using none")
+        return "none"
+    return fsync
+
+def create_storage(backend: Optional[str] = None) -> MemoryStorage:
+    """
+    Create the storage backend selected by MEMORY_BACKEND
+
+    Args:
+        backend: "json" or "sqlite", defaults to config.MEMORY_BACKEND
+
+    Returns:
+        The storage backend
+    """
+    backend = (backend or config.MEMORY_BACKEND).lower()
+    if backend == "sqlite":
+        return SqliteMemoryStorage(config.MEMORY_DB_PATH, config.MEMORY_FSYNC)
+    if backend != "json":
+        logger.warning(f"Unknown memory backend '{backend}', using json")
+    return JsonMemoryStorage(config.MEMORY_DIR, config.MEMORY_JOURNAL_COMPACT_RECORDS,
+                             config.MEMORY_COMPRESSION, config.MEMORY_ZSTD_DICT, config.MEMORY_FSYNC)
+
+def migrate_json_to_sqlite(memory_dir: str, db_path: str, batch_size: int = 500) -> int:
+    """
+    Copy every conversation from the JSON files of memory_dir into a SQLite database
+
+    The JSON files are left in place, so the migration can be repeated or rolled back.
+
+    Args:
+        memory_dir: Directory with the memory_<chat_id>.json / .journal files
+        db_path: The SQLite database to write
+        batch_size: Number of chats written per transaction
+
+    Returns:
+        Number of migrated chats
+    """
+    source = JsonMemoryStorage(memory_dir)
+    target = SqliteMemoryStorage(db_path)
+    migrated = 0
+
+    try:
+        batch = {}
+        for chat_id in source.list_chats():
+            try:
+                messages = source.load(chat_id)
+                summary = source.load_summary(chat_id)
+            except Exception as e:
+                logger.error(f"Skipping chat {chat_id} during migration: {e}")
+                continue
+            if messages:
+                batch[chat_id] = messages[-config.LONG_MEMORY_SIZE:]
+            if summary:
+                target.save_summary(chat_id, summary)
+            if len(batch) >= batch_size:
+                target.save_many(batch)
+                migrated += len(batch)
+                batch = {}
+
+        target.save_many(batch)
+        migrated += len(batch)
+    finally:
+        target.close()
+
+    logger.info(f"Migrated {migrated} chats from {memory_dir} to {db_path}")
+    return migrated
+
+def train_zstd_dictionary(memory_dir: str, dict_path: str, dict_size: int = 112640, max_samples: int = 10000) -> int:
+    """
+    Train a zstd dictionary on the stored conversations of memory_dir
+
+    Small conversations share most of their structure (keys, roles, greetings),
+    which a shared dictionary lets zstd compress away. Files written with the
+    dictionary can only be read while MEMORY_ZSTD_DICT points to it.
+
+    Args:
+        memory_dir: Directory with the memory_<chat_id>.json / .journal files
+        dict_path: Where to write the dictionary
+        dict_size: Maximum dictionary size in bytes
+        max_samples: Maximum number of conversations to train on
+
+    Returns:
+        Size of the written dictionary in bytes
+    """
+    if zstandard is None:
+        raise RuntimeError("Training a dictionary requires the zstandard package")
+
+    source = JsonMemoryStorage(memory_dir)
+    samples = []
+    for chat_id in source.list_chats()[:max_samples]:
+        try:
+            messages = source.load(chat_id)
+        except Exception as e:
+            logger.error(f"Skipping chat {chat_id} during dictionary training: {e}")
+            continue
+        if messages:
+            samples.append(json.dumps(messages, ensure_ascii=False, separators=(',', ':')).encode('utf-8'))
+
+    dictionary = zstandard.train_dictionary(dict_size, samples)
+    data = dictionary.as_bytes()
+    with open(dict_path, 'wb') as f:
+        f.write(data)
+
+    logger.info(f"Trained a {len(data)} byte zstd dictionary on {len(samples)} conversations")
+    return len(data)
+
+if __name__ == "__main__":
+    # Usage: python memory_storage.py migrate [memory_dir] [db_path]
+    #        python memory_storage.py train-dict [memory_dir] [dict_path]
+    logging.basicConfig(level=logging.INFO)
+    if len(sys.argv) < 2 or sys.argv[1] not in ("migrate", "train-dict"):
+        print("Usage: python memory_storage.py migrate [memory_dir] [db_path]")
+        print("       python memory_storage.py train-dict [memory_dir] [dict_path]")
+        sys.exit(1)
+    memory_dir = sys.argv[2] if len(sys.argv) > 2 else config.MEMORY_DIR
+    if sys.argv[1] == "migrate":
+        db_path = sys.argv[3] if len(sys.argv) > 3 else config.MEMORY_DB_PATH
+        print(f"Migrated {migrate_json_to_sqlite(memory_dir, db_path)} chats")
+    else:
+        dict_path = sys.argv[3] if len(sys.argv) > 3 else os.path.join(memory_dir, "memories.zdict")
+        print(f"Wrote a {train_zstd_dictionary(memory_dir, dict_path)} byte dictionary to {dict_path}")
@@ -0,0 +1,148 @@
+import math
+import hashlib
+import logging
+import threading
+from typing import Dict, List, Any, Iterable, Optional, Tuple
+import config
+from cefr_index import normalize_word
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+class BloomFilter:
+    """
+    Fixed-size Bloom filter over strings
+
+    Membership checks may return false positives at roughly error_rate once
+    capacity items have been added, but never false negatives.
+    """
+    def __init__(self, capacity: int, error_rate: float):
+        self.capacity = capacity
+        self.count = 0
+
+        # Optimal number of bits and hash functions for the given capacity and error rate
+        self.num_bits = max(8, int(-capacity * math.log(error_rate) / (math.log(2) ** 2)))
+        self.num_hashes = max(1, round(self.num_bits / capacity * math.log(2)))
+        self.bits = bytearray((self.num_bits + 7) // 8)
+
+    def _positions(self, item: str) -> Iterable[int]:
+        """
+        Get the bit positions of an item using double hashing
+        """
+        digest = hashlib.blake2b(item.encode('utf-8'), digest_size=16).digest()
+        h1 = int.from_bytes(digest[:8], 'little')
+        h2 = int.from_bytes(digest[8:], 'little') | 1
+        return ((h1 + i * h2) % self.num_bits for i in range(self.num_hashes))
+
+    def add(self, item: str) -> None:
+        """
+        Add an item to the filter
+        """
+        for position in self._positions(item):
+            self.bits[position >> 3] |= 1 << (position & 7)
+        self.count += 1
+
+    def __contains__(self, item: str) -> bool:
+        return all(self.bits[position >> 3] & (1 << (position & 7)) for position in self._positions(item))
+
+class NegativeCache:
+    """
+    Per-language record of words Gemini judged not uncommon
+
+    Each language has a current and a previous Bloom filter generation. Words
+    are added to the current one; once it holds NEGATIVE_CACHE_CAPACITY words
+    it becomes the previous generation and the oldest one is dropped, so
+    memory stays bounded and stale decisions age out.
+    """
+    def __init__(self, capacity: int = config.NEGATIVE_CACHE_CAPACITY,
+                 error_rate: float = config.NEGATIVE_CACHE_ERROR_RATE):
+        self.capacity = capacity
+        self.error_rate = error_rate
+
+        # language -> (current generation, previous generation or None)
+        self.filters: Dict[str, Tuple[BloomFilter, Optional[BloomFilter]]] = {}
+
+        # Hit/miss counters
+        self.stats: Dict[str, int] = {
+            "hits": 0,
+            "misses": 0,
+            "added": 0,
+            "rotations": 0
+        }
+
+        # Thread lock for thread safety
+        self.lock = threading.RLock()
+
+    def _get_filters(self, language: str) -> Tuple[BloomFilter, Optional[BloomFilter]]:
+        """
+        Get the filter generations of a language, creating them on first use
+        """
+        language = language.lower()
+        if language not in self.filters:
+            self.filters[language] = (BloomFilter(self.capacity, self.error_rate), None)
+        return self.filters[language]
+
+    def add_many(self, words: Iterable[str], language: str) -> None:
+        """
+        Record words that were judged not uncommon
+
+        Args:
+            words: The easy words
+            language: The language of the words
+        """
+        with self.lock:
+            current, previous = self._get_filters(language)
+            for word in words:
+                word = normalize_word(word)
+                if not word or word in current:
+                    continue
+
+                if current.count >= self.capacity:
+                    # Rotate generations, dropping the oldest one
+                    previous, current = current, BloomFilter(self.capacity, self.error_rate)
+                    self.filters[language.lower()] = (current, previous)
+                    self.stats["rotations"] += 1
+                    logger.info(f"Rotated negative word cache for {language} after {self.capacity} words")
+
+                current.add(word)
+                self.stats["added"] += 1
+
+    def filter_unknown(self, words: List[str], language: str) -> List[str]:
+        """
+        Drop the words that were judged not uncommon before
+
+        Args:
+            words: Candidate words
+            language: The language of the words
+
+        Returns:
+            The words without a cached negative decision, in input order
+        """
+        with self.lock:
+            current, previous = self._get_filters(language)
+            remaining = []
+            for word in words:
+                normalized = normalize_word(word)
+                if normalized in current or (previous is not None and normalized in previous):
+                    self.stats["hits"] += 1
+                else:
+                    self.stats["misses"] += 1
+                    remaining.append(word)
+            return remaining
+
+    def get_stats(self) -> Dict[str, Any]:
+        """
+        Get hit/miss statistics of the cache
+
+        Returns:
+            Dictionary with the counters and the hit rate
+        """
+        with self.lock:
+            stats = dict(self.stats)
+
+        lookups = stats["hits"] + stats["misses"]
+        stats["hit_rate"] = stats["hits"] / lookups if lookups else 0.0
+        return stats
+
+# Create a singleton instance
+negative_cache = NegativeCache()
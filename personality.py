@@ -1,4 +1,8 @@
-from typing import Dict, List
+from typing import Any, Dict, List, Mapping, Optional, Sequence
+from token_budget import select_within_budget
+
+# Long retrieved messages (e.g. deep-search answers) are cut to this many characters in the prompt
+RELEVANT_MESSAGE_CHARS = 1000
 
 # Miles "Tails" Prower personality definition - Ultra-detailed version
 TAILS_PERSONALITY = """
@@ -275,17 +279,70 @@ IMPORTANT GUIDELINES:
 - You don't need to add these translations yourself - the system will handle this automatically
 """
 
-def format_messages_for_gemini(chat_history: List[Dict[str, str]], _: str = None) -> List[Dict]:
+def format_summary_context(summary: Optional[str]) -> str:
+    """
+    Format a chat's rolling summary as prompt context
+
+    Args:
+        summary: The summary of the older messages, or None
+
+    Returns:
+        The context text, or an empty string if there is no summary
+    """
+    if not summary:
+        return ""
+    return f"""
+    SUMMARY OF THE EARLIER CONVERSATION (older messages that are no longer shown):
+    {summary}
+
+    Use this as background knowledge about the user and what you talked about. Don't mention that you have a summary.
+    """
+
+def format_relevant_context(messages: Optional[Sequence[Mapping[str, Any]]]) -> str:
+    """
+    Format older messages retrieved for the current one as prompt context
+
+    Args:
+        messages: Messages from Memory.get_relevant_messages, or None
+
+    Returns:
+        The context text, or an empty string if there are no messages
+    """
+    if not messages:
+        return ""
+
+    lines = []
+    for msg in messages:
+        content = msg['content']
+        if len(content) > RELEVANT_MESSAGE_CHARS:
+            content = content[:RELEVANT_MESSAGE_CHARS] + " [...]"
+        lines.append(f"{'User' if msg['role'] == 'user' else 'Tails'}: {content}")
+    relevant = "\n".join(lines)
+
+    return f"""
+    RELEVANT EARLIER MESSAGES (older parts of this conversation that relate to the current message):
+    {relevant}
+
+    Use them if the user refers back to something from earlier. Don't mention that these messages were looked up.
+    """
+
+def format_messages_for_gemini(chat_history: List[Dict[str, str]], _: str = None,
+                               token_budget: Optional[int] = None) -> List[Dict]:
     """
     Format messages for Gemini API, returning a list of message dictionaries.
 
     Args:
         chat_history: List of message dictionaries
         system_prompt: System prompt with personality
+        token_budget: Optional maximum history tokens; older messages beyond it are left out
 
     Returns:
         Formatted messages list for Gemini API
     """
+    # Keep only the newest messages that fit the budget (uses the token counts cached by Memory)
+    if token_budget:
+        chat_history = select_within_budget(reversed(chat_history), token_budget)
+
     # Format the chat history for Gemini API
     # Note: The system prompt is handled separately by the calling function
 
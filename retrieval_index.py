@@ -0,0 +1,194 @@
+import re
+import zlib
+import logging
+from functools import lru_cache
+from typing import Any, List, Mapping, Optional, Tuple
+import numpy as np
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+# Words of three or more letters, in any script the bot speaks (Latin with diacritics, Turkish, Cyrillic, ...)
+WORD_PATTERN = re.compile(r"\w{3,}")
+
+# BM25 term-frequency saturation and length normalization
+BM25_K1 = 1.2
+BM25_B = 0.75
+
+# Words longer than this also add a prefix feature, so inflected forms ("kitaplarımızı",
+# "kitabı", "Häuser") still match across messages without a language-specific stemmer
+PREFIX_LENGTH = 5
+
+@lru_cache(maxsize=65536)
+def _word_features(word: str, dim: int) -> Tuple[int, ...]:
+    """
+    Hash a word and, for long words, its prefix into feature indices
+
+    Chats repeat most of their words, so the hashes are cached across messages and chats.
+    """
+    features = (zlib.crc32(word.encode("utf-8")) % dim,)
+    if len(word) > PREFIX_LENGTH:
+        features += (zlib.crc32(("~" + word[:PREFIX_LENGTH]).encode("utf-8")) % dim,)
+    return features
+
+def vectorize(text: str, dim: int) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Turn a text into a sparse hashed term-frequency vector
+
+    Args:
+        text: The text
+        dim: Number of hash buckets
+
+    Returns:
+        (feature indices, term counts), both sorted by feature index
+    """
+    features = [feature for word in WORD_PATTERN.findall(text.lower()) for feature in _word_features(word, dim)]
+    if not features:
+        return np.empty(0, dtype=np.int32), np.empty(0, dtype=np.float32)
+
+    indices, counts = np.unique(np.array(features, dtype=np.int32), return_counts=True)
+    return indices, counts.astype(np.float32)
+
+class ChatRetrievalIndex:
+    """
+    TF-IDF index over one chat's stored messages, for finding older turns related to a new message
+
+    Messages are hashed into a sparse matrix kept in NumPy arrays, one row per
+    slot of a ring buffer that mirrors the chat's LONG_MEMORY_SIZE deque: adding
+    a message vectorizes only that message and overwrites the row of the one the
+    deque dropped. Document frequencies are updated with each row, so a query
+    weights terms by how rare they are in this chat. Rows are scored with BM25
+    weighting, which unlike plain cosine similarity doesn't let short messages
+    made of common words ("can you tell me") outrank a rare shared name.
+    """
+    def __init__(self, capacity: int, dim: int):
+        self.capacity = max(1, capacity)
+        self.dim = dim
+
+        # Row data per ring slot: hashed features, term counts and the indexed message
+        self.features: List[Optional[np.ndarray]] = [None] * self.capacity
+        self.counts: List[Optional[np.ndarray]] = [None] * self.capacity
+        self.messages: List[Optional[Mapping[str, Any]]] = [None] * self.capacity
+
+        # Number of rows containing each feature, and the number of features and words of each row
+        self.doc_freq = np.zeros(dim, dtype=np.int32)
+        self.sizes = np.zeros(self.capacity, dtype=np.int64)
+        self.lengths = np.zeros(self.capacity, dtype=np.float32)
+
+        self.next_slot = 0
+        self.count = 0
+
+        # Concatenated (rows, features, BM25 term weights) of all slots, rebuilt after changes
+        self._matrix: Optional[Tuple[np.ndarray, np.ndarray, np.ndarray]] = None
+
+    def add(self, message: Mapping[str, Any]) -> None:
+        """
+        Index a new message, replacing the oldest one once the index is full
+
+        Args:
+            message: Message with a 'content' key
+        """
+        slot = self.next_slot
+        self._set_row(slot, message)
+        self.messages[slot] = message
+        self.next_slot = (slot + 1) % self.capacity
+        self.count = min(self.count + 1, self.capacity)
+
+    def update(self, old_message: Mapping[str, Any], new_message: Mapping[str, Any]) -> bool:
+        """
+        Re-index a message whose content changed
+
+        Args:
+            old_message: The indexed message object
+            new_message: The message replacing it
+
+        Returns:
+            True if the old message is in the index
+        """
+        for slot, indexed in enumerate(self.messages):
+            if indexed is old_message:
+                self._set_row(slot, new_message)
+                self.messages[slot] = new_message
+                return True
+        return False
+
+    def _set_row(self, slot: int, message: Mapping[str, Any]) -> None:
+        """
+        Replace the row of a slot with the vector of a message
+        """
+        if self.features[slot] is not None:
+            self.doc_freq[self.features[slot]] -= 1
+
+        features, counts = vectorize(message["content"], self.dim)
+        self.doc_freq[features] += 1
+        self.features[slot] = features
+        self.counts[slot] = counts
+        self.sizes[slot] = len(features)
+        self.lengths[slot] = counts.sum()
+        self._matrix = None
+
+    def _get_matrix(self) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """
+        Get the index as one sparse matrix in coordinate form, with BM25 term weights
+        """
+        if self._matrix is None:
+            if self.count:
+                # The ring fills from slot 0, so the used slots are the first count ones
+                used = slice(0, self.count)
+                rows = np.repeat(np.arange(self.count, dtype=np.int32), self.sizes[used])
+                cols = np.concatenate(self.features[used])
+                counts = np.concatenate(self.counts[used])
+                avg_length = max(float(self.lengths[used].mean()), 1.0)
+                length_norm = 1 - BM25_B + BM25_B * self.lengths[rows] / avg_length
+                vals = counts * (BM25_K1 + 1) / (counts + BM25_K1 * length_norm)
+            else:
+                rows = cols = np.empty(0, dtype=np.int32)
+                vals = np.empty(0, dtype=np.float32)
+            self._matrix = (rows, cols, vals)
+        return self._matrix
+
+    def query(self, text: str, k: int, exclude_newest: int = 0,
+              min_score: float = 0.0) -> List[Mapping[str, Any]]:
+        """
+        Find the indexed messages most similar to a text
+
+        Args:
+            text: The text to match, usually the message being answered
+            k: Maximum number of messages to return
+            exclude_newest: Skip this many of the newest messages (those already in the prompt)
+            min_score: Minimum score of a returned message, the share of the query's term weight it matches
+
+        Returns:
+            The matching messages in chronological order
+        """
+        if k <= 0 or self.count <= exclude_newest:
+            return []
+
+        q_cols, _ = vectorize(text, self.dim)
+        if not len(q_cols):
+            return []
+
+        rows, cols, vals = self._get_matrix()
+        doc_freq = self.doc_freq[q_cols]
+        idf = np.log(1.0 + (self.count - doc_freq + 0.5) / (doc_freq + 0.5)).astype(np.float32)
+
+        query_vector = np.zeros(self.dim, dtype=np.float32)
+        query_vector[q_cols] = idf
+
+        # BM25 scores as sparse dot products, relative to the total weight of the query terms,
+        # so about 1.0 means every query term occurs once in a message of average length
+        scores = np.bincount(rows, weights=vals * query_vector[cols], minlength=self.capacity) / idf.sum()
+
+        # Age of each slot, 0 for the newest message; skip the excluded and the empty slots
+        ages = (self.next_slot - 1 - np.arange(self.capacity)) % self.capacity
+        scores[(ages < exclude_newest) | (ages >= self.count)] = -1.0
+
+        candidates = np.flatnonzero(scores >= max(min_score, 1e-6))
+        if len(candidates) > k:
+            candidates = candidates[np.argpartition(scores[candidates], -k)[-k:]]
+
+        # Oldest first, like the rest of the history
+        return [self.messages[slot] for slot in sorted(candidates, key=lambda slot: -ages[slot])]
+
+    def __len__(self) -> int:
+        return self.count
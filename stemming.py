@@ -0,0 +1,401 @@
+import re
+import logging
+from functools import lru_cache
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+# Rule-based stemmers in the style of the Snowball algorithms. English and
+# German follow the Snowball rules closely, French and Spanish are light
+# variants that only strip the most frequent plural, derivational and verb endings.
+#
+# Stems are too coarse for translation cache keys: "Spieler" and "Spiel",
+# "united" and "unit" or "casa" and "caso" share one. Cache keys use lemma()
+# instead, which only maps plurals to their singular where the ending can't be
+# anything else, so "Entwicklung" and "Entwicklungen" still share a translation.
+
+def _r1(word: str, vowels: str, min_start: int = 0) -> int:
+    """
+    Get the start of region R1: after the first non-vowel following a vowel
+    """
+    for i in range(1, len(word)):
+        if word[i] not in vowels and word[i - 1] in vowels:
+            return max(i + 1, min_start)
+    return len(word)
+
+def _r2(word: str, vowels: str, r1: int) -> int:
+    """
+    Get the start of region R2: R1 applied again inside R1
+    """
+    for i in range(r1 + 1, len(word)):
+        if word[i] not in vowels and word[i - 1] in vowels:
+            return i + 1
+    return len(word)
+
+def _rv(word: str, vowels: str) -> int:
+    """
+    Get the start of region RV used by the Romance language stemmers
+    """
+    if len(word) < 2:
+        return len(word)
+    if word[0] not in vowels and word[1] in vowels:
+        # Consonant followed by vowel: RV starts after the next consonant or at the 3rd letter
+        for i in range(2, len(word)):
+            if word[i] not in vowels:
+                return i + 1
+        return len(word)
+    # Otherwise RV starts after the next vowel
+    for i in range(1, len(word)):
+        if word[i] in vowels:
+            return i + 1
+    return len(word)
+
+def _strip_suffix(word: str, suffixes, region: int) -> str:
+    """
+    Remove the longest of the given suffixes if it lies inside the region
+    """
+    for suffix in suffixes:
+        if word.endswith(suffix):
+            if len(word) - len(suffix) >= region:
+                return word[:-len(suffix)]
+            return word
+    return word
+
+# --- English (Porter2) ---
+
+_EN_VOWELS = "aeiouy"
+_EN_DOUBLES = ("bb", "dd", "ff", "gg", "mm", "nn", "pp", "rr", "tt")
+_EN_LI_ENDINGS = "cdeghkmnrt"
+_EN_STEP2 = (
+    ("ization", "ize"), ("ational", "ate"), ("fulness", "ful"), ("ousness", "ous"),
+    ("iveness", "ive"), ("tional", "tion"), ("biliti", "ble"), ("lessli", "less"),
+    ("entli", "ent"), ("ation", "ate"), ("alism", "al"), ("aliti", "al"), ("ousli", "ous"),
+    ("iviti", "ive"), ("fulli", "ful"), ("enci", "ence"), ("anci", "ance"), ("abli", "able"),
+    ("izer", "ize"), ("ator", "ate"), ("alli", "al"), ("bli", "ble"), ("logi", "log"),
+)
+_EN_STEP3 = (
+    ("ational", "ate"), ("tional", "tion"), ("alize", "al"), ("icate", "ic"),
+    ("iciti", "ic"), ("ical", "ic"), ("ful", ""), ("ness", ""),
+)
+_EN_STEP4 = (
+    "ement", "ance", "ence", "able", "ible", "ment", "ant", "ent", "ism", "ate",
+    "iti", "ous", "ive", "ize", "al", "er", "ic",
+)
+
+def _en_short_syllable(word: str) -> bool:
+    if len(word) == 2:
+        return word[0] in _EN_VOWELS and word[1] not in _EN_VOWELS
+    return (len(word) > 2 and word[-3] not in _EN_VOWELS and word[-2] in _EN_VOWELS
+            and word[-1] not in _EN_VOWELS + "wx")
+
+def stem_english(word: str) -> str:
+    if len(word) <= 2:
+        return word
+
+    word = word.lstrip("'")
+    if word.startswith("y"):
+        word = "Y" + word[1:]
+    word = re.sub(r"([aeiouy])y", r"\1Y", word)
+
+    r1 = _r1(word, _EN_VOWELS)
+    for prefix in ("gener", "commun", "arsen"):
+        if word.startswith(prefix):
+            r1 = len(prefix)
+    r2 = _r2(word, _EN_VOWELS, r1)
+
+    # Step 0: possessives
+    for suffix in ("'s'", "'s", "'"):
+        if word.endswith(suffix):
+            word = word[:-len(suffix)]
+            break
+
+    # Step 1a: plurals
+    if word.endswith("sses"):
+        word = word[:-2]
+    elif word.endswith(("ied", "ies")):
+        word = word[:-2] if len(word) > 4 else word[:-1]
+    elif word.endswith(("us", "ss")):
+        pass
+    elif word.endswith("s") and any(c in _EN_VOWELS for c in word[:-2]):
+        word = word[:-1]
+
+    # Step 1b: past tense and gerunds
+    if word.endswith(("eedly", "eed")):
+        suffix = "eedly" if word.endswith("eedly") else "eed"
+        if len(word) - len(suffix) >= r1:
+            word = word[:-len(suffix)] + "ee"
+    else:
+        for suffix in ("ingly", "edly", "ing", "ed"):
+            if word.endswith(suffix):
+                stem = word[:-len(suffix)]
+                if any(c in _EN_VOWELS for c in stem):
+                    word = stem
+                    if word.endswith(("at", "bl", "iz")):
+                        word += "e"
+                    elif word.endswith(_EN_DOUBLES):
+                        word = word[:-1]
+                    elif r1 >= len(word) and _en_short_syllable(word):
+                        word += "e"
+                break
+
+    # Step 1c: final y after a consonant
+    if len(word) > 2 and word[-1] in "yY" and word[-2] not in _EN_VOWELS:
+        word = word[:-1] + "i"
+
+    # Step 2: derivational suffixes in R1
+    for suffix, replacement in _EN_STEP2:
+        if word.endswith(suffix):
+            if len(word) - len(suffix) >= r1:
+                word = word[:-len(suffix)] + replacement
+            break
+    else:
+        if word.endswith("li") and len(word) - 2 >= r1 and len(word) > 2 and word[-3] in _EN_LI_ENDINGS:
+            word = word[:-2]
+
+    # Step 3: more derivational suffixes in R1
+    for suffix, replacement in _EN_STEP3:
+        if word.endswith(suffix):
+            if len(word) - len(suffix) >= r1:
+                word = word[:-len(suffix)] + replacement
+            break
+    else:
+        if word.endswith("ative") and len(word) - 5 >= r2:
+            word = word[:-5]
+
+    # Step 4: suffixes in R2
+    for suffix in _EN_STEP4:
+        if word.endswith(suffix):
+            if len(word) - len(suffix) >= r2:
+                word = word[:-len(suffix)]
+            break
+    else:
+        if word.endswith(("sion", "tion")) and len(word) - 3 >= r2:
+            word = word[:-3]
+
+    # Step 5: final e and double l
+    if word.endswith("e"):
+        if len(word) - 1 >= r2 or (len(word) - 1 >= r1 and not _en_short_syllable(word[:-1])):
+            word = word[:-1]
+    elif word.endswith("ll") and len(word) - 1 >= r2:
+        word = word[:-1]
+
+    return word.replace("Y", "y")
+
+# --- German ---
+
+_DE_VOWELS = "aeiouyäöü"
+
+def stem_german(word: str) -> str:
+    word = word.replace("ß", "ss")
+    if len(word) <= 3:
+        return word
+
+    r1 = _r1(word, _DE_VOWELS, min_start=3)
+    r2 = _r2(word, _DE_VOWELS, r1)
+
+    # Step 1: inflectional endings
+    for suffix in ("ern", "em", "er", "en", "es", "e", "s"):
+        if word.endswith(suffix) and len(word) - len(suffix) >= r1:
+            if suffix == "s" and word[-2] not in "bdfghklmnrt":
+                continue
+            word = word[:-len(suffix)]
+            if suffix in ("en", "es", "e") and word.endswith("niss"):
+                word = word[:-1]
+            break
+
+    # Step 2: more inflectional endings
+    for suffix in ("est", "en", "er", "st"):
+        if word.endswith(suffix) and len(word) - len(suffix) >= r1:
+            if suffix == "st" and (len(word) < 6 or word[-3] not in "bdfghklmnt"):
+                continue
+            word = word[:-len(suffix)]
+            break
+
+    # Step 3: derivational suffixes in R2
+    for suffix in ("heit", "keit", "lich", "isch", "end", "ung", "ig", "ik"):
+        if not word.endswith(suffix) or len(word) - len(suffix) < r2:
+            continue
+        if suffix in ("isch", "ig", "ik") and word[:-len(suffix)].endswith("e"):
+            break
+        word = word[:-len(suffix)]
+        if suffix in ("end", "ung"):
+            if word.endswith("ig") and len(word) - 2 >= r2 and not word.endswith("eig"):
+                word = word[:-2]
+        elif suffix in ("lich", "heit"):
+            if word.endswith(("er", "en")) and len(word) - 2 >= r1:
+                word = word[:-2]
+        elif suffix == "keit":
+            for inner in ("lich", "ig"):
+                if word.endswith(inner) and len(word) - len(inner) >= r2:
+                    word = word[:-len(inner)]
+                    break
+        break
+
+    return word.replace("ä", "a").replace("ö", "o").replace("ü", "u")
+
+# --- French (light) ---
+
+_FR_VOWELS = "aeiouyâàëéêèïîôûù"
+_FR_DERIVATIONAL = (
+    ("issements", ""), ("issement", ""), ("atrices", ""), ("atrice", ""), ("ateurs", ""),
+    ("ateur", ""), ("ations", ""), ("ation", ""), ("logies", "log"), ("logie", "log"),
+    ("ements", ""), ("ement", ""), ("ences", "ent"), ("ence", "ent"), ("ances", ""),
+    ("ance", ""), ("ismes", ""), ("isme", ""), ("istes", ""), ("iste", ""), ("ables", ""),
+    ("able", ""), ("iques", ""), ("ique", ""), ("euses", ""), ("euse", ""), ("ités", ""),
+    ("ité", ""), ("ives", ""), ("ive", ""), ("ifs", ""), ("if", ""), ("eux", ""),
+)
+_FR_VERB_ENDINGS = (
+    "eraient", "erions", "assent", "erait", "erons", "eront", "aient", "ments", "ment",
+    "erez", "iez", "era", "ées", "ait", "ant", "ons", "ent", "ée", "és", "er", "ez", "é",
+    "ir", "it",
+)
+
+def stem_french(word: str) -> str:
+    if len(word) <= 3:
+        return word
+
+    rv = _rv(word, _FR_VOWELS)
+    r1 = _r1(word, _FR_VOWELS)
+    r2 = _r2(word, _FR_VOWELS, r1)
+
+    # Step 1: derivational suffixes in R2
+    for suffix, replacement in _FR_DERIVATIONAL:
+        if word.endswith(suffix):
+            if len(word) - len(suffix) >= r2:
+                return word[:-len(suffix)] + replacement
+            break
+
+    # Step 2: verb endings in RV
+    stemmed = _strip_suffix(word, _FR_VERB_ENDINGS, rv)
+    if stemmed != word:
+        return stemmed
+
+    # Step 3: plurals and residual final e
+    if word.endswith("aux") and len(word) - 3 >= rv:
+        return word[:-3] + "al"
+    if word.endswith(("s", "x")) and len(word) - 1 >= rv:
+        word = word[:-1]
+    if word.endswith("e") and len(word) - 1 >= rv:
+        word = word[:-1]
+
+    return word
+
+# --- Spanish (light) ---
+
+_ES_VOWELS = "aeiouáéíóúü"
+_ES_ACCENTS = str.maketrans("áéíóú", "aeiou")
+_ES_DERIVATIONAL = (
+    ("amientos", ""), ("imientos", ""), ("amiento", ""), ("imiento", ""), ("aciones", ""),
+    ("uciones", "u"), ("logías", "log"), ("encias", "ente"), ("adoras", ""), ("adores", ""),
+    ("ancias", ""), ("idades", ""), ("mente", ""), ("ación", ""), ("ución", "u"),
+    ("logía", "log"), ("encia", "ente"), ("adora", ""), ("ador", ""), ("ancia", ""),
+    ("anzas", ""), ("anza", ""), ("ables", ""), ("ibles", ""), ("istas", ""), ("able", ""),
+    ("ible", ""), ("ista", ""), ("idad", ""), ("icos", ""), ("icas", ""), ("osos", ""),
+    ("osas", ""), ("ivos", ""), ("ivas", ""), ("ico", ""), ("ica", ""), ("oso", ""),
+    ("osa", ""), ("ivo", ""), ("iva", ""),
+)
+_ES_VERB_ENDINGS = (
+    "aríamos", "eríamos", "iríamos", "iéramos", "aremos", "eremos", "iremos", "ábamos",
+    "ieron", "iendo", "arán", "erán", "irán", "aron", "ando", "aban", "aría", "ería",
+    "iría", "ados", "idos", "adas", "idas", "amos", "emos", "imos", "ías", "aba", "ado",
+    "ido", "ada", "ida", "ía", "ió", "ar", "er", "ir",
+)
+
+def stem_spanish(word: str) -> str:
+    if len(word) <= 3:
+        return word
+
+    rv = _rv(word, _ES_VOWELS)
+    r1 = _r1(word, _ES_VOWELS)
+    r2 = _r2(word, _ES_VOWELS, r1)
+
+    # Step 1: derivational suffixes in R2, otherwise verb endings in RV
+    for suffix, replacement in _ES_DERIVATIONAL:
+        if word.endswith(suffix):
+            if len(word) - len(suffix) >= r2:
+                word = word[:-len(suffix)] + replacement
+            break
+    else:
+        word = _strip_suffix(word, _ES_VERB_ENDINGS, rv)
+
+    # Step 2: residual plural and vowel endings
+    word = _strip_suffix(word, ("os", "as", "es", "a", "o", "e", "s"), rv)
+
+    return word.translate(_ES_ACCENTS)
+
+_STEMMERS = {
+    "english": stem_english,
+    "german": stem_german,
+    "french": stem_french,
+    "spanish": stem_spanish,
+}
+
+@lru_cache(maxsize=65536)
+def stem(word: str, language: str) -> str:
+    """
+    Normalize a word to its stem for use as a cache key
+
+    Args:
+        word: The word to normalize
+        language: The language of the word
+
+    Returns:
+        The stem, or the lowercased word if no stemmer exists for the language
+    """
+    word = word.strip().lower()
+    stemmer = _STEMMERS.get(language.lower())
+    if stemmer is None or not word.isalpha():
+        return word
+
+    try:
+        return stemmer(word) or word
+    except Exception as e:
+        logger.error(f"Error stemming word '{word}' in {language}: {e}")
+        return word
+
+# Plural endings that are unambiguous because they follow a noun-forming suffix, with
+# the singular ending they are replaced by. Ordered longest first per language
+_PLURALS = {
+    "german": (
+        ("schaften", "schaft"), ("heiten", "heit"), ("keiten", "keit"), ("ungen", "ung"),
+        ("ionen", "ion"), ("täten", "tät"),
+    ),
+    "english": (
+        ("nesses", "ness"), ("ities", "ity"), ("ogies", "ogy"), ("ments", "ment"),
+        ("tions", "tion"), ("sions", "sion"), ("ships", "ship"), ("ances", "ance"),
+        ("ences", "ence"), ("isms", "ism"), ("ists", "ist"),
+    ),
+    "french": (
+        ("ements", "ement"), ("ismes", "isme"), ("istes", "iste"), ("tions", "tion"),
+        ("sions", "sion"), ("ances", "ance"), ("ences", "ence"), ("ments", "ment"),
+        ("étés", "été"), ("ités", "ité"), ("ages", "age"),
+    ),
+    "spanish": (
+        ("mientos", "miento"), ("ciones", "ción"), ("siones", "sión"), ("ismos", "ismo"),
+        ("istas", "ista"), ("dades", "dad"), ("tades", "tad"), ("ncias", "ncia"),
+        ("tudes", "tud"), ("ajes", "aje"), ("ías", "ía"),
+    ),
+}
+
+@lru_cache(maxsize=65536)
+def lemma(word: str, language: str) -> str:
+    """
+    Normalize a word for use as a translation cache key
+
+    Only plurals whose ending is unambiguous are mapped to their singular
+    ("Entwicklungen", "technologies", "naciones"); every other word is kept as
+    written, so words that merely look alike never share a translation.
+
+    Args:
+        word: The word to normalize
+        language: The language of the word
+
+    Returns:
+        The lowercased singular, or the lowercased word
+    """
+    word = word.strip().lower()
+    for plural, singular in _PLURALS.get(language.lower(), ()):
+        # The rest of the word must be a real stem, not e.g. the "j" of "jungen"
+        if word.endswith(plural) and len(word) - len(plural) >= 2:
+            return word[:-len(plural)] + singular
+    return word
@@ -0,0 +1,57 @@
+import logging
+import os
+import shutil
+import tempfile
+import cefr_index
+
+# Configure logging
+logging.basicConfig(
+    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
+    level=logging.DEBUG
+)
+logger = logging.getLogger(__name__)
+
+# Small compiled index in the format written by build_index
+FIXTURE_TSV = "entwicklung\tB1\nhaus\tA1\nmöglichkeit\tB2\nstraße\tA1\n"
+
+def test_cefr_index_lookups():
+    """Test lookups, case and Unicode handling, and languages without an index file"""
+
+    index_dir = tempfile.mkdtemp()
+    original_index_dir = cefr_index.INDEX_DIR
+    try:
+        with open(os.path.join(index_dir, "german.tsv"), 'w', encoding='utf-8') as f:
+            f.write(FIXTURE_TSV)
+        cefr_index.INDEX_DIR = index_dir
+        cefr_index.load_index.cache_clear()
+
+        assert cefr_index.get_level("haus", "German") == "A1"
+        assert cefr_index.get_level("Entwicklung", "german") == "B1"
+
+        # Words are lowercased and NFC-normalized, so decomposed umlauts match too
+        assert cefr_index.get_level(" MÖGLICHKEIT ", "German") == "B2"
+        assert cefr_index.get_level("Möglichkeit", "German") == "B2"
+        assert cefr_index.get_level("Straße", "German") == "A1"
+        assert cefr_index.get_level("Gesellschaft", "German") is None
+
+        a1_words, uncommon_words, unseen_words = cefr_index.classify_words(
+            ["Haus", "Gesellschaft", "Entwicklung", "Straße", "Möglichkeit"], "German")
+        assert a1_words == ["Haus", "Straße"]
+        assert uncommon_words == ["Entwicklung", "Möglichkeit"]
+        assert unseen_words == ["Gesellschaft"]
+
+        # A language without an index file has an empty index, every word is unseen
+        assert len(cefr_index.load_index("Klingon")) == 0
+        assert cefr_index.get_level("haus", "Klingon") is None
+        assert cefr_index.classify_words(["haus"], "Klingon") == ([], [], ["haus"])
+
+        logger.info("CEFR index lookup test passed!")
+    finally:
+        cefr_index.INDEX_DIR = original_index_dir
+        cefr_index.load_index.cache_clear()
+        shutil.rmtree(index_dir)
+
+    return True
+
+if __name__ == "__main__":
+    test_cefr_index_lookups()
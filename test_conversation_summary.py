@@ -0,0 +1,140 @@
+import logging
+import shutil
+import tempfile
+import config
+import conversation_summary
+from conversation_summary import ConversationSummarizer, parse_summary_response
+from memory import Memory
+from token_budget import estimate_tokens
+
+# Configure logging
+logging.basicConfig(
+    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
+    level=logging.DEBUG
+)
+logger = logging.getLogger(__name__)
+
+def test_parse_summary_response():
+    """Test that the blocks of a batched summary response are matched to their conversations"""
+
+    text = """Here are the updated summaries:
+
+### CONVERSATION 1
+The user is Ayla, learns German for a job in Berlin.
+
+### Conversation 2:
+Talked about rockets and planes.
+
+### CONVERSATION 7
+Not part of the request."""
+
+    summaries = parse_summary_response(text, 2)
+    logger.info(f"Parsed summaries: {summaries}")
+    assert summaries == {
+        1: "The user is Ayla, learns German for a job in Berlin.",
+        2: "Talked about rockets and planes."
+    }
+
+    return True
+
+def test_rolling_summary():
+    """Test that messages leaving the short window are summarized in one batched request and stored"""
+
+    original_settings = (config.MEMORY_DIR, config.SUMMARY_ENABLED)
+    original_generate = conversation_summary._generate_summary_content
+    memory_dir = tempfile.mkdtemp()
+    prompts = []
+
+    def fake_generate(prompt):
+        prompts.append(prompt)
+        return "\n".join(f"### CONVERSATION {number}\nSummary {number}" for number in (1, 2))
+
+    try:
+        config.MEMORY_DIR = memory_dir
+        config.SUMMARY_ENABLED = True
+        conversation_summary._generate_summary_content = fake_generate
+
+        memory = Memory()
+        for chat_id in (1, 2):
+            for i in range(config.SHORT_MEMORY_SIZE + config.SUMMARY_BATCH_MESSAGES):
+                memory.add_message(chat_id, "user" if i % 2 == 0 else "model", f"Chat {chat_id} message {i}")
+
+        # Both chats are due, and one request summarizes both of them
+        assert memory.summary_pending == {1, 2}
+        summarizer = ConversationSummarizer(memory, interval=0)
+        assert summarizer.run_once() == 2
+        assert len(prompts) == 1, f"Expected one request, got {len(prompts)}"
+        assert f"Chat 1 message {config.SUMMARY_BATCH_MESSAGES - 1}" in prompts[0]
+        assert f"Chat 1 message {config.SUMMARY_BATCH_MESSAGES}" not in prompts[0], "A message still in the window was summarized"
+
+        assert memory.get_summary(1) == "Summary 1"
+        assert memory.get_summary(2) == "Summary 2"
+
+        # Summarized chats are only queued again once enough new messages left the window
+        memory.add_message(1, "user", "One more message")
+        assert not memory.summary_pending
+        memory.shutdown()
+
+        # The summary is stored with the memory
+        memory = Memory()
+        assert memory.get_summary(1) == "Summary 1"
+        memory.shutdown()
+
+        logger.info("Rolling summary test passed!")
+    finally:
+        config.MEMORY_DIR, config.SUMMARY_ENABLED = original_settings
+        conversation_summary._generate_summary_content = original_generate
+        shutil.rmtree(memory_dir)
+
+    return True
+
+def test_summary_covers_messages_outside_token_budget():
+    """Test that messages within SHORT_MEMORY_SIZE but outside the token budget window are summarized"""
+
+    original_settings = (config.MEMORY_DIR, config.SUMMARY_ENABLED, config.HISTORY_TOKEN_BUDGET,
+                         config.DEEP_SEARCH_HISTORY_TOKEN_BUDGET)
+    memory_dir = tempfile.mkdtemp()
+    try:
+        config.MEMORY_DIR = memory_dir
+        config.SUMMARY_ENABLED = True
+
+        # Long messages: the deep-search budget only fits 5 of them, the normal one 10
+        content = "x" * 400
+        tokens = estimate_tokens(content)
+        config.HISTORY_TOKEN_BUDGET = 10 * tokens
+        config.DEEP_SEARCH_HISTORY_TOKEN_BUDGET = 5 * tokens
+
+        memory = Memory()
+        total = 5 + config.SUMMARY_BATCH_MESSAGES
+        assert total < config.SHORT_MEMORY_SIZE
+        for i in range(total):
+            memory.add_message(1, "user" if i % 2 == 0 else "model", f"{i:03d}{content[3:]}")
+
+        # All messages fit SHORT_MEMORY_SIZE, yet the ones older than the narrowest window are due
+        assert len(memory.get_history_window(1, config.DEEP_SEARCH_HISTORY_TOKEN_BUDGET)) == 5
+        assert memory.summary_pending == {1}
+
+        batch = memory.take_summary_batch(8)
+        assert len(batch) == 1
+        chat_id, previous, messages, until = batch[0]
+        assert chat_id == 1 and previous is None
+        assert [content[:3] for _, content in messages] == [f"{i:03d}" for i in range(config.SUMMARY_BATCH_MESSAGES)]
+
+        # Every message is either in the window or in the summary
+        window = memory.get_history_window(1, config.DEEP_SEARCH_HISTORY_TOKEN_BUDGET)
+        assert len(messages) + len(window) == total
+        assert window[0].timestamp > until
+        memory.shutdown()
+
+        logger.info("Token budget summary test passed!")
+    finally:
+        (config.MEMORY_DIR, config.SUMMARY_ENABLED, config.HISTORY_TOKEN_BUDGET,
+         config.DEEP_SEARCH_HISTORY_TOKEN_BUDGET) = original_settings
+        shutil.rmtree(memory_dir)
+
+    return True
+
+if __name__ == "__main__":
+    test_parse_summary_response()
+    test_rolling_summary()
+    test_summary_covers_messages_outside_token_budget()
@@ -0,0 +1,125 @@
+import logging
+import asyncio
+from unittest import mock
+import main
+from word_translation import append_glossary, format_glossary
+
+# Configure logging
+logging.basicConfig(
+    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
+    level=logging.DEBUG
+)
+logger = logging.getLogger(__name__)
+
+CHAT_ID = 12345
+TIMESTAMP = 1700000000.0
+RESPONSE = "Die Entwicklung der Gesellschaft ist spannend."
+TRANSLATIONS = {"Entwicklung": "gelişme", "Gesellschaft": "toplum"}
+
+def fake_message(text):
+    """Create a sent Telegram message whose edit_text can be checked"""
+    message = mock.MagicMock()
+    message.text = text
+    message.edit_text = mock.AsyncMock()
+    return message
+
+def deliver(last_message, translations=TRANSLATIONS, status_message=None):
+    """Run deliver_glossary with a mocked bot, glossary builder and memory"""
+    bot = mock.MagicMock()
+    bot.send_message = mock.AsyncMock()
+    with mock.patch.object(main, "build_glossary_async", mock.AsyncMock(return_value=translations)), \
+            mock.patch.object(main, "memory") as memory:
+        asyncio.run(main.deliver_glossary(bot, CHAT_ID, last_message, RESPONSE, "German", TIMESTAMP, status_message))
+    return bot, memory
+
+def test_glossary_edits_last_message():
+    """Test that the glossary is appended to the last sent message when it still fits"""
+
+    last_message = fake_message(RESPONSE)
+    status_message = fake_message("Deep search time: 12.0 seconds")
+    bot, memory = deliver(last_message, status_message=status_message)
+
+    last_message.edit_text.assert_awaited_once_with(f"{RESPONSE}\n\n{format_glossary(TRANSLATIONS)}")
+    bot.send_message.assert_not_awaited()
+    memory.update_message.assert_called_once_with(CHAT_ID, TIMESTAMP, append_glossary(RESPONSE, TRANSLATIONS))
+
+    # The progress message gets the glossary time appended
+    assert status_message.edit_text.await_args.args[0].startswith("Deep search time: 12.0 seconds\nGlossary time: ")
+
+    logger.info("Glossary edit test passed!")
+    return True
+
+def test_glossary_follow_up_when_too_long():
+    """Test that the glossary is sent as a follow-up message when the edited message would be too long"""
+
+    # One character short of the limit with the glossary appended
+    glossary = format_glossary(TRANSLATIONS)
+    last_message = fake_message("x" * (main.MAX_MESSAGE_LENGTH - 100 - len(glossary) - 1))
+    bot, memory = deliver(last_message)
+    last_message.edit_text.assert_not_awaited()
+    bot.send_message.assert_awaited_once_with(chat_id=CHAT_ID, text=glossary)
+    memory.update_message.assert_called_once()
+
+    # Without a message to edit the glossary is sent as a follow-up too
+    bot, memory = deliver(None)
+    bot.send_message.assert_awaited_once_with(chat_id=CHAT_ID, text=glossary)
+
+    logger.info("Glossary follow-up test passed!")
+    return True
+
+def test_glossary_edit_failure():
+    """Test that a failed edit falls back to a follow-up message and that nothing is sent without translations"""
+
+    last_message = fake_message(RESPONSE)
+    last_message.edit_text.side_effect = Exception("Message can't be edited")
+    bot, memory = deliver(last_message)
+    last_message.edit_text.assert_awaited_once()
+    bot.send_message.assert_awaited_once_with(chat_id=CHAT_ID, text=format_glossary(TRANSLATIONS))
+    memory.update_message.assert_called_once_with(CHAT_ID, TIMESTAMP, append_glossary(RESPONSE, TRANSLATIONS))
+
+    # If the follow-up fails as well, the error is logged and the stored answer is left alone
+    last_message = fake_message(RESPONSE)
+    last_message.edit_text.side_effect = Exception("Message can't be edited")
+    bot = mock.MagicMock()
+    bot.send_message = mock.AsyncMock(side_effect=Exception("Network error"))
+    with mock.patch.object(main, "build_glossary_async", mock.AsyncMock(return_value=TRANSLATIONS)), \
+            mock.patch.object(main, "memory") as memory:
+        asyncio.run(main.deliver_glossary(bot, CHAT_ID, last_message, RESPONSE, "German", TIMESTAMP))
+    memory.update_message.assert_not_called()
+
+    # No uncommon words: nothing is sent or stored
+    last_message = fake_message(RESPONSE)
+    bot, memory = deliver(last_message, translations={})
+    last_message.edit_text.assert_not_awaited()
+    bot.send_message.assert_not_awaited()
+    memory.update_message.assert_not_called()
+
+    logger.info("Glossary edit failure test passed!")
+    return True
+
+def test_schedule_glossary_delivery():
+    """Test that deliveries run in the background and that Turkish answers get no glossary"""
+
+    async def schedule():
+        with mock.patch.object(main, "deliver_glossary", mock.AsyncMock()) as deliver_glossary:
+            main.schedule_glossary_delivery(None, CHAT_ID, None, RESPONSE, "Turkish", TIMESTAMP)
+            assert not main.glossary_tasks
+
+            main.schedule_glossary_delivery(None, CHAT_ID, None, RESPONSE, "German", TIMESTAMP)
+            assert len(main.glossary_tasks) == 1
+            await asyncio.gather(*main.glossary_tasks)
+            await asyncio.sleep(0)
+
+            deliver_glossary.assert_awaited_once_with(None, CHAT_ID, None, RESPONSE, "German", TIMESTAMP, None)
+            assert not main.glossary_tasks, "Finished deliveries should not stay referenced"
+
+    asyncio.run(schedule())
+
+    logger.info("Glossary scheduling test passed!")
+    return True
+
+if __name__ == "__main__":
+    test_glossary_edits_last_message()
+    test_glossary_follow_up_when_too_long()
+    test_glossary_edit_failure()
+    test_schedule_glossary_delivery()
@@ -0,0 +1,109 @@
+import os
+import logging
+import sys
+import shutil
+import tempfile
+import threading
+from local_dictionary import LocalDictionary, import_entries
+
+# Configure logging
+logging.basicConfig(
+    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
+    level=logging.DEBUG
+)
+logger = logging.getLogger(__name__)
+
+def test_imported_entries_are_found():
+    """Test bulk import in the supported formats and lookups with hit statistics"""
+
+    dictionary_dir = tempfile.mkdtemp()
+    try:
+        source_file = os.path.join(dictionary_dir, "source.txt")
+        with open(source_file, 'w', encoding='utf-8') as f:
+            f.write("# German technical vocabulary\n")
+            f.write("Übermensch\tüstün insan\n")
+            f.write("wissenschaft, bilim\n")
+            f.write("entwicklung: gelişim\n")
+            f.write("zeitgeist = zamanın ruhu\n")
+
+        assert import_entries("German", [source_file], dictionary_dir) == 4
+
+        # Importing again merges and replaces existing entries
+        with open(source_file, 'w', encoding='utf-8') as f:
+            f.write("entwicklung\tgelişme\n")
+            f.write("aufmerksamkeit\tdikkat\n")
+        assert import_entries("German", [source_file], dictionary_dir) == 5
+
+        dictionary = LocalDictionary(dictionary_dir)
+        found = dictionary.lookup_many(["übermensch", "Entwicklung", "Zeitgeist", "Haus"], "German")
+        logger.info(f"Found translations: {found}")
+        assert found == {"übermensch": "üstün insan", "Entwicklung": "gelişme", "Zeitgeist": "zamanın ruhu"}
+
+        # Languages without a dictionary simply miss
+        assert dictionary.lookup("science", "Italian") is None
+
+        stats = dictionary.get_stats()
+        logger.info(f"Local dictionary stats: {stats}")
+        assert stats["hits"] == 3 and stats["misses"] == 2
+        dictionary.close()
+
+        logger.info("Local dictionary test passed!")
+    finally:
+        shutil.rmtree(dictionary_dir)
+
+    return True
+
+def test_reload_during_lookups():
+    """Test that reloading a dictionary doesn't break lookups running in other threads"""
+
+    dictionary_dir = tempfile.mkdtemp()
+    try:
+        source_file = os.path.join(dictionary_dir, "source.txt")
+        with open(source_file, 'w', encoding='utf-8') as f:
+            for i in range(5000):
+                f.write(f"wort{i}\tkelime{i}\n")
+        import_entries("German", [source_file], dictionary_dir)
+
+        dictionary = LocalDictionary(dictionary_dir)
+        words = [f"wort{i}" for i in range(0, 5000, 7)]
+        expected = {word: word.replace("wort", "kelime") for word in words}
+        errors = []
+        stop = threading.Event()
+
+        def reader():
+            try:
+                while not stop.is_set():
+                    found = dictionary.lookup_many(words, "German")
+                    assert found == expected, f"Lookup found {len(found)} of {len(expected)} words"
+            except Exception as e:
+                errors.append(e)
+
+        # Switch threads often, so readers get interrupted in the middle of a search
+        switch_interval = sys.getswitchinterval()
+        sys.setswitchinterval(1e-5)
+        readers = [threading.Thread(target=reader) for _ in range(4)]
+        for thread in readers:
+            thread.start()
+        try:
+            # Drop the mapping over and over while the readers search it
+            for _ in range(200):
+                dictionary.reload("German")
+                dictionary.lookup("wort0", "German")
+        finally:
+            stop.set()
+            for thread in readers:
+                thread.join()
+            sys.setswitchinterval(switch_interval)
+
+        assert not errors, f"Lookups failed during reload: {errors[0]}"
+        dictionary.close()
+
+        logger.info("Local dictionary reload test passed!")
+    finally:
+        shutil.rmtree(dictionary_dir)
+
+    return True
+
+if __name__ == "__main__":
+    test_imported_entries_are_found()
+    test_reload_during_lookups()
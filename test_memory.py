@@ -45,5 +45,537 @@ def test_memory_persistence():
     
     return True
 
+def test_journal_recovery():
+    """Test that a snapshot plus its journal are replayed after a crash"""
+
+    test_chat_id = 54321
+    memory = Memory()
+
+    # The first message writes the snapshot, the following ones go to the journal
+    memory.add_message(test_chat_id, "user", "First message")
+    timestamp = memory.add_message(test_chat_id, "model", "Second message")
+    memory.add_message(test_chat_id, "user", "Third message")
+    memory.update_message(test_chat_id, timestamp, "Second message, edited")
+
+    journal_file = os.path.join(config.MEMORY_DIR, f"memory_{test_chat_id}.journal")
+    if config.MEMORY_JOURNAL_MODE:
+        assert os.path.exists(journal_file), f"Journal file {journal_file} was not created"
+
+        # Simulate a crash in the middle of appending a record
+        with open(journal_file, 'a', encoding='utf-8') as f:
+            f.write('{"op": "add", "role": "us')
+
+    # A new instance replays the snapshot and the journal, without waiting for an auto-save
+    new_memory = Memory()
+    loaded_messages = new_memory.get_long_memory(test_chat_id)
+    logger.info(f"Recovered {len(loaded_messages)} messages for chat {test_chat_id}")
+    if config.MEMORY_JOURNAL_MODE:
+        assert [msg["content"] for msg in loaded_messages] == ["First message", "Second message, edited", "Third message"]
+
+        # Compaction folds the journal into the snapshot
+        new_memory._compact_pending()
+        assert not os.path.exists(journal_file), "Journal was not removed by compaction"
+        assert len(Memory().get_long_memory(test_chat_id)) == 3
+
+    logger.info("Journal recovery test passed!")
+
+    return True
+
+def test_history_cache_is_per_chat():
+    """Test that a change to one chat only invalidates that chat's cached history"""
+
+    memory = Memory()
+    memory.add_message(111, "user", "Message for chat 111")
+    memory.add_message(222, "user", "Message for chat 222")
+
+    history_111 = memory.get_short_memory(111)
+    history_222 = memory.get_short_memory(222)
+
+    # Adding to chat 111 keeps the cached view of chat 222
+    memory.add_message(111, "model", "Reply for chat 111")
+    assert memory.get_short_memory(222) is history_222, "History of an unchanged chat was rebuilt"
+    assert len(memory.get_short_memory(111)) == 2
+    assert len(history_111) == 1, "A returned history changed after the fact"
+
+    # Returned histories are read-only
+    try:
+        history_222[0]["content"] = "changed"
+        assert False, "History view was writable"
+    except TypeError:
+        pass
+
+    stats = memory.get_cache_stats()
+    logger.info(f"History view cache stats: {stats}")
+    assert stats["hits"] >= 1
+
+    memory.shutdown()
+    logger.info("Per-chat history cache test passed!")
+
+    return True
+
+def test_sqlite_backend_migration():
+    """Test migrating JSON memories to the SQLite backend and saving dirty chats in one batch"""
+    import shutil
+    import tempfile
+    from memory_storage import migrate_json_to_sqlite
+
+    original_settings = (config.MEMORY_DIR, config.MEMORY_BACKEND, config.MEMORY_DB_PATH)
+    memory_dir = tempfile.mkdtemp()
+    try:
+        config.MEMORY_DIR = memory_dir
+        config.MEMORY_BACKEND = "json"
+        config.MEMORY_DB_PATH = os.path.join(memory_dir, "memories.db")
+
+        # Write a few chats with the JSON backend
+        memory = Memory()
+        for chat_id in (1, 2, 3):
+            memory.add_message(chat_id, "user", f"Hello from chat {chat_id}")
+            memory.add_message(chat_id, "model", f"Hi chat {chat_id}")
+        memory.shutdown()
+
+        assert migrate_json_to_sqlite(memory_dir, config.MEMORY_DB_PATH) == 3
+
+        # The SQLite backend sees the migrated chats and keeps new messages
+        config.MEMORY_BACKEND = "sqlite"
+        memory = Memory()
+        assert [msg["content"] for msg in memory.get_long_memory(2)] == ["Hello from chat 2", "Hi chat 2"]
+        memory.add_message(2, "user", "Still there?")
+        memory.add_message(4, "user", "New chat")
+        memory.shutdown()
+
+        memory = Memory()
+        assert memory.storage.list_chats() == [1, 2, 3, 4]
+        assert len(memory.get_long_memory(2)) == 3
+        memory.shutdown()
+
+        logger.info("SQLite backend migration test passed!")
+    finally:
+        config.MEMORY_DIR, config.MEMORY_BACKEND, config.MEMORY_DB_PATH = original_settings
+        shutil.rmtree(memory_dir)
+
+    return True
+
+def test_cold_chats_are_evicted():
+    """Test that only MEMORY_CACHE_SIZE chats stay resident and evicted chats reload transparently"""
+    import shutil
+    import tempfile
+
+    original_settings = (config.MEMORY_DIR, config.MEMORY_CACHE_SIZE, config.MEMORY_JOURNAL_MODE)
+    memory_dir = tempfile.mkdtemp()
+    try:
+        config.MEMORY_DIR = memory_dir
+        config.MEMORY_CACHE_SIZE = 2
+        # Without the journal, changes stay unsaved until the chat is flushed
+        config.MEMORY_JOURNAL_MODE = False
+
+        memory = Memory()
+        for chat_id in (1, 2, 3):
+            memory.add_message(chat_id, "user", f"Hello from chat {chat_id}")
+            memory.add_message(chat_id, "model", f"Hi chat {chat_id}")
+
+        # Chat 1 was the least recently used, so it was flushed and evicted
+        assert list(memory.conversations) == [2, 3], f"Unexpected resident chats: {list(memory.conversations)}"
+        assert not memory.modified_chats & {1}, "Evicted chat still has unsaved changes"
+
+        # Accessing chat 1 reloads it with both messages and evicts chat 2
+        assert [msg["content"] for msg in memory.get_long_memory(1)] == ["Hello from chat 1", "Hi chat 1"]
+        assert list(memory.conversations) == [3, 1]
+        assert 2 not in memory.chat_versions and 2 not in memory.view_cache, "Evicted chat left cache state behind"
+
+        stats = memory.get_resident_stats()
+        logger.info(f"Resident chat stats: {stats}")
+        assert stats["resident"] == 2
+        assert stats["evictions"] == 2
+        assert stats["reloads"] == 1
+        memory.shutdown()
+
+        # Nothing was lost on eviction
+        memory = Memory()
+        assert len(memory.get_long_memory(2)) == 2
+        memory.shutdown()
+
+        logger.info("Cold chat eviction test passed!")
+    finally:
+        config.MEMORY_DIR, config.MEMORY_CACHE_SIZE, config.MEMORY_JOURNAL_MODE = original_settings
+        shutil.rmtree(memory_dir)
+
+    return True
+
+def test_compressed_memory_files():
+    """Test that compressed and uncompressed memory files are both read back"""
+    import shutil
+    import tempfile
+    from memory_storage import JsonMemoryStorage, GZIP_MAGIC
+
+    original_settings = (config.MEMORY_DIR, config.MEMORY_COMPRESSION)
+    memory_dir = tempfile.mkdtemp()
+    try:
+        config.MEMORY_DIR = memory_dir
+
+        # Chat 1 is written uncompressed, chat 2 with gzip
+        config.MEMORY_COMPRESSION = "none"
+        memory = Memory()
+        memory.add_message(1, "user", "Grüß dich, wie geht's?")
+        memory.shutdown()
+
+        config.MEMORY_COMPRESSION = "gzip"
+        memory = Memory()
+        memory.add_message(2, "user", "Ich lerne Deutsch.")
+        memory.add_message(2, "model", "Sehr gut! " * 200)
+        memory.shutdown()
+
+        with open(os.path.join(memory_dir, "memory_2.json"), 'rb') as f:
+            assert f.read(2) == GZIP_MAGIC, "Memory file was not compressed"
+
+        # Each file's format is detected when it is read, whatever the setting
+        for compression in ("gzip", "none"):
+            storage = JsonMemoryStorage(memory_dir, compression=compression)
+            assert storage.load(1)[0]["content"] == "Grüß dich, wie geht's?"
+            assert len(storage.load(2)) == 2
+
+        logger.info("Compressed memory files test passed!")
+    finally:
+        config.MEMORY_DIR, config.MEMORY_COMPRESSION = original_settings
+        shutil.rmtree(memory_dir)
+
+    return True
+
+def test_event_driven_autosave():
+    """Test that dirty chats are saved by the background workers and concurrent journal records survive"""
+    import shutil
+    import tempfile
+    import time
+    from memory_storage import JsonMemoryStorage
+
+    original_settings = (config.MEMORY_DIR, config.MEMORY_JOURNAL_MODE, config.MEMORY_AUTOSAVE_INTERVAL, config.MEMORY_FSYNC)
+    memory_dir = tempfile.mkdtemp()
+    try:
+        config.MEMORY_DIR = memory_dir
+        config.MEMORY_JOURNAL_MODE = False
+        config.MEMORY_AUTOSAVE_INTERVAL = 0
+        config.MEMORY_FSYNC = "batch"
+
+        # Modified chats are written by the scheduler without an explicit save
+        memory = Memory()
+        memory.add_message(7, "user", "First")
+        memory.add_message(7, "model", "Second")
+        deadline = time.time() + 5
+        while memory.get_save_stats()["dirty"] and time.time() < deadline:
+            time.sleep(0.01)
+        assert memory.get_save_stats()["dirty"] == 0, "Autosave didn't write the modified chat"
+        assert len(JsonMemoryStorage(memory_dir).load(7)) == 2
+        memory.shutdown()
+
+        # Journal records appended after a snapshot was taken are kept when it is written
+        storage = JsonMemoryStorage(memory_dir)
+        messages = storage.load(7)
+        storage.append(7, {"op": "add", "role": "user", "content": "Third", "timestamp": 3.0})
+        snapshot = list(messages) + [{"role": "user", "content": "Third", "timestamp": 3.0}]
+        mark = storage.journal_mark(7)
+        storage.append(7, {"op": "add", "role": "model", "content": "Fourth", "timestamp": 4.0})
+        storage.save_many({7: snapshot}, {7: mark})
+        assert [msg["content"] for msg in storage.load(7)] == ["First", "Second", "Third", "Fourth"]
+
+        logger.info("Event-driven autosave test passed!")
+    finally:
+        config.MEMORY_DIR, config.MEMORY_JOURNAL_MODE, config.MEMORY_AUTOSAVE_INTERVAL, config.MEMORY_FSYNC = original_settings
+        shutil.rmtree(memory_dir)
+
+    return True
+
+def test_concurrent_chats():
+    """Test that many threads can work on different chats at once without losing messages"""
+    import shutil
+    import tempfile
+    import threading
+
+    original_settings = (config.MEMORY_DIR, config.MEMORY_CACHE_SIZE)
+    memory_dir = tempfile.mkdtemp()
+    try:
+        config.MEMORY_DIR = memory_dir
+        # Keep fewer chats resident than are in use, so chats are evicted and reloaded meanwhile
+        config.MEMORY_CACHE_SIZE = 4
+
+        memory = Memory()
+        errors = []
+
+        def worker(index):
+            try:
+                for i in range(40):
+                    for chat_id in (index, index + 100):
+                        memory.add_message(chat_id, "user", f"Message {i} for chat {chat_id}")
+                        assert memory.get_short_memory(chat_id)[-1]["content"] == f"Message {i} for chat {chat_id}"
+            except Exception as e:
+                errors.append(e)
+
+        threads = [threading.Thread(target=worker, args=(i,)) for i in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        memory.shutdown()
+        assert not errors, f"Worker failed: {errors[0]!r}"
+
+        memory = Memory()
+        for index in range(8):
+            for chat_id in (index, index + 100):
+                assert len(memory.get_long_memory(chat_id)) == 40, f"Chat {chat_id} lost messages"
+        memory.shutdown()
+
+        logger.info("Concurrent chats test passed!")
+    finally:
+        config.MEMORY_DIR, config.MEMORY_CACHE_SIZE = original_settings
+        shutil.rmtree(memory_dir)
+
+    return True
+
+def test_history_window_token_budget():
+    """Test that the history window keeps the newest messages that fit the token budget"""
+    from token_budget import estimate_tokens
+
+    test_chat_id = 67890
+    memory = Memory()
+    memory.add_message(test_chat_id, "user", "Tell me everything about rockets")
+    memory.add_message(test_chat_id, "model", "Rockets! " * 2000)  # A long deep-search style answer
+    memory.add_message(test_chat_id, "user", "Thanks! And planes?")
+    memory.add_message(test_chat_id, "model", "Planes fly with wings.")
+    memory.add_message(test_chat_id, "user", "Cool!")
+
+    # Token counts are computed when the message is added
+    assert memory.conversations[test_chat_id][-1]["tokens"] == estimate_tokens("Cool!")
+
+    window = memory.get_history_window(test_chat_id, token_budget=500)
+    assert [msg["content"] for msg in window] == ["Thanks! And planes?", "Planes fly with wings.", "Cool!"]
+    assert sum(msg["tokens"] for msg in window) <= 500
+
+    # Without a budget only the message count limits the window
+    assert len(memory.get_history_window(test_chat_id, token_budget=0)) == min(5, config.SHORT_MEMORY_SIZE)
+
+    # The newest message is kept even if it alone exceeds the budget
+    assert [msg["content"] for msg in memory.get_history_window(test_chat_id, token_budget=1)] == ["Cool!"]
+
+    memory.shutdown()
+    logger.info("History window token budget test passed!")
+
+    return True
+
+def test_shared_message_bodies():
+    """Test that repeated message lines are stored once, refcounted, and read back unchanged"""
+    import shutil
+    import sqlite3
+    import tempfile
+    from content_store import body_digest
+    from memory_storage import JsonMemoryStorage
+
+    stock = "I'm the stock reply every new chat gets, long enough to be shared between chats!"
+    digest = body_digest(stock)
+    original_settings = (config.MEMORY_DIR, config.MEMORY_BACKEND, config.MEMORY_DB_PATH, config.SUMMARY_ENABLED)
+    for backend in ("json", "sqlite"):
+        memory_dir = tempfile.mkdtemp()
+        try:
+            config.MEMORY_DIR = memory_dir
+            config.MEMORY_BACKEND = backend
+            config.MEMORY_DB_PATH = os.path.join(memory_dir, "memories.db")
+            config.SUMMARY_ENABLED = False
+
+            def stored_refs():
+                if backend == "json":
+                    # The counts in refs.json plus the changes journaled since
+                    return JsonMemoryStorage(memory_dir).body_refs.get(digest, 0)
+                with sqlite3.connect(config.MEMORY_DB_PATH) as conn:
+                    row = conn.execute("SELECT refs FROM bodies WHERE hash = ?", (digest,)).fetchone()
+                return row[0] if row else 0
+
+            memory = Memory()
+            chat_ids = (1, 2, 3)
+            for chat_id in chat_ids:
+                memory.add_message(chat_id, "model", f"Hello, chat {chat_id}!\n{stock}")
+                memory.add_message(chat_id, "user", f"Question {chat_id}")
+
+            # From the second sighting on, chats hold the same string for the stock line
+            bodies = [memory.conversations[chat_id][0].body for chat_id in chat_ids]
+            assert isinstance(bodies[1], tuple) and bodies[1][1] is bodies[2][1]
+            assert memory.get_long_memory(2)[0]["content"] == f"Hello, chat 2!\n{stock}"
+
+            # Once saved, every snapshot references the one stored body
+            memory._save_chats(list(chat_ids))
+            assert stored_refs() == 3
+            if backend == "json":
+                assert os.path.exists(os.path.join(memory_dir, "bodies", f"{digest}.txt"))
+            memory.shutdown()
+
+            # Readers see the full content after a reload
+            memory = Memory()
+            for chat_id in chat_ids:
+                assert [msg["content"] for msg in memory.get_long_memory(chat_id)] == \
+                    [f"Hello, chat {chat_id}!\n{stock}", f"Question {chat_id}"]
+
+            # The body is deleted with its last reference
+            for chat_id in chat_ids:
+                assert memory.update_message(chat_id, memory.get_long_memory(chat_id)[0].timestamp, "Bye")
+            memory._save_chats(list(chat_ids))
+            assert stored_refs() == 0
+            assert not os.path.exists(os.path.join(memory_dir, "bodies", f"{digest}.txt"))
+            memory.shutdown()
+        finally:
+            config.MEMORY_DIR, config.MEMORY_BACKEND, config.MEMORY_DB_PATH, config.SUMMARY_ENABLED = original_settings
+            shutil.rmtree(memory_dir)
+
+    logger.info("Shared message bodies test passed!")
+    return True
+
+def test_shared_body_refs_journal():
+    """Test that body reference counts are journaled, compacted, and recovered after interrupted writes"""
+    import json
+    import shutil
+    import tempfile
+    import memory_storage
+    from content_store import body_digest, content_store
+    from memory_storage import JsonMemoryStorage
+
+    stock = "A long stock line that many chats share and that is stored only once on disk."
+    digest = body_digest(stock)
+    memory_dir = tempfile.mkdtemp()
+    bodies_dir = os.path.join(memory_dir, "bodies")
+    original_compact_lines = memory_storage.BODY_REFS_COMPACT_LINES
+    content_store.mark_shared([digest])
+    try:
+        storage = JsonMemoryStorage(memory_dir, compression="none", fsync="batch")
+
+        def chat(chat_id):
+            return [{"role": "model", "content": f"Hi {chat_id}!\n{stock}", "timestamp": float(chat_id)}]
+
+        # Saves append to the journal instead of rewriting refs.json
+        storage.save_many({1: chat(1), 2: chat(2)})
+        storage.save_many({3: chat(3)})
+        assert storage.body_refs == {digest: 3}
+        assert not os.path.exists(os.path.join(bodies_dir, "refs.json"))
+        with open(os.path.join(bodies_dir, "refs.0.journal"), encoding='utf-8') as f:
+            assert f.read() == f"{digest}\t+2\n{digest}\t+1\n"
+
+        # A new instance replays the journal
+        assert JsonMemoryStorage(memory_dir).body_refs == {digest: 3}
+
+        # Once the journal is long enough it is folded into refs.json of the next generation
+        memory_storage.BODY_REFS_COMPACT_LINES = 3
+        storage.save_many({1: [{"role": "model", "content": "Bye", "timestamp": 1.0}]})
+        assert storage.body_refs == {digest: 2}
+        with open(os.path.join(bodies_dir, "refs.json"), encoding='utf-8') as f:
+            assert json.load(f) == {"generation": 1, "refs": {digest: 2}}
+        assert not os.path.exists(os.path.join(bodies_dir, "refs.0.journal"))
+        memory_storage.BODY_REFS_COMPACT_LINES = original_compact_lines
+
+        # A journal of an older generation is left over from an interrupted compaction, its changes are in refs.json
+        with open(os.path.join(bodies_dir, "refs.0.journal"), 'w', encoding='utf-8') as f:
+            f.write(f"{digest}\t+5\n")
+        assert JsonMemoryStorage(memory_dir).body_refs == {digest: 2}
+        assert not os.path.exists(os.path.join(bodies_dir, "refs.0.journal"))
+
+        # A torn last line is skipped, and the journal is compacted before new changes are appended
+        storage.save_many({4: chat(4)})
+        with open(os.path.join(bodies_dir, "refs.1.journal"), 'a', encoding='utf-8') as f:
+            f.write(f"{digest}\t-")
+        storage = JsonMemoryStorage(memory_dir)
+        assert storage.body_refs == {digest: 3}
+        assert not os.path.exists(os.path.join(bodies_dir, "refs.2.journal"))
+
+        # Dropping the last references deletes the body, and closing folds the journal into refs.json
+        storage.save_many({chat_id: [{"role": "user", "content": "Bye", "timestamp": 1.0}] for chat_id in (2, 3, 4)})
+        assert storage.body_refs == {}
+        assert not os.path.exists(os.path.join(bodies_dir, f"{digest}.txt"))
+        storage.close()
+        assert [name for name in os.listdir(bodies_dir) if name.endswith(".journal")] == []
+        assert JsonMemoryStorage(memory_dir).body_refs == {}
+    finally:
+        memory_storage.BODY_REFS_COMPACT_LINES = original_compact_lines
+        content_store.forget([digest])
+        shutil.rmtree(memory_dir)
+
+    logger.info("Shared body reference journal test passed!")
+    return True
+
+def test_memory_snapshot_archive():
+    """Test exporting the memory store to one archive, selective restore and the warm-state handoff"""
+    import shutil
+    import tempfile
+    from memory_archive import MemoryArchive
+
+    original_settings = (config.MEMORY_DIR, config.MEMORY_HANDOFF_PATH, config.SUMMARY_ENABLED)
+    source_dir, target_dir = tempfile.mkdtemp(), tempfile.mkdtemp()
+    archive_path = os.path.join(source_dir, "snapshot.bin")
+    try:
+        config.MEMORY_DIR = source_dir
+        config.MEMORY_HANDOFF_PATH = ""
+        config.SUMMARY_ENABLED = False
+
+        memory = Memory()
+        for chat_id in range(1, 6):
+            memory.add_message(chat_id, "user", f"Hello from chat {chat_id}")
+            memory.add_message(chat_id, "model", f"Hi chat {chat_id}, grüß dich!")
+        memory.set_summary(2, "The user said hello.", memory.get_long_memory(2)[0].timestamp)
+        assert memory.export_snapshot(archive_path) == 5
+        memory.shutdown()
+
+        with MemoryArchive(archive_path) as archive:
+            assert sorted(archive.chat_ids()) == [1, 2, 3, 4, 5]
+            messages, summary = archive.read(3)
+            assert [msg["content"] for msg in messages] == ["Hello from chat 3", "Hi chat 3, grüß dich!"]
+            assert summary is None
+
+        # Restore only some chats into an empty store
+        config.MEMORY_DIR = target_dir
+        memory = Memory()
+        assert memory.import_snapshot(archive_path, chat_ids=[2, 4, 42]) == 2
+        assert [msg["content"] for msg in memory.get_long_memory(4)] == ["Hello from chat 4", "Hi chat 4, grüß dich!"]
+        assert memory.get_summary(2) == "The user said hello."
+        memory.shutdown()
+
+        memory = Memory()
+        assert memory.storage.list_chats() == [2, 4]
+        assert len(memory.get_long_memory(2)) == 2
+
+        # A warm-state handoff is written on shutdown and consumed by the next start
+        config.MEMORY_HANDOFF_PATH = os.path.join(target_dir, "handoff.bin")
+        memory.shutdown()
+        assert os.path.exists(config.MEMORY_HANDOFF_PATH)
+        memory = Memory()
+        assert not os.path.exists(config.MEMORY_HANDOFF_PATH)
+        assert 2 in memory.conversations and 2 not in memory.unloaded_chats
+        assert memory.get_resident_stats()["reloads"] == 0
+        config.MEMORY_HANDOFF_PATH = ""
+        memory.shutdown()
+
+        # Corrupted frames are detected
+        with open(archive_path, 'r+b') as f:
+            with MemoryArchive(archive_path) as archive:
+                offset = archive.index[3][0]
+            f.seek(offset + 5)
+            f.write(b"#")
+        with MemoryArchive(archive_path) as archive:
+            try:
+                archive.read(3)
+                assert False, "A corrupted frame was read"
+            except ValueError:
+                pass
+
+        logger.info("Memory snapshot archive test passed!")
+    finally:
+        config.MEMORY_DIR, config.MEMORY_HANDOFF_PATH, config.SUMMARY_ENABLED = original_settings
+        shutil.rmtree(source_dir)
+        shutil.rmtree(target_dir)
+
+    return True
+
 if __name__ == "__main__":
     test_memory_persistence()
+    test_journal_recovery()
+    test_history_cache_is_per_chat()
+    test_sqlite_backend_migration()
+    test_cold_chats_are_evicted()
+    test_compressed_memory_files()
+    test_event_driven_autosave()
+    test_concurrent_chats()
+    test_history_window_token_budget()
+    test_shared_message_bodies()
+    test_shared_body_refs_journal()
+    test_memory_snapshot_archive()
@@ -0,0 +1,36 @@
+import logging
+from negative_cache import NegativeCache
+
+# Configure logging
+logging.basicConfig(
+    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
+    level=logging.DEBUG
+)
+logger = logging.getLogger(__name__)
+
+def test_easy_words_are_filtered():
+    """Test that words judged not uncommon are filtered out and that old generations age out"""
+
+    cache = NegativeCache(capacity=100, error_rate=0.001)
+
+    cache.add_many(["Haus", "gehen"], "German")
+    remaining = cache.filter_unknown(["haus", "Gehen", "Entwicklung"], "German")
+    logger.info(f"Remaining words: {remaining}")
+    assert remaining == ["Entwicklung"]
+
+    # Decisions are kept per language
+    assert cache.filter_unknown(["haus"], "English") == ["haus"]
+
+    # After two rotations the first words are gone
+    cache.add_many([f"wort{i}" for i in range(250)], "German")
+    assert cache.get_stats()["rotations"] == 2
+    assert cache.filter_unknown(["haus"], "German") == ["haus"]
+    assert cache.filter_unknown(["wort249"], "German") == []
+
+    logger.info(f"Negative cache stats: {cache.get_stats()}")
+    logger.info("Negative cache test passed!")
+
+    return True
+
+if __name__ == "__main__":
+    test_easy_words_are_filtered()
@@ -2,9 +2,15 @@ import logging
 import time
 import asyncio
 import os
+import re
 import sys
+import json
 from memory import Memory
 from gpu_utils import gpu_manager
+import word_translation
+from stemming import lemma
+from cefr_index import classify_words
+from language_detection import detect_language
 import google.generativeai as genai
 import config
 
@@ -50,6 +56,13 @@ async def test_memory_performance():
     
     retrieval_time = time.time() - start_time
     logger.info(f"Retrieved memory 75 times in {retrieval_time:.4f} seconds")
+
+    # A new message in one chat must not evict the cached history of the others
+    memory.add_message(test_chat_ids[0], "user", "Interleaved message")
+    for chat_id in test_chat_ids:
+        memory.get_short_memory(chat_id)
+    logger.info(f"History view cache: {memory.get_cache_stats()}")
+    logger.info(f"Resident chats: {memory.get_resident_stats()}")
     
     # Test auto-save
     logger.info("Testing auto-save functionality...")
@@ -65,9 +78,10 @@ async def test_memory_performance():
     
     # Clean up test files
     for chat_id in test_chat_ids:
-        memory_file = os.path.join(config.MEMORY_DIR, f"memory_{chat_id}.json")
-        if os.path.exists(memory_file):
-            os.remove(memory_file)
+        for extension in ("json", "journal"):
+            memory_file = os.path.join(config.MEMORY_DIR, f"memory_{chat_id}.{extension}")
+            if os.path.exists(memory_file):
+                os.remove(memory_file)
     
     # Shutdown memory system
     memory.shutdown()
@@ -132,6 +146,640 @@ async def test_gpu_integration():
     
     logger.info("GPU integration test completed")
 
+async def benchmark_translation_event_loop_latency():
+    """Benchmark how an unrelated chat's latency behaves while translations run"""
+    logger.info("Benchmarking event loop latency during translation post-processing...")
+
+    # Simulate a translation pass that blocks on Gemini for half a second
+    original_process = word_translation.process_text_with_translations
+
+    def slow_process(text, language, stats=None, chat_id=None):
+        time.sleep(0.5)
+        return text
+
+    async def unrelated_chat_latency(stop_event: asyncio.Event) -> float:
+        # An unrelated chat that needs the event loop every 10ms
+        worst = 0.0
+        while not stop_event.is_set():
+            tick = time.perf_counter()
+            await asyncio.sleep(0.01)
+            worst = max(worst, time.perf_counter() - tick - 0.01)
+        return worst
+
+    async def blocking_translation():
+        return word_translation.post_process_response("Some answer.", "German")
+
+    async def async_translation():
+        return await word_translation.post_process_response_async("Some answer.", "German")
+
+    word_translation.process_text_with_translations = slow_process
+    try:
+        for name, translate in (("synchronous", blocking_translation), ("async", async_translation)):
+            stop_event = asyncio.Event()
+            probe = asyncio.create_task(unrelated_chat_latency(stop_event))
+            start_time = time.perf_counter()
+            await asyncio.gather(*(translate() for _ in range(8)))
+            elapsed = time.perf_counter() - start_time
+            stop_event.set()
+            worst_delay = await probe
+            logger.info(f"{name} post-processing: 8 responses in {elapsed:.2f}s, "
+                        f"worst unrelated chat delay {worst_delay * 1000:.1f}ms")
+    finally:
+        word_translation.process_text_with_translations = original_process
+
+# Sample responses used when no recorded conversations are available
+SAMPLE_RESPONSES = [
+    ("German", "Die Entwicklung von Robotern ist spannend. Viele Entwicklungen kommen aus Japan. Ich habe eine Maschine entwickelt!"),
+    ("German", "Die Gesellschaft verändert sich. Gesellschaften brauchen neue Technologien und jede Technologie hat Möglichkeiten."),
+    ("French", "Le développement des avions est rapide. Les développements récents sont incroyables pour la société."),
+    ("French", "Les sociétés modernes aiment la technologie. Les technologies changent nos expériences."),
+    ("Spanish", "La sociedad cambia con la tecnología. Las sociedades usan tecnologías nuevas cada día."),
+    ("Spanish", "Las experiencias de los ingenieros son importantes. Cada experiencia ayuda al desarrollo."),
+    ("English", "The development of planes is amazing. New developments in technology help every society."),
+    ("English", "Engineers are developing machines. Technologies evolve and societies change with them."),
+]
+
+def benchmark_lemma_cache_hit_rate():
+    """Compare translation cache hit rates with surface-form keys and lemma keys"""
+    logger.info("Benchmarking translation cache hit rate with lemma-normalized keys...")
+
+    # Use the recorded bot responses as corpus, or the built-in samples if there are none.
+    # The storage decodes compressed snapshots, shared bodies and journals
+    corpus = []
+    memory = Memory()
+    try:
+        for chat_id in memory.storage.list_chats():
+            try:
+                messages = memory.storage.load(chat_id) or []
+            except Exception as e:
+                logger.error(f"Skipping conversation of chat {chat_id}: {e}")
+                continue
+            for message in messages:
+                if message.get("role") == "model":
+                    corpus.append((detect_language(message["content"]), message["content"]))
+    finally:
+        memory.shutdown()
+    if not corpus:
+        corpus = SAMPLE_RESPONSES
+
+    surface_cache, lemma_cache = set(), set()
+    lookups = surface_hits = lemma_hits = 0
+
+    for language, response in corpus:
+        words = [word for word in re.findall(r'\b\w+\b', response) if len(word) > 4]
+        _, uncommon_words, unseen_words = classify_words(words, language)
+
+        # Every word the translation pass would look up in the cache
+        for word in uncommon_words + unseen_words:
+            lookups += 1
+            surface_key = (word.lower(), language)
+            lemma_key = (lemma(word, language), language)
+            if surface_key in surface_cache:
+                surface_hits += 1
+            if lemma_key in lemma_cache:
+                lemma_hits += 1
+            surface_cache.add(surface_key)
+            lemma_cache.add(lemma_key)
+
+    if lookups:
+        logger.info(f"Replayed {len(corpus)} responses with {lookups} word lookups")
+        logger.info(f"Surface-form keys: {surface_hits / lookups:.1%} hit rate, {len(surface_cache)} cached entries")
+        logger.info(f"Lemma keys: {lemma_hits / lookups:.1%} hit rate, {len(lemma_cache)} cached entries")
+
+def benchmark_memory_cold_start(chat_counts=(10000, 100000)):
+    """Compare Memory startup time with eager and lazy loading"""
+    import tempfile
+    import shutil
+    import memory as memory_module
+
+    logger.info("Benchmarking memory cold start...")
+    original_memory_dir = config.MEMORY_DIR
+    original_lazy_loading = config.MEMORY_LAZY_LOADING
+    memory_logger = logging.getLogger(memory_module.__name__)
+    original_level = memory_logger.level
+
+    # A typical short conversation
+    conversation = [
+        {"role": "user" if i % 2 == 0 else "model", "content": f"Message {i} of a typical conversation.", "timestamp": time.time()}
+        for i in range(10)
+    ]
+
+    for chat_count in chat_counts:
+        memory_dir = tempfile.mkdtemp()
+        try:
+            for chat_id in range(chat_count):
+                with open(os.path.join(memory_dir, f"memory_{chat_id}.json"), 'w', encoding='utf-8') as f:
+                    json.dump(conversation, f, ensure_ascii=False, indent=2)
+
+            config.MEMORY_DIR = memory_dir
+            memory_logger.setLevel(logging.WARNING)
+            for lazy in (False, True):
+                config.MEMORY_LAZY_LOADING = lazy
+                start_time = time.time()
+                memory = Memory()
+                startup_time = time.time() - start_time
+
+                # First access to a chat that wasn't loaded at startup
+                start_time = time.time()
+                memory.get_short_memory(chat_count - 1)
+                first_access_time = time.time() - start_time
+                memory.shutdown()
+
+                logger.info(f"{chat_count} chats, {'lazy' if lazy else 'eager'} loading: "
+                            f"startup {startup_time:.2f}s, first access {first_access_time * 1000:.2f}ms, "
+                            f"{len(memory.conversations)} conversations resident")
+        finally:
+            config.MEMORY_DIR = original_memory_dir
+            config.MEMORY_LAZY_LOADING = original_lazy_loading
+            memory_logger.setLevel(original_level)
+            shutil.rmtree(memory_dir)
+
+def benchmark_memory_append_cost(long_memory_sizes=(100, 1000, 10000), messages=2000):
+    """Measure the per-message cost of add_message and get_short_memory for full chats"""
+    import tempfile
+    import shutil
+
+    logger.info("Benchmarking per-message memory cost as LONG_MEMORY_SIZE grows...")
+    original_settings = (config.MEMORY_DIR, config.LONG_MEMORY_SIZE, config.MEMORY_JOURNAL_MODE)
+    memory_dir = tempfile.mkdtemp()
+
+    try:
+        # Measure the in-memory cost only, without journal writes
+        config.MEMORY_DIR = memory_dir
+        config.MEMORY_JOURNAL_MODE = False
+
+        for long_memory_size in long_memory_sizes:
+            config.LONG_MEMORY_SIZE = long_memory_size
+            memory = Memory()
+            chat_id = long_memory_size
+
+            # Fill the chat to capacity first
+            for i in range(long_memory_size):
+                memory.add_message(chat_id, "user", f"Message {i}")
+
+            start_time = time.perf_counter()
+            for i in range(messages):
+                memory.add_message(chat_id, "user", f"Message {i}")
+                memory.get_short_memory(chat_id)
+            per_message = (time.perf_counter() - start_time) / messages
+
+            # The previous list slicing approach for comparison
+            history = [{"role": "user", "content": f"Message {i}"} for i in range(long_memory_size)]
+            start_time = time.perf_counter()
+            for i in range(messages):
+                history.append({"role": "user", "content": f"Message {i}"})
+                history = history[-long_memory_size:]
+                [{'role': msg['role'], 'content': msg['content']} for msg in history[-config.SHORT_MEMORY_SIZE:]]
+            per_message_list = (time.perf_counter() - start_time) / messages
+
+            memory.running = False
+            logger.info(f"LONG_MEMORY_SIZE={long_memory_size}: ring buffer {per_message * 1e6:.1f}us per message, "
+                        f"list slicing {per_message_list * 1e6:.1f}us per message")
+    finally:
+        config.MEMORY_DIR, config.LONG_MEMORY_SIZE, config.MEMORY_JOURNAL_MODE = original_settings
+        shutil.rmtree(memory_dir)
+
+def benchmark_memory_compression(chat_count=1000):
+    """Compare bytes on disk and full-reload time of uncompressed and compressed memory files"""
+    import random
+    import tempfile
+    import shutil
+    from memory_storage import JsonMemoryStorage, zstandard
+
+    logger.info("Benchmarking compressed memory files...")
+    rng = random.Random(42)
+    vocabulary = [f"{rng.choice('bdfgklmnprstwz')}{rng.choice('aeiou')}{rng.choice('nrstl')}{rng.choice('aeiou')}{rng.choice('chkmnrt')}"
+                  for _ in range(3000)]
+
+    def reply(words):
+        # Markdown-ish text like a long Gemini or deep-search answer
+        return "\n\n".join("**" + " ".join(rng.choice(vocabulary) for _ in range(8)) + "**\n" +
+                             " ".join(rng.choice(vocabulary) for _ in range(words // 10)) + "."
+                             for _ in range(10))
+
+    conversations = {
+        chat_id: [
+            {"role": "user" if i % 2 == 0 else "model",
+             "content": " ".join(rng.choice(vocabulary) for _ in range(12)) + "?" if i % 2 == 0 else reply(rng.choice((300, 600, 3000))),
+             "timestamp": time.time()}
+            for i in range(20)
+        ]
+        for chat_id in range(chat_count)
+    }
+
+    for compression in ("none", "gzip", "zstd"):
+        if compression == "zstd" and zstandard is None:
+            logger.info("zstandard is not installed, skipping zstd")
+            continue
+
+        memory_dir = tempfile.mkdtemp()
+        try:
+            storage = JsonMemoryStorage(memory_dir, compression=compression, zstd_dict_path="")
+            start_time = time.time()
+            storage.save_many(conversations)
+            save_time = time.time() - start_time
+
+            disk_bytes = sum(entry.stat().st_size for entry in os.scandir(memory_dir))
+
+            start_time = time.time()
+            for chat_id in storage.list_chats():
+                storage.load(chat_id)
+            reload_time = time.time() - start_time
+
+            logger.info(f"{compression}: {disk_bytes / 1e6:.1f} MB on disk for {chat_count} chats, "
+                        f"save {save_time:.2f}s, full reload {reload_time:.2f}s")
+        finally:
+            shutil.rmtree(memory_dir)
+
+def benchmark_memory_ingest_during_saves(chat_count=200, writer_threads=4, duration=3.0):
+    """Measure add_message throughput while autosaves are being written"""
+    import tempfile
+    import shutil
+    import threading
+
+    logger.info("Benchmarking message ingest throughput during autosaves...")
+    original_settings = (config.MEMORY_DIR, config.MEMORY_JOURNAL_MODE, config.MEMORY_AUTOSAVE_INTERVAL)
+    reply = "Eine ausführliche Antwort mit vielen Details. " * 40
+
+    for mode in ("saves under the global lock", "event-driven autosave"):
+        memory_dir = tempfile.mkdtemp()
+        try:
+            # Every message marks its chat dirty, and dirty chats are saved continuously
+            config.MEMORY_DIR = memory_dir
+            config.MEMORY_JOURNAL_MODE = False
+            config.MEMORY_AUTOSAVE_INTERVAL = 0
+
+            memory = Memory()
+            for chat_id in range(chat_count):
+                for i in range(config.LONG_MEMORY_SIZE):
+                    memory.add_message(chat_id, "user" if i % 2 == 0 else "model", reply)
+
+            stop = threading.Event()
+            saved = [0]
+            saver = None
+            if mode == "saves under the global lock":
+                # The previous autosave: stop the scheduler and write dirty chats one by one under the lock
+                with memory.dirty_condition:
+                    memory.running = False
+                    memory.dirty_condition.notify_all()
+                memory.save_thread.join()
+                memory.save_executor.shutdown(wait=True)
+
+                def save_loop():
+                    while not stop.is_set():
+                        with memory.lock:
+                            for chat_id in list(memory.modified_chats):
+                                memory.storage.save_many({chat_id: list(memory.conversations[chat_id])})
+                                memory.modified_chats.discard(chat_id)
+                                saved[0] += 1
+                        time.sleep(0.001)
+
+                saver = threading.Thread(target=save_loop)
+                saver.start()
+            saved_before = memory.get_save_stats()["chats_saved"]
+
+            latencies = [[] for _ in range(writer_threads)]
+
+            def writer(index):
+                chat_id = index
+                while not stop.is_set():
+                    start_time = time.perf_counter()
+                    memory.add_message(chat_id, "user", "Noch eine Frage?")
+                    latencies[index].append(time.perf_counter() - start_time)
+                    memory.get_short_memory(chat_id)
+                    chat_id = (chat_id + writer_threads) % chat_count
+
+            threads = [threading.Thread(target=writer, args=(i,)) for i in range(writer_threads)]
+            for thread in threads:
+                thread.start()
+            time.sleep(duration)
+            stop.set()
+            for thread in threads:
+                thread.join()
+            if saver is not None:
+                saver.join()
+
+            saved[0] += memory.get_save_stats()["chats_saved"] - saved_before
+            memory.shutdown()
+
+            all_latencies = sorted(latency for thread_latencies in latencies for latency in thread_latencies)
+            p99 = all_latencies[int(len(all_latencies) * 0.99)]
+            logger.info(f"{mode}: {len(all_latencies) / duration:.0f} messages/s with {writer_threads} threads, "
+                        f"add_message p99 {p99 * 1000:.2f}ms, max {all_latencies[-1] * 1000:.1f}ms, "
+                        f"{saved[0] / duration:.0f} chat snapshots written per second")
+        finally:
+            config.MEMORY_DIR, config.MEMORY_JOURNAL_MODE, config.MEMORY_AUTOSAVE_INTERVAL = original_settings
+            shutil.rmtree(memory_dir)
+
+def benchmark_memory_lock_contention(thread_count=16, duration=2.0, disk_latency=0.002):
+    """Measure throughput and read latency of many threads working on different chats with a slow disk"""
+    import tempfile
+    import shutil
+    import threading
+
+    logger.info("Benchmarking memory lock contention...")
+    original_settings = (config.MEMORY_DIR, config.MEMORY_LOCK_STRIPES)
+    original_fsync = os.fsync
+
+    def slow_fsync(fd):
+        time.sleep(disk_latency)
+        original_fsync(fd)
+
+    for stripes in (1, original_settings[1]):
+        memory_dir = tempfile.mkdtemp()
+        try:
+            config.MEMORY_DIR = memory_dir
+            config.MEMORY_LOCK_STRIPES = stripes
+            memory = Memory()
+            for chat_id in range(thread_count):
+                memory.add_message(chat_id, "user", "Hallo!")
+
+            # Emulate a slow disk: with the "write" policy every journal append is flushed
+            # inside the storage's locked section, and each flush takes disk_latency
+            memory.storage.fsync = "write"
+            os.fsync = slow_fsync
+
+            stop = threading.Event()
+            writes = [0] * thread_count
+            read_latencies = [[] for _ in range(thread_count)]
+
+            def worker(index):
+                # Half of the threads write, the other half read their own chats
+                while not stop.is_set():
+                    if index % 2 == 0:
+                        memory.add_message(index, "user", "Wie spät ist es?")
+                        writes[index] += 1
+                    else:
+                        start_time = time.perf_counter()
+                        memory.get_short_memory(index)
+                        read_latencies[index].append(time.perf_counter() - start_time)
+                        time.sleep(0.001)
+
+            threads = [threading.Thread(target=worker, args=(i,)) for i in range(thread_count)]
+            for thread in threads:
+                thread.start()
+            time.sleep(duration)
+            stop.set()
+            for thread in threads:
+                thread.join()
+            os.fsync = original_fsync
+            memory.shutdown()
+
+            latencies = sorted(latency for thread_latencies in read_latencies for latency in thread_latencies)
+            p99 = latencies[int(len(latencies) * 0.99)]
+            logger.info(f"{stripes} lock stripe(s), {thread_count} threads on different chats: "
+                        f"{sum(writes) / duration:.0f} messages/s, get_short_memory p99 {p99 * 1000:.2f}ms")
+        finally:
+            os.fsync = original_fsync
+            config.MEMORY_DIR, config.MEMORY_LOCK_STRIPES = original_settings
+            shutil.rmtree(memory_dir)
+
+def benchmark_history_window_prompt_size(budgets=(2000, 6000, 12000)):
+    """Compare the history tokens sent to Gemini with a fixed message count and with token budgets"""
+    import tempfile
+    import shutil
+    from personality import format_messages_for_gemini
+    from token_budget import estimate_tokens
+
+    logger.info("Benchmarking history prompt size...")
+    original_memory_dir = config.MEMORY_DIR
+    memory_dir = tempfile.mkdtemp()
+    try:
+        config.MEMORY_DIR = memory_dir
+        memory = Memory()
+        chat_id = 1
+
+        # A conversation with two long deep-search answers among normal turns
+        for i in range(config.SHORT_MEMORY_SIZE):
+            long_answer = i in (4, 14)
+            memory.add_message(chat_id, "user", f"Question {i}?")
+            memory.add_message(chat_id, "model", ("Detailed research findings. " * 1200) if long_answer else f"Short answer {i}.")
+
+        def prompt_tokens(history):
+            return sum(estimate_tokens(part) for message in format_messages_for_gemini(history) for part in message["parts"])
+
+        short_history = memory.get_short_memory(chat_id)
+        logger.info(f"SHORT_MEMORY_SIZE={config.SHORT_MEMORY_SIZE}: {len(short_history)} messages, "
+                    f"{prompt_tokens(short_history)} history tokens")
+
+        for budget in budgets:
+            start_time = time.perf_counter()
+            window = memory.get_history_window(chat_id, token_budget=budget)
+            select_time = time.perf_counter() - start_time
+            logger.info(f"Token budget {budget}: {len(window)} messages, {prompt_tokens(window)} history tokens, "
+                        f"selected in {select_time * 1e6:.0f}us")
+        memory.shutdown()
+    finally:
+        config.MEMORY_DIR = original_memory_dir
+        shutil.rmtree(memory_dir)
+
+def benchmark_retrieval_lookup(queries=1000, vocabulary_size=5000):
+    """Measure the cost of keeping a chat's retrieval index up to date and of looking up relevant messages"""
+    import random
+    from retrieval_index import ChatRetrievalIndex
+
+    logger.info("Benchmarking retrieval index lookups...")
+    rng = random.Random(42)
+    vocabulary = [f"word{i}" for i in range(vocabulary_size)]
+
+    def random_message():
+        return {"role": "user", "content": " ".join(rng.choices(vocabulary, k=rng.randint(5, 80)))}
+
+    index = ChatRetrievalIndex(config.LONG_MEMORY_SIZE, config.RETRIEVAL_DIM)
+    for _ in range(config.LONG_MEMORY_SIZE):
+        index.add(random_message())
+
+    texts = [random_message()["content"] for _ in range(queries)]
+
+    # Steady state: a message is added before each lookup, as when the bot answers it
+    add_times, query_times = [], []
+    for text in texts:
+        start_time = time.perf_counter()
+        index.add({"role": "user", "content": text})
+        added_time = time.perf_counter()
+        index.query(text, config.RETRIEVAL_TOP_K, config.SHORT_MEMORY_SIZE, config.RETRIEVAL_MIN_SCORE)
+        add_times.append(added_time - start_time)
+        query_times.append(time.perf_counter() - added_time)
+    query_times.sort()
+
+    sparse_bytes = (sum(features.nbytes + counts.nbytes for features, counts in zip(index.features, index.counts))
+                    + index.doc_freq.nbytes + index.lengths.nbytes)
+    dense_bytes = config.LONG_MEMORY_SIZE * config.RETRIEVAL_DIM * 4
+    logger.info(f"{config.LONG_MEMORY_SIZE} messages: add {sum(add_times) / queries * 1e6:.0f}us, "
+                f"lookup {sum(query_times) / queries * 1e6:.0f}us (p99 {query_times[int(queries * 0.99)] * 1e6:.0f}us); "
+                f"index {sparse_bytes / 1024:.0f}KB (dense matrix: {dense_bytes / 1024:.0f}KB)")
+
+def _build_message_corpus(representation, chat_count, results):
+    """Load a synthetic corpus in the given message representation and report the RSS it added"""
+    import gc
+    from collections import deque
+    from types import MappingProxyType
+    from chat_message import ChatMessage
+    from token_budget import estimate_tokens
+
+    def rss():
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+
+    gc.collect()
+    start_rss = rss()
+    conversations, views = {}, {}
+    for chat_id in range(chat_count):
+        # Parse each chat from JSON like a load from storage, so role strings aren't shared
+        stored = json.loads(json.dumps([
+            {"role": "user" if i % 2 == 0 else "model", "content": f"Message {i} of chat {chat_id}, a typical sentence.",
+             "timestamp": 1700000000.0 + i}
+            for i in range(config.LONG_MEMORY_SIZE)
+        ]))
+        if representation == "dict":
+            # Previous layout: a dict per message, and a read-only copy per message in each cached view
+            for msg in stored:
+                msg["tokens"] = estimate_tokens(msg["content"])
+            conversation = deque(stored, maxlen=config.LONG_MEMORY_SIZE)
+            views[chat_id] = tuple(MappingProxyType({'role': msg['role'], 'content': msg['content'], 'tokens': msg['tokens']})
+                                   for msg in list(conversation)[-config.SHORT_MEMORY_SIZE:])
+        else:
+            conversation = deque((ChatMessage.from_dict(msg) for msg in stored), maxlen=config.LONG_MEMORY_SIZE)
+            views[chat_id] = tuple(conversation)[-config.SHORT_MEMORY_SIZE:]
+        conversations[chat_id] = conversation
+
+    gc.collect()
+    results.put(rss() - start_rss)
+
+def benchmark_message_memory(chat_count=10000):
+    """Compare the RSS of a resident corpus with dict messages and with slotted message records"""
+    import multiprocessing
+
+    if not os.path.exists("/proc/self/statm"):
+        logger.info("Skipping message memory benchmark, RSS is only measured on Linux")
+        return
+
+    logger.info("Benchmarking message memory use...")
+    messages = chat_count * config.LONG_MEMORY_SIZE
+    for representation in ("dict", "record"):
+        # A fresh process per layout, so freed memory of one run can't hide the growth of the other
+        results = multiprocessing.Queue()
+        process = multiprocessing.Process(target=_build_message_corpus, args=(representation, chat_count, results))
+        process.start()
+        added = results.get()
+        process.join()
+        logger.info(f"{representation} messages: {chat_count} chats, {messages} messages, "
+                    f"RSS +{added / 1024 / 1024:.0f} MB ({added / messages:.0f} bytes per message)")
+
+def benchmark_shared_bodies(chat_count=5000):
+    """Compare the disk and memory footprint of a corpus with and without shared message bodies"""
+    import random
+    import tempfile
+    import shutil
+    import tracemalloc
+    from chat_message import ChatMessage
+    from content_store import content_store
+    from memory_storage import JsonMemoryStorage
+
+    logger.info("Benchmarking shared message bodies...")
+    rng = random.Random(42)
+    # Stock texts like the welcome message and the error reply, and each user's own messages
+    welcome = ("I'm Miles Prower, but everyone calls me Tails! I'm an 8-year-old fox with twin tails from the Sonic "
+               "the Hedgehog universe. I can search the internet to help answer your questions! What would you like "
+               "to talk about today, friend? 😊")
+    error = "I encountered an error. Please try again later."
+    stored = {
+        chat_id: json.dumps([{"role": "model", "content": f"Hello, User{chat_id}!\n{welcome}", "timestamp": 1700000000.0}] + [
+            {"role": "user" if i % 2 == 0 else "model",
+             "content": error if i % 2 and rng.random() < 0.2 else f"Message {i} of chat {chat_id}, number {rng.random()}",
+             "timestamp": 1700000001.0 + i}
+            for i in range(9)
+        ])
+        for chat_id in range(chat_count)
+    }
+
+    original_min_chars = content_store.min_chars
+    try:
+        for min_chars in (0, original_min_chars):
+            content_store.min_chars = min_chars
+            label = "shared" if min_chars else "inline"
+
+            # Parse each chat like a load from storage, so every message has its own strings
+            tracemalloc.start()
+            conversations = {
+                chat_id: [ChatMessage(msg["role"], content_store.intern(msg["content"]), msg["timestamp"])
+                          for msg in json.loads(data)]
+                for chat_id, data in stored.items()
+            }
+            resident_bytes = tracemalloc.get_traced_memory()[0]
+            tracemalloc.stop()
+
+            memory_dir = tempfile.mkdtemp()
+            try:
+                storage = JsonMemoryStorage(memory_dir, compression="none", zstd_dict_path="")
+                storage.save_many(conversations)
+                disk_bytes = sum(os.path.getsize(os.path.join(root, name))
+                                 for root, _, names in os.walk(memory_dir) for name in names)
+            finally:
+                shutil.rmtree(memory_dir)
+
+            for messages in conversations.values():
+                for message in messages:
+                    content_store.release(message.body)
+            logger.info(f"{label} bodies: {chat_count} chats, {resident_bytes / 1e6:.1f} MB resident, "
+                        f"{disk_bytes / 1e6:.1f} MB on disk")
+    finally:
+        content_store.min_chars = original_min_chars
+
+def benchmark_snapshot_archive(chat_count=10000):
+    """Compare restoring every chat from per-chat JSON files and from one snapshot archive"""
+    import random
+    import tempfile
+    import shutil
+    from memory_archive import MemoryArchive, write_archive
+    from memory_storage import JsonMemoryStorage
+
+    logger.info("Benchmarking memory snapshot archives...")
+    rng = random.Random(42)
+    conversations = {
+        chat_id: [
+            {"role": "user" if i % 2 == 0 else "model",
+             "content": f"Message {i} of chat {chat_id}, number {rng.random()}", "timestamp": 1700000000.0 + i}
+            for i in range(20)
+        ]
+        for chat_id in range(chat_count)
+    }
+
+    memory_dir = tempfile.mkdtemp()
+    try:
+        storage = JsonMemoryStorage(memory_dir, compression="none", zstd_dict_path="")
+        storage.save_many(conversations)
+
+        start_time = time.time()
+        for chat_id in storage.list_chats():
+            storage.load(chat_id)
+        files_time = time.time() - start_time
+
+        archive_path = os.path.join(memory_dir, "snapshot.bin")
+        start_time = time.time()
+        write_archive(archive_path, ((chat_id, messages, None) for chat_id, messages in conversations.items()))
+        export_time = time.time() - start_time
+
+        start_time = time.time()
+        with MemoryArchive(archive_path) as archive:
+            for chat_id in archive.chat_ids():
+                archive.read(chat_id)
+        archive_time = time.time() - start_time
+
+        # Selective restore of single chats by offset
+        start_time = time.time()
+        with MemoryArchive(archive_path) as archive:
+            for chat_id in rng.sample(range(chat_count), 100):
+                archive.read(chat_id)
+        selective_time = time.time() - start_time
+
+        logger.info(f"{chat_count} chats: reload from files {files_time:.2f}s, export {export_time:.2f}s, "
+                    f"restore from archive {archive_time:.2f}s "
+                    f"({os.path.getsize(archive_path) / 1e6:.1f} MB), "
+                    f"100 selected chats {selective_time * 1000:.1f}ms incl. opening the index")
+    finally:
+        shutil.rmtree(memory_dir)
+
 async def main():
     """Run all tests"""
     logger.info("Starting optimization tests...")
@@ -141,6 +789,22 @@ async def main():
     
     # Test GPU integration
     await test_gpu_integration()
+
+    # Benchmark translation post-processing
+    await benchmark_translation_event_loop_latency()
+    benchmark_lemma_cache_hit_rate()
+
+    # Benchmark memory startup
+    benchmark_memory_cold_start()
+    benchmark_memory_append_cost()
+    benchmark_memory_compression()
+    benchmark_memory_ingest_during_saves()
+    benchmark_memory_lock_contention()
+    benchmark_history_window_prompt_size()
+    benchmark_retrieval_lookup()
+    benchmark_message_memory()
+    benchmark_shared_bodies()
+    benchmark_snapshot_archive()
     
     logger.info("All tests completed")
 
@@ -0,0 +1,95 @@
+import logging
+import shutil
+import tempfile
+import time
+import config
+from memory import Memory
+from retrieval_index import ChatRetrievalIndex
+
+# Configure logging
+logging.basicConfig(
+    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
+    level=logging.DEBUG
+)
+logger = logging.getLogger(__name__)
+
+def test_retrieval_index():
+    """Test that the index finds related messages, follows the ring buffer and skips the newest ones"""
+
+    index = ChatRetrievalIndex(capacity=4, dim=1024)
+    messages = [
+        {"role": "user", "content": "My cat Luna likes to sleep on the keyboard"},
+        {"role": "model", "content": "Rockets need a lot of fuel to reach orbit"},
+        {"role": "user", "content": "Ich lerne Deutsch für meine Arbeit in Berlin"},
+        {"role": "model", "content": "The weather is nice today"}
+    ]
+    for message in messages:
+        index.add(message)
+
+    assert index.query("What was the name of my cat?", k=1) == [messages[0]]
+    assert index.query("Wie ist die Arbeit in Berlin?", k=1) == [messages[2]]
+    assert index.query("completely unrelated words", k=3, min_score=0.1) == []
+
+    # The newest messages are already in the prompt, so they can be excluded
+    assert index.query("nice weather", k=1, exclude_newest=1) == []
+
+    # A full index replaces the oldest message
+    index.add({"role": "user", "content": "Tell me about orbital rockets"})
+    assert messages[0] not in index.query("my cat Luna", k=4)
+
+    # Changed messages are indexed again
+    updated_message = {"role": "model", "content": "Luna the cat sleeps all day"}
+    assert index.update(messages[3], updated_message)
+    assert index.query("Where does Luna sleep?", k=1, exclude_newest=1) == [updated_message]
+
+    logger.info("Retrieval index test passed!")
+    return True
+
+def test_relevant_messages():
+    """Test that Memory returns related messages from outside the history window, quickly"""
+
+    original_settings = (config.MEMORY_DIR, config.SUMMARY_ENABLED)
+    memory_dir = tempfile.mkdtemp()
+    try:
+        config.MEMORY_DIR = memory_dir
+        config.SUMMARY_ENABLED = False
+
+        memory = Memory()
+        chat_id = 12345
+        memory.add_message(chat_id, "user", "My sister Ayla is getting married in Izmir next spring")
+        for i in range(config.LONG_MEMORY_SIZE - 2):
+            memory.add_message(chat_id, "user" if i % 2 == 0 else "model", f"Small talk number {i} about the weather and games")
+        memory.add_message(chat_id, "user", "Can you help me write a card for Ayla's wedding?")
+
+        window = memory.get_history_window(chat_id)
+        relevant = memory.get_relevant_messages(chat_id, "Can you help me write a card for Ayla's wedding?",
+                                                exclude_recent=len(window))
+        logger.info(f"Relevant messages: {relevant}")
+        assert relevant, "The older message about the wedding wasn't found"
+        assert relevant[0]["content"].startswith("My sister Ayla")
+        assert all(msg not in window for msg in relevant), "A message from the window was returned"
+
+        # The index is kept up to date by add_message
+        memory.add_message(chat_id, "model", "Your favourite colour is turquoise, you told me earlier")
+        memory.add_message(chat_id, "user", "ok")
+        relevant = memory.get_relevant_messages(chat_id, "what is my favourite colour", exclude_recent=1)
+        assert relevant[-1]["content"].startswith("Your favourite colour")
+
+        start_time = time.perf_counter()
+        for _ in range(100):
+            memory.get_relevant_messages(chat_id, "Can you help me write a card for Ayla's wedding?", exclude_recent=25)
+        query_time = (time.perf_counter() - start_time) / 100
+        logger.info(f"Average lookup time: {query_time * 1000:.3f} ms")
+        assert query_time < 0.005, f"Lookups are too slow: {query_time * 1000:.3f} ms"
+
+        memory.shutdown()
+        logger.info("Relevant messages test passed!")
+    finally:
+        config.MEMORY_DIR, config.SUMMARY_ENABLED = original_settings
+        shutil.rmtree(memory_dir)
+
+    return True
+
+if __name__ == "__main__":
+    test_retrieval_index()
+    test_relevant_messages()
@@ -0,0 +1,66 @@
+import logging
+from stemming import stem, lemma
+
+# Configure logging
+logging.basicConfig(
+    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
+    level=logging.DEBUG
+)
+logger = logging.getLogger(__name__)
+
+def test_inflected_forms_share_a_key():
+    """Test that inflected forms of a word normalize to the same cache key"""
+
+    groups = {
+        "German": [["Entwicklung", "Entwicklungen"], ["Gesellschaft", "Gesellschaften"], ["Möglichkeit", "Möglichkeiten"]],
+        "English": [["development", "developments", "developed", "developing"], ["technology", "technologies"]],
+        "French": [["développement", "développements"], ["société", "sociétés"], ["nationale", "nationales"]],
+        "Spanish": [["sociedad", "sociedades"], ["nación", "naciones"], ["tecnología", "tecnologías"]]
+    }
+
+    for language, word_groups in groups.items():
+        for words in word_groups:
+            stems = {stem(word, language) for word in words}
+            logger.info(f"{language}: {words} -> {stems}")
+            assert len(stems) == 1, f"Expected one stem for {words} in {language}, got {stems}"
+
+    # Languages without a stemmer only get lowercased
+    assert stem("Kelimeler", "Turkish") == "kelimeler"
+
+    logger.info("Stemming test passed!")
+
+    return True
+
+def test_derived_words_keep_their_lemma():
+    """Test that cache keys merge unambiguous plurals but not words that merely share a stem"""
+
+    plurals = {
+        "German": [["Entwicklung", "Entwicklungen"], ["Gesellschaft", "Gesellschaften"], ["Möglichkeit", "Möglichkeiten"]],
+        "English": [["development", "developments"], ["technology", "technologies"], ["university", "universities"]],
+        "French": [["développement", "développements"], ["société", "sociétés"]],
+        "Spanish": [["sociedad", "sociedades"], ["tecnología", "tecnologías"], ["nación", "naciones"]]
+    }
+    for language, word_groups in plurals.items():
+        for words in word_groups:
+            lemmas = {lemma(word, language) for word in words}
+            assert len(lemmas) == 1, f"Expected one lemma for {words} in {language}, got {lemmas}"
+
+    # Agent nouns, gender vowels and derived words may share a stem, but not a translation
+    distinct = {
+        "German": [("Spieler", "Spiel"), ("Arbeiter", "Arbeit"), ("Lehrer", "Lehre")],
+        "English": [("university", "universe"), ("general", "generous"), ("organ", "organization"),
+                    ("news", "new"), ("united", "unit")],
+        "Spanish": [("casa", "caso"), ("partir", "parte"), ("mesa", "mes")]
+    }
+    assert stem("university", "English") == stem("universe", "English")
+    for language, pairs in distinct.items():
+        for first, second in pairs:
+            assert lemma(first, language) != lemma(second, language), f"{first} and {second} share a lemma"
+
+    logger.info("Lemma test passed!")
+
+    return True
+
+if __name__ == "__main__":
+    test_inflected_forms_share_a_key()
+    test_derived_words_keep_their_lemma()
@@ -0,0 +1,190 @@
+import logging
+import os
+import shutil
+import sqlite3
+import tempfile
+import threading
+import time
+import translation_store
+from translation_store import TranslationStore
+
+# Configure logging
+logging.basicConfig(
+    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
+    level=logging.DEBUG
+)
+logger = logging.getLogger(__name__)
+
+def read_last_used(db_path, word):
+    """Read the last_used time of a stored word straight from the database"""
+    conn = sqlite3.connect(db_path)
+    try:
+        row = conn.execute("SELECT last_used FROM translations WHERE word = ?", (word,)).fetchone()
+        return row[0] if row else None
+    finally:
+        conn.close()
+
+def test_persistence_across_instances():
+    """Test that the database is opened lazily and translations survive a restart"""
+
+    store_dir = tempfile.mkdtemp()
+    try:
+        db_path = os.path.join(store_dir, "data", "translations.db")
+        store = TranslationStore(db_path=db_path)
+        assert not os.path.exists(db_path), "The database should only be created on first use"
+
+        store.put_many({"Entwicklung": "gelişme", "Haus": "ev"}, "German")
+        store.close()
+        assert os.path.exists(db_path)
+
+        # A new process starts with the recent translations already warm-loaded
+        store = TranslationStore(db_path=db_path)
+        assert store.get_many(["Entwicklung", "Haus", "Baum"], "German") == {"Entwicklung": "gelişme", "Haus": "ev"}
+        assert store.get("Haus", "German", "english") is None
+        stats = store.get_stats()
+        assert stats["memory_hits"] == 2 and stats["misses"] == 2
+        store.close()
+
+        logger.info("Translation store persistence test passed!")
+    finally:
+        shutil.rmtree(store_dir)
+
+    return True
+
+def test_lru_front_and_row_eviction():
+    """Test the LRU front, the batched last_used updates and the eviction of the least recently used rows"""
+
+    store_dir = tempfile.mkdtemp()
+    original_flush_size = translation_store.TOUCH_FLUSH_SIZE
+    try:
+        db_path = os.path.join(store_dir, "translations.db")
+        store = TranslationStore(db_path=db_path, cache_size=2, max_entries=100)
+        words = {f"wort{i}": f"kelime{i}" for i in range(3)}
+        store.put_many(words, "German")
+
+        # Only the last two words fit into the LRU front, the first one is read from disk
+        assert len(store.cache) == 2
+        assert store.get("wort0", "German") == "kelime0"
+        assert store.get_stats()["disk_hits"] == 1
+        assert store.get("wort0", "German") == "kelime0"
+        assert store.get_stats()["memory_hits"] == 1
+
+        # Reads don't write to the database until the pending read times are flushed
+        written = read_last_used(db_path, "wort0")
+        time.sleep(0.01)
+        assert store.get("wort0", "German") == "kelime0"
+        assert read_last_used(db_path, "wort0") == written
+        store.flush_touches()
+        assert read_last_used(db_path, "wort0") > written
+
+        # ...or until enough of them are pending
+        translation_store.TOUCH_FLUSH_SIZE = 1
+        written = read_last_used(db_path, "wort1")
+        time.sleep(0.01)
+        store.get("wort1", "German")
+        assert read_last_used(db_path, "wort1") > written
+        translation_store.TOUCH_FLUSH_SIZE = original_flush_size
+
+        # Growing past max_entries evicts the least recently used rows: a word read after newer ones
+        # were written survives, even though its read time was still pending when the eviction ran
+        store.put_many({f"alt{i}": f"eski{i}" for i in range(60)}, "German")
+        time.sleep(0.01)
+        store.get("wort2", "German")
+        time.sleep(0.01)
+        store.put_many({f"neu{i}": f"yeni{i}" for i in range(40)}, "German")
+        assert store.get_stats()["evictions"] == 13
+        assert read_last_used(db_path, "wort0") is None
+        assert read_last_used(db_path, "wort1") is None
+        assert read_last_used(db_path, "wort2") is not None
+        assert read_last_used(db_path, "neu39") is not None
+        store.close()
+
+        logger.info("Translation store eviction test passed!")
+    finally:
+        translation_store.TOUCH_FLUSH_SIZE = original_flush_size
+        shutil.rmtree(store_dir)
+
+    return True
+
+def test_derived_words_dont_collide():
+    """Test that words sharing a stem but not a lemma keep their own translations"""
+
+    store_dir = tempfile.mkdtemp()
+    try:
+        db_path = os.path.join(store_dir, "translations.db")
+        store = TranslationStore(db_path=db_path)
+        store.put_many({"university": "üniversite", "general": "genel", "organization": "kuruluş",
+                        "united": "birleşik"}, "English")
+        store.put_many({"Spieler": "oyuncu", "Arbeiter": "işçi", "Entwicklung": "gelişme"}, "German")
+        store.put_many({"casa": "ev", "partir": "ayrılmak"}, "Spanish")
+
+        found = store.get_many(["universities", "universe", "generous", "organ", "organizations", "unit"],
+                               "English")
+        assert found == {"universities": "üniversite", "organizations": "kuruluş"}
+        assert store.get_many(["Spiel", "Arbeit"], "German") == {}
+        assert store.get_many(["caso", "parte"], "Spanish") == {}
+
+        # Plurals still share the translation of their singular
+        assert store.get("Entwicklungen", "German") == "gelişme"
+        store.close()
+
+        # The same holds after a restart, when the words are read from disk
+        store = TranslationStore(db_path=db_path, cache_size=1)
+        assert store.get_many(["universe", "university"], "English") == {"university": "üniversite"}
+        store.close()
+
+        logger.info("Translation store collision test passed!")
+    finally:
+        shutil.rmtree(store_dir)
+
+    return True
+
+def test_concurrent_readers():
+    """Test that several threads can read while another one writes"""
+
+    store_dir = tempfile.mkdtemp()
+    try:
+        db_path = os.path.join(store_dir, "translations.db")
+        store = TranslationStore(db_path=db_path, cache_size=50)
+        words = {f"wort{i}": f"kelime{i}" for i in range(200)}
+        store.put_many(words, "German")
+
+        errors = []
+
+        def reader():
+            try:
+                for _ in range(20):
+                    found = store.get_many(list(words), "German")
+                    assert found == words, f"Reader got {len(found)} of {len(words)} translations"
+            except Exception as e:
+                errors.append(e)
+
+        def writer():
+            try:
+                for i in range(20):
+                    store.put_many({f"neu{i}_{j}": f"yeni{j}" for j in range(10)}, "German")
+            except Exception as e:
+                errors.append(e)
+
+        threads = [threading.Thread(target=reader) for _ in range(4)] + [threading.Thread(target=writer)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        assert not errors, f"Concurrent access failed: {errors}"
+        assert store.get("neu19_9", "German") == "yeni9"
+        logger.info(f"Translation store stats: {store.get_stats()}")
+        store.close()
+
+        logger.info("Translation store concurrency test passed!")
+    finally:
+        shutil.rmtree(store_dir)
+
+    return True
+
+if __name__ == "__main__":
+    test_persistence_across_instances()
+    test_lru_front_and_row_eviction()
+    test_derived_words_dont_collide()
+    test_concurrent_readers()
@@ -0,0 +1,79 @@
+import logging
+import shutil
+import tempfile
+import config
+from vocabulary_ledger import VocabularyLedger
+
+# Configure logging
+logging.basicConfig(
+    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
+    level=logging.DEBUG
+)
+logger = logging.getLogger(__name__)
+
+def test_known_words_are_skipped():
+    """Test that words shown often enough are skipped and that the ledger survives a reload"""
+
+    ledger_dir = tempfile.mkdtemp()
+    try:
+        ledger = VocabularyLedger(ledger_dir)
+        chat_id = 12345
+
+        # Show "Entwicklung" often enough, "Gesellschaft" only once
+        for _ in range(config.VOCAB_SKIP_AFTER_SEEN):
+            ledger.record(chat_id, ["Entwicklung"], "German")
+        ledger.record(chat_id, ["Gesellschaft"], "German")
+
+        # Inflected forms share the ledger entry of their lemma
+        words = ["Entwicklungen", "Gesellschaft", "Möglichkeit"]
+        remaining = ledger.filter_known(chat_id, words, "German")
+        logger.info(f"Remaining words: {remaining}")
+        assert remaining == ["Gesellschaft", "Möglichkeit"]
+
+        # Other chats are not affected
+        assert ledger.filter_known(chat_id + 1, words, "German") == words
+
+        # A new instance reads the same state back from disk
+        reloaded = VocabularyLedger(ledger_dir)
+        assert reloaded.filter_known(chat_id, words, "German") == ["Gesellschaft", "Möglichkeit"]
+
+        logger.info("Vocabulary ledger test passed!")
+    finally:
+        shutil.rmtree(ledger_dir)
+
+    return True
+
+def test_ledgers_of_cold_chats_are_dropped():
+    """Test that only the most recently used ledgers stay in memory and dropped ones are read back"""
+
+    ledger_dir = tempfile.mkdtemp()
+    try:
+        ledger = VocabularyLedger(ledger_dir, max_chats=2)
+        for chat_id in (1, 2, 3):
+            for _ in range(config.VOCAB_SKIP_AFTER_SEEN):
+                ledger.record(chat_id, ["Entwicklung"], "German")
+
+        # Chat 1 was used least recently
+        assert list(ledger.ledgers) == [2, 3]
+        assert set(ledger.line_counts) == {2, 3}
+
+        # Using chat 2 makes chat 3 the coldest, reading chat 1 back drops it
+        ledger.filter_known(2, ["Entwicklung"], "German")
+        assert ledger.filter_known(1, ["Entwicklung", "Gesellschaft"], "German") == ["Gesellschaft"]
+        assert list(ledger.ledgers) == [2, 1]
+
+        # Appends after a reload keep counting from the stored state
+        ledger.record(3, ["Gesellschaft"], "German")
+        assert ledger.ledgers[3][("german", "gesellschaft")][0] == 1
+        assert ledger.ledgers[3][("german", "entwicklung")][0] == config.VOCAB_SKIP_AFTER_SEEN
+        assert len(ledger.ledgers) == 2
+
+        logger.info("Vocabulary ledger eviction test passed!")
+    finally:
+        shutil.rmtree(ledger_dir)
+
+    return True
+
+if __name__ == "__main__":
+    test_known_words_are_skipped()
+    test_ledgers_of_cold_chats_are_dropped()
@@ -1,4 +1,16 @@
 import logging
+import os
+import re
+import time
+import threading
+import shutil
+import tempfile
+from contextlib import contextmanager
+from types import SimpleNamespace
+import config
+import word_translation
+from negative_cache import NegativeCache
+from translation_store import TranslationStore
 from word_translation import identify_uncommon_words, translate_words, process_text_with_translations
 
 # Configure logging
@@ -8,6 +20,181 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
+# A language without CEFR index or local dictionary, so every word is a candidate for Gemini
+STUB_LANGUAGE = "Klingon"
+
+def fake_response(text, finish_reason="STOP"):
+    """Build a Gemini response with one candidate, or without candidates if text is None"""
+    if text is None:
+        return SimpleNamespace(candidates=[], prompt_feedback=None)
+    candidate = SimpleNamespace(content=SimpleNamespace(parts=[SimpleNamespace(text=text)]), finish_reason=finish_reason)
+    return SimpleNamespace(candidates=[candidate], prompt_feedback=None)
+
+@contextmanager
+def stubbed_word_model(reply):
+    """Replace the word model with reply(prompt) and use an empty translation store and negative cache"""
+    originals = (word_translation._generate_word_content, word_translation.translation_store,
+                 word_translation.negative_cache)
+    store_dir = tempfile.mkdtemp()
+    prompts = []
+
+    def generate(prompt, max_output_tokens, stats=None):
+        if stats is not None:
+            stats["gemini_calls"] = stats.get("gemini_calls", 0) + 1
+        prompts.append(prompt)
+        return reply(prompt)
+
+    store = TranslationStore(db_path=os.path.join(store_dir, "translations.db"))
+    word_translation._generate_word_content = generate
+    word_translation.translation_store = store
+    word_translation.negative_cache = NegativeCache(capacity=1000, error_rate=0.001)
+    try:
+        yield prompts
+    finally:
+        (word_translation._generate_word_content, word_translation.translation_store,
+         word_translation.negative_cache) = originals
+        store.close()
+        shutil.rmtree(store_dir)
+
+def test_batched_reply_parsing():
+    """Test that the combined identify+translate reply is parsed strictly and NONE is understood"""
+
+    sentences = ["The zorblat met a flimbix near the glorpstone."]
+    reply = ("Zorblat: zorblat-tr\n"
+             "a line without a separator\n"
+             "unrequested: should be ignored\n"
+             ": no word\n"
+             "flimbix:   \n"
+             "glorpstone: taş")
+    with stubbed_word_model(lambda prompt: fake_response(reply)) as prompts:
+        stats = {}
+        translations = word_translation.identify_and_translate_words(sentences, STUB_LANGUAGE, stats)
+        logger.info(f"Parsed translations: {translations}")
+        assert translations == {"Zorblat": "zorblat-tr", "glorpstone": "taş"}
+        assert stats["gemini_calls"] == 1 and len(prompts) == 1
+
+        # Parsed translations are stored, so a second pass needs no request
+        assert word_translation.identify_and_translate_words(sentences, STUB_LANGUAGE) == \
+            {"zorblat": "zorblat-tr", "glorpstone": "taş"}
+        assert len(prompts) == 1
+
+    # NONE means no candidate is uncommon, and they are remembered as easy
+    with stubbed_word_model(lambda prompt: fake_response("NONE")) as prompts:
+        assert word_translation.identify_and_translate_words(sentences, STUB_LANGUAGE) == {}
+        assert word_translation.negative_cache.filter_unknown(["zorblat", "flimbix"], STUB_LANGUAGE) == []
+        assert word_translation.identify_and_translate_words(sentences, STUB_LANGUAGE) == {}
+        assert len(prompts) == 1
+
+    logger.info("Batched reply parsing test passed!")
+    return True
+
+def test_empty_reply_falls_back():
+    """Test that an empty batched reply makes build_glossary fall back to the per-sentence pipeline"""
+
+    def reply(prompt):
+        # The batched request gets no candidates, the per-sentence requests work
+        if "Candidate words" in prompt:
+            return fake_response(None)
+        if "identify words" in prompt:
+            return fake_response("zorblat")
+        return fake_response("zorblat: zorblat-tr")
+
+    with stubbed_word_model(reply):
+        assert word_translation.identify_and_translate_words(["A zorblat."], STUB_LANGUAGE) is None
+
+        stats = {}
+        translations = word_translation.build_glossary("A zorblat appeared.", STUB_LANGUAGE, stats)
+        logger.info(f"Fallback translations: {translations}, stats: {stats}")
+        assert stats["mode"] == "per_sentence"
+        assert translations == {"zorblat": "zorblat-tr"}
+
+    logger.info("Empty reply fallback test passed!")
+    return True
+
+def test_truncated_reply_is_not_cached():
+    """Test that a reply cut off at the output token limit doesn't mark the words it didn't reach as easy"""
+
+    sentences = ["The zorblat met a flimbix near the glorpstone."]
+    candidates = ["zorblat", "flimbix", "glorpstone"]
+
+    # The batched reply stops in the middle of its second line
+    with stubbed_word_model(lambda prompt: fake_response("zorblat: zorblat-tr\nflimbix: fli", "MAX_TOKENS")):
+        translations = word_translation.identify_and_translate_words(sentences, STUB_LANGUAGE)
+        logger.info(f"Translations from the cut-off reply: {translations}")
+        assert translations == {"zorblat": "zorblat-tr"}
+        assert word_translation.negative_cache.filter_unknown(candidates, STUB_LANGUAGE) == candidates
+
+    # The same reply with a finish reason of STOP is complete, so the words it left out are easy
+    with stubbed_word_model(lambda prompt: fake_response("zorblat: zorblat-tr\nflimbix: flimbix-tr")):
+        word_translation.identify_and_translate_words(sentences, STUB_LANGUAGE)
+        assert word_translation.negative_cache.filter_unknown(candidates, STUB_LANGUAGE) == ["zorblat", "flimbix"]
+
+    # A reply without a finish reason counts as complete too
+    with stubbed_word_model(lambda prompt: fake_response("zorblat: zorblat-tr\nflimbix: flimbix-tr", None)):
+        assert word_translation.identify_and_translate_words(sentences, STUB_LANGUAGE) == {
+            "zorblat": "zorblat-tr", "flimbix": "flimbix-tr"}
+        assert word_translation.negative_cache.filter_unknown(candidates, STUB_LANGUAGE) == ["zorblat", "flimbix"]
+
+    # The per-sentence identification reply is cut off after "glorpstone, zor"
+    with stubbed_word_model(lambda prompt: fake_response("glorpstone, zor", "MAX_TOKENS")):
+        uncommon_words = identify_uncommon_words(sentences[0], STUB_LANGUAGE)
+        logger.info(f"Uncommon words from the cut-off reply: {uncommon_words}")
+        assert uncommon_words == ["glorpstone"]
+        assert word_translation.negative_cache.filter_unknown(candidates, STUB_LANGUAGE) == candidates
+
+    logger.info("Truncated reply test passed!")
+    return True
+
+def test_slow_batch_misses_the_deadline():
+    """Test that parallel batches return what finished before the deadline and leave the slow batch out"""
+
+    candidates = ["zorblat", "flimbix", "glorpstone", "snarfwick", "quuxle", "blorvak"]
+    release = threading.Event()
+    finished = threading.Event()
+
+    def reply(prompt):
+        words = re.search(r"Candidate words: (.*)", prompt).group(1).split(", ")
+        if "glorpstone" in words:
+            # This batch only answers after the deadline (or when the test releases it)
+            try:
+                release.wait(10)
+                return fake_response(None)
+            finally:
+                finished.set()
+        if "blorvak" in words:
+            return fake_response(None)
+        return fake_response("\n".join(f"{word}: {word}-tr" for word in words))
+
+    original_settings = (config.GLOSSARY_BATCH_WORDS, config.GLOSSARY_DEADLINE)
+    config.GLOSSARY_BATCH_WORDS, config.GLOSSARY_DEADLINE = 2, 0.5
+    try:
+        with stubbed_word_model(reply):
+            stats = {}
+            start_time = time.time()
+            translations = word_translation._request_translations_parallel([], candidates, STUB_LANGUAGE, stats)
+            elapsed = time.time() - start_time
+            logger.info(f"Parallel translations after {elapsed:.2f} seconds: {translations}, stats: {stats}")
+
+            # The first batch finished, the second missed the deadline and the third failed
+            assert translations == {"zorblat": "zorblat-tr", "flimbix": "flimbix-tr"}
+            assert stats["batches"] == 3 and stats["batches_missed"] == 2
+            assert elapsed < 5
+
+            # A missed deadline is not a failure of every batch, so the caller doesn't fall back
+            release.clear()
+            finished.clear()
+            translations = word_translation._request_translations_parallel([], ["glorpstone"], STUB_LANGUAGE)
+            assert translations == {}
+
+            release.set()
+            assert finished.wait(10)
+    finally:
+        release.set()
+        config.GLOSSARY_BATCH_WORDS, config.GLOSSARY_DEADLINE = original_settings
+
+    logger.info("Glossary deadline test passed!")
+    return True
+
 def test_word_translation():
     """Test that word translation works correctly"""
 
@@ -63,4 +250,8 @@ def test_word_translation():
     print("\nTest completed!")
 
 if __name__ == "__main__":
+    test_batched_reply_parsing()
+    test_empty_reply_falls_back()
+    test_truncated_reply_is_not_cached()
+    test_slow_batch_misses_the_deadline()
     test_word_translation()
@@ -0,0 +1,66 @@
+import logging
+from typing import Any, Iterable, List, Mapping, Optional
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+# Gemini's tokenizer averages about 4 characters per token for the languages the bot speaks
+CHARS_PER_TOKEN = 4
+
+# Role and turn markers added around every message of a prompt
+MESSAGE_TOKEN_OVERHEAD = 4
+
+def estimate_tokens(text: str) -> int:
+    """
+    Estimate the number of prompt tokens a message costs, without calling the API
+
+    Args:
+        text: The message content
+
+    Returns:
+        Estimated token count, including the per-message overhead
+    """
+    return (len(text) + CHARS_PER_TOKEN - 1) // CHARS_PER_TOKEN + MESSAGE_TOKEN_OVERHEAD
+
+def message_tokens(message: Mapping[str, Any]) -> int:
+    """
+    Get the token count of a message, using the count cached in its 'tokens' key if present
+
+    Args:
+        message: Message with a 'content' key and optionally a 'tokens' key
+
+    Returns:
+        Token count of the message
+    """
+    tokens = message.get("tokens")
+    return tokens if tokens is not None else estimate_tokens(message["content"])
+
+def select_within_budget(messages_newest_first: Iterable[Mapping[str, Any]], token_budget: Optional[int],
+                         max_messages: Optional[int] = None) -> List[Mapping[str, Any]]:
+    """
+    Pick the newest messages whose total token count fits a budget
+
+    The newest message is always kept, even if it exceeds the budget on its
+    own, since it is usually the message being answered.
+
+    Args:
+        messages_newest_first: Messages ordered from newest to oldest
+        token_budget: Maximum total tokens, or None / 0 for no limit
+        max_messages: Maximum number of messages, or None for no limit
+
+    Returns:
+        The selected messages in chronological order
+    """
+    selected = []
+    used = 0
+    for message in messages_newest_first:
+        if max_messages is not None and len(selected) >= max_messages:
+            break
+        tokens = message_tokens(message)
+        if token_budget and selected and used + tokens > token_budget:
+            break
+        selected.append(message)
+        used += tokens
+
+    selected.reverse()
+    return selected
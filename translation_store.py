@@ -0,0 +1,364 @@
+import os
+import sqlite3
+import logging
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, List, Any, Optional, Tuple
+import config
+from stemming import lemma
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+# Reads don't write to the database: the last_used times of the words read are
+# collected and written in one transaction once this many are pending
+TOUCH_FLUSH_SIZE = 256
+
+class TranslationStore:
+    """
+    Persistent word translation cache shared by all bot processes
+
+    Translations are kept in a SQLite database in WAL mode keyed by
+    (word, source language, target language), so several processes can read
+    and write it at once and translations survive restarts. An in-process LRU
+    dictionary in front of the database serves the hot words without I/O.
+
+    Words are keyed by their lemma (see stemming.lemma), so unambiguous plurals
+    share the translation of their singular while words that merely look alike,
+    like "Spieler" and "Spiel", don't. Callers always get results keyed by the
+    surface form they passed in.
+
+    The database is opened on first use, so importing the module creates no file.
+    """
+    def __init__(self, db_path: str = config.TRANSLATION_STORE_PATH,
+                 cache_size: int = config.TRANSLATION_CACHE_SIZE,
+                 max_entries: int = config.TRANSLATION_STORE_MAX_ENTRIES):
+        self.db_path = db_path
+        self.cache_size = cache_size
+        self.max_entries = max_entries
+
+        # In-process LRU front: (word, source, target) -> translation
+        self.cache: "OrderedDict[Tuple[str, str, str], str]" = OrderedDict()
+
+        # Hit/miss counters
+        self.stats: Dict[str, int] = {
+            "memory_hits": 0,
+            "disk_hits": 0,
+            "misses": 0,
+            "writes": 0,
+            "evictions": 0
+        }
+
+        # Thread lock for the LRU front and counters
+        self.lock = threading.RLock()
+
+        # One connection per thread, all closed on shutdown
+        self._local = threading.local()
+        self._connections: List[sqlite3.Connection] = []
+        self._writes_since_eviction_check = 0
+
+        # Pending last_used updates of read words: key -> time of the last read
+        self._touched: Dict[Tuple[str, str, str], float] = {}
+
+        # Whether the schema has been created and the LRU front warm-loaded
+        self._ready = False
+
+    def _ensure_ready(self) -> None:
+        """
+        Open the database on first use: create the schema and warm-load the LRU front
+        """
+        if self._ready:
+            return
+        with self.lock:
+            if self._ready:
+                return
+            directory = os.path.dirname(self.db_path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            self._create_schema()
+            self._warm_load()
+            self._ready = True
+
+    def _connect(self) -> sqlite3.Connection:
+        """
+        Get the SQLite connection of the current thread
+
+        Returns:
+            An open connection configured for concurrent access
+        """
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.db_path, timeout=10, check_same_thread=False)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute("PRAGMA busy_timeout=10000")
+            self._local.conn = conn
+            with self.lock:
+                self._connections.append(conn)
+        return conn
+
+    def _create_schema(self) -> None:
+        """
+        Create the translations table if it doesn't exist
+        """
+        conn = self._connect()
+        with conn:
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS translations (
+                    word TEXT NOT NULL,
+                    source_language TEXT NOT NULL,
+                    target_language TEXT NOT NULL,
+                    translation TEXT NOT NULL,
+                    last_used REAL NOT NULL,
+                    PRIMARY KEY (word, source_language, target_language)
+                )
+            """)
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_translations_last_used ON translations (last_used)")
+
+    def _warm_load(self) -> None:
+        """
+        Load the most recently used translations into the LRU front
+        """
+        try:
+            rows = self._connect().execute(
+                "SELECT word, source_language, target_language, translation FROM translations "
+                "ORDER BY last_used DESC LIMIT ?",
+                (self.cache_size,)
+            ).fetchall()
+
+            with self.lock:
+                # Insert oldest first so the most recent entries end up at the hot end
+                for word, source_language, target_language, translation in reversed(rows):
+                    self.cache[(word, source_language, target_language)] = translation
+
+            logger.info(f"Warm-loaded {len(rows)} word translations from {self.db_path}")
+        except Exception as e:
+            logger.error(f"Error warm-loading word translations: {e}")
+
+    @staticmethod
+    def _make_key(word: str, source_language: str, target_language: str) -> Tuple[str, str, str]:
+        """
+        Build the lookup key of a word: its lemma plus the lowercased language pair
+        """
+        return (lemma(word, source_language), source_language.lower(), target_language.lower())
+
+    def _remember(self, key: Tuple[str, str, str], translation: str) -> None:
+        """
+        Put a translation into the LRU front, evicting the least recently used entry if full
+        """
+        with self.lock:
+            self.cache[key] = translation
+            self.cache.move_to_end(key)
+            while len(self.cache) > self.cache_size:
+                self.cache.popitem(last=False)
+
+    def get_many(self, words: List[str], source_language: str, target_language: str = "turkish") -> Dict[str, str]:
+        """
+        Look up the stored translations of several words
+
+        Args:
+            words: The words to look up
+            source_language: The language of the words
+            target_language: The language of the translations
+
+        Returns:
+            Dictionary mapping each found word (as given) to its translation
+        """
+        self._ensure_ready()
+        found: Dict[str, str] = {}
+        missing: Dict[Tuple[str, str, str], List[str]] = {}
+        source, target = source_language.lower(), target_language.lower()
+        now = time.time()
+
+        with self.lock:
+            for word in words:
+                key = self._make_key(word, source_language, target_language)
+                if key in self.cache:
+                    self.cache.move_to_end(key)
+                    self._touched[key] = now
+                    found[word] = self.cache[key]
+                    self.stats["memory_hits"] += 1
+                else:
+                    missing.setdefault(key, []).append(word)
+
+        if missing:
+            try:
+                rows = self._connect().execute(
+                    f"SELECT word, translation FROM translations WHERE source_language = ? AND target_language = ? "
+                    f"AND word IN ({','.join('?' * len(missing))})",
+                    [source, target] + [key[0] for key in missing]
+                ).fetchall()
+
+                for word, translation in rows:
+                    key = (word, source, target)
+                    self._remember(key, translation)
+                    with self.lock:
+                        self._touched[key] = now
+                    for original in missing.pop(key, []):
+                        found[original] = translation
+                        with self.lock:
+                            self.stats["disk_hits"] += 1
+            except Exception as e:
+                logger.error(f"Error reading word translations from {self.db_path}: {e}")
+
+            with self.lock:
+                self.stats["misses"] += sum(len(originals) for originals in missing.values())
+
+        if len(self._touched) >= TOUCH_FLUSH_SIZE:
+            self.flush_touches()
+
+        return found
+
+    def get(self, word: str, source_language: str, target_language: str = "turkish") -> Optional[str]:
+        """
+        Look up the stored translation of a single word
+
+        Args:
+            word: The word to look up
+            source_language: The language of the word
+            target_language: The language of the translation
+
+        Returns:
+            The translation, or None if the word has not been translated before
+        """
+        return self.get_many([word], source_language, target_language).get(word)
+
+    def put_many(self, translations: Dict[str, str], source_language: str, target_language: str = "turkish") -> None:
+        """
+        Store several translations, in memory and on disk
+
+        Args:
+            translations: Dictionary mapping words to their translations
+            source_language: The language of the words
+            target_language: The language of the translations
+        """
+        if not translations:
+            return
+
+        self._ensure_ready()
+        now = time.time()
+        rows = []
+        for word, translation in translations.items():
+            key = self._make_key(word, source_language, target_language)
+            self._remember(key, translation)
+            with self.lock:
+                # The write below sets last_used already
+                self._touched.pop(key, None)
+            rows.append(key + (translation, now))
+
+        try:
+            conn = self._connect()
+            with conn:
+                conn.executemany(
+                    "INSERT INTO translations (word, source_language, target_language, translation, last_used) "
+                    "VALUES (?, ?, ?, ?, ?) "
+                    "ON CONFLICT (word, source_language, target_language) "
+                    "DO UPDATE SET translation = excluded.translation, last_used = excluded.last_used",
+                    rows
+                )
+
+            with self.lock:
+                self.stats["writes"] += len(rows)
+                self._writes_since_eviction_check += len(rows)
+                check_eviction = self._writes_since_eviction_check >= 100
+                if check_eviction:
+                    self._writes_since_eviction_check = 0
+
+            if check_eviction:
+                self._evict_if_needed()
+        except Exception as e:
+            logger.error(f"Error writing word translations to {self.db_path}: {e}")
+
+    def put(self, word: str, source_language: str, translation: str, target_language: str = "turkish") -> None:
+        """
+        Store a single translation
+
+        Args:
+            word: The original word
+            source_language: The language of the word
+            translation: The translation
+            target_language: The language of the translation
+        """
+        self.put_many({word: translation}, source_language, target_language)
+
+    def flush_touches(self) -> None:
+        """
+        Write the pending last_used times of read words to the database in one transaction
+        """
+        with self.lock:
+            if not self._touched:
+                return
+            touched, self._touched = self._touched, {}
+
+        try:
+            conn = self._connect()
+            with conn:
+                # MAX keeps a newer time another process may have written meanwhile
+                conn.executemany(
+                    "UPDATE translations SET last_used = MAX(last_used, ?) "
+                    "WHERE word = ? AND source_language = ? AND target_language = ?",
+                    [(used,) + key for key, used in touched.items()]
+                )
+        except Exception as e:
+            logger.error(f"Error writing word translation read times to {self.db_path}: {e}")
+
+    def _evict_if_needed(self) -> None:
+        """
+        Delete the least recently used rows once the store grows beyond max_entries
+        """
+        # Rows read since the last flush must not look unused
+        self.flush_touches()
+
+        conn = self._connect()
+        count = conn.execute("SELECT COUNT(*) FROM translations").fetchone()[0]
+        if count <= self.max_entries:
+            return
+
+        # Evict down to 90% of the limit so we don't evict on every write
+        to_delete = count - int(self.max_entries * 0.9)
+        with conn:
+            conn.execute(
+                "DELETE FROM translations WHERE rowid IN "
+                "(SELECT rowid FROM translations ORDER BY last_used ASC LIMIT ?)",
+                (to_delete,)
+            )
+
+        with self.lock:
+            self.stats["evictions"] += to_delete
+        logger.info(f"Evicted {to_delete} least recently used word translations from {self.db_path}")
+
+    def get_stats(self) -> Dict[str, Any]:
+        """
+        Get hit/miss statistics of the store
+
+        Returns:
+            Dictionary with the counters, the hit rate and the LRU front size
+        """
+        with self.lock:
+            stats = dict(self.stats)
+            stats["cached"] = len(self.cache)
+
+        lookups = stats["memory_hits"] + stats["disk_hits"] + stats["misses"]
+        stats["hit_rate"] = (stats["memory_hits"] + stats["disk_hits"]) / lookups if lookups else 0.0
+        return stats
+
+    def close(self) -> None:
+        """
+        Close all database connections, writing the pending read times first
+        """
+        if self._ready:
+            self.flush_touches()
+        with self.lock:
+            for conn in self._connections:
+                try:
+                    conn.close()
+                except Exception as e:
+                    logger.error(f"Error closing translation store connection: {e}")
+            self._connections.clear()
+        self._local = threading.local()
+        self._ready = False
+        logger.info(f"Translation store closed: {self.get_stats()}")
+
+# Create a singleton instance
+translation_store = TranslationStore()
@@ -0,0 +1,161 @@
+import os
+import logging
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, List, Iterable, Tuple
+import config
+from stemming import lemma
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+class VocabularyLedger:
+    """
+    Per-chat record of the words a learner has already been shown in a glossary
+
+    Each chat has a small append-only file next to its memory file with one
+    "language, lemma, count, last seen" line per update. The latest line for a
+    word wins on load, and the file is rewritten only when it has grown well
+    beyond the number of distinct words.
+
+    Like the conversations, only the ledgers of the most recently active chats
+    are kept in memory. Every update is already on disk, so a ledger can be
+    dropped at any time and is read back on the chat's next glossary.
+    """
+    def __init__(self, ledger_dir: str = config.MEMORY_DIR, max_chats: int = config.MEMORY_CACHE_SIZE):
+        self.ledger_dir = ledger_dir
+        self.max_chats = max_chats
+
+        # chat_id -> {(language, lemma): (count, last_seen)}, least recently used first
+        self.ledgers: "OrderedDict[int, Dict[Tuple[str, str], Tuple[int, float]]]" = OrderedDict()
+
+        # Number of lines in each chat's ledger file, used to decide when to compact
+        self.line_counts: Dict[int, int] = {}
+
+        # Thread lock for thread safety
+        self.lock = threading.RLock()
+
+        os.makedirs(self.ledger_dir, exist_ok=True)
+
+    def _get_ledger_file_path(self, chat_id: int) -> str:
+        """
+        Get the file path for a specific chat's vocabulary ledger
+        """
+        return os.path.join(self.ledger_dir, f"vocab_{chat_id}.tsv")
+
+    def _get_ledger(self, chat_id: int) -> Dict[Tuple[str, str], Tuple[int, float]]:
+        """
+        Get a chat's ledger, loading it from disk on first access and dropping the least recently used ones
+        """
+        with self.lock:
+            if chat_id in self.ledgers:
+                self.ledgers.move_to_end(chat_id)
+                return self.ledgers[chat_id]
+
+            ledger = {}
+            line_count = 0
+            ledger_file = self._get_ledger_file_path(chat_id)
+            if os.path.exists(ledger_file):
+                try:
+                    with open(ledger_file, 'r', encoding='utf-8') as f:
+                        for line in f:
+                            parts = line.rstrip('\n').split('\t')
+                            if len(parts) == 4:
+                                ledger[(parts[0], parts[1])] = (int(parts[2]), float(parts[3]))
+                                line_count += 1
+                except Exception as e:
+                    logger.error(f"Error loading vocabulary ledger for chat {chat_id}: {e}")
+
+            self.ledgers[chat_id] = ledger
+            self.line_counts[chat_id] = line_count
+
+            while self.max_chats > 0 and len(self.ledgers) > self.max_chats:
+                evicted_chat_id, _ = self.ledgers.popitem(last=False)
+                self.line_counts.pop(evicted_chat_id, None)
+            return ledger
+
+    def filter_known(self, chat_id: int, words: List[str], language: str) -> List[str]:
+        """
+        Drop the words a learner has recently been shown often enough
+
+        Args:
+            chat_id: The Telegram chat ID
+            words: Candidate words
+            language: The language of the words
+
+        Returns:
+            The words that still need a translation, in input order
+        """
+        if config.VOCAB_SKIP_AFTER_SEEN <= 0:
+            return words
+
+        recent_since = time.time() - config.VOCAB_RECENT_DAYS * 86400
+        language = language.lower()
+
+        with self.lock:
+            ledger = self._get_ledger(chat_id)
+            remaining = []
+            for word in words:
+                count, last_seen = ledger.get((language, lemma(word, language)), (0, 0.0))
+                if count < config.VOCAB_SKIP_AFTER_SEEN or last_seen < recent_since:
+                    remaining.append(word)
+
+        if len(remaining) < len(words):
+            logger.debug(f"Skipped {len(words) - len(remaining)} already known words for chat {chat_id}")
+        return remaining
+
+    def record(self, chat_id: int, words: Iterable[str], language: str) -> None:
+        """
+        Record that words were shown to a learner in a glossary
+
+        Args:
+            chat_id: The Telegram chat ID
+            words: The glossed words
+            language: The language of the words
+        """
+        now = time.time()
+        language = language.lower()
+
+        with self.lock:
+            ledger = self._get_ledger(chat_id)
+            lines = []
+            for key in dict.fromkeys((language, lemma(word, language)) for word in words):
+                count = ledger.get(key, (0, 0.0))[0] + 1
+                ledger[key] = (count, now)
+                lines.append(f"{key[0]}\t{key[1]}\t{count}\t{now:.0f}\n")
+
+            if not lines:
+                return
+
+            try:
+                # Append only the updated entries
+                with open(self._get_ledger_file_path(chat_id), 'a', encoding='utf-8') as f:
+                    f.writelines(lines)
+                self.line_counts[chat_id] += len(lines)
+
+                # Rewrite the file once most of its lines are outdated
+                if self.line_counts[chat_id] > max(100, 2 * len(ledger)):
+                    self._compact(chat_id)
+            except Exception as e:
+                logger.error(f"Error saving vocabulary ledger for chat {chat_id}: {e}")
+
+    def _compact(self, chat_id: int) -> None:
+        """
+        Rewrite a chat's ledger file with one line per word
+        """
+        with self.lock:
+            ledger = self.ledgers[chat_id]
+            ledger_file = self._get_ledger_file_path(chat_id)
+            temp_file = f"{ledger_file}.tmp"
+
+            with open(temp_file, 'w', encoding='utf-8') as f:
+                for (language, word_lemma), (count, last_seen) in ledger.items():
+                    f.write(f"{language}\t{word_lemma}\t{count}\t{last_seen:.0f}\n")
+            os.replace(temp_file, ledger_file)
+
+            self.line_counts[chat_id] = len(ledger)
+            logger.debug(f"Compacted vocabulary ledger for chat {chat_id} to {len(ledger)} words")
+
+# Create a singleton instance
+vocabulary_ledger = VocabularyLedger()
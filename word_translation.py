@@ -1,8 +1,15 @@
+import asyncio
+import concurrent.futures
 import logging
 import google.generativeai as genai
 import config
+import cefr_index
+from translation_store import translation_store
+from vocabulary_ledger import vocabulary_ledger
+from negative_cache import negative_cache
+from local_dictionary import local_dictionary
 import re
-from typing import List, Dict
+from typing import List, Dict, Optional
 
 # Configure logging
 logging.basicConfig(
@@ -14,10 +21,95 @@ logger = logging.getLogger(__name__)
 # Initialize Gemini
 genai.configure(api_key=config.GEMINI_API_KEY)
 
-# Cache for translated words to avoid repeated API calls
-word_translation_cache = {}
 
-def identify_uncommon_words(text: str, language: str) -> List[str]:
+# Dedicated thread pool for the translation pass, so its blocking Gemini calls never
+# run on the event loop and never compete with the default executor used elsewhere
+translation_executor = concurrent.futures.ThreadPoolExecutor(
+    max_workers=config.TRANSLATION_MAX_CONCURRENCY,
+    thread_name_prefix="translation"
+)
+
+# Separate pool for the word batches of long texts, its size is the in-flight limit.
+# Batches are submitted from translation_executor threads, so sharing that pool could deadlock
+glossary_batch_executor = concurrent.futures.ThreadPoolExecutor(
+    max_workers=config.GLOSSARY_MAX_IN_FLIGHT,
+    thread_name_prefix="glossary-batch"
+)
+
+def _generate_word_content(prompt: str, max_output_tokens: int, stats: Optional[Dict[str, int]] = None):
+    """
+    Send a prompt to the word translation model
+
+    Args:
+        prompt: The prompt to send
+        max_output_tokens: Output token limit for this request
+        stats: Optional dictionary whose 'gemini_calls' counter is incremented
+
+    Returns:
+        The raw Gemini response
+    """
+    model = genai.GenerativeModel(
+        model_name=config.WORD_TRANSLATION_MODEL,
+        generation_config={
+            "temperature": config.WORD_TRANSLATION_TEMPERATURE,
+            "top_p": config.WORD_TRANSLATION_TOP_P,
+            "top_k": config.WORD_TRANSLATION_TOP_K,
+            "max_output_tokens": max_output_tokens,
+        },
+        safety_settings=config.SAFETY_SETTINGS
+    )
+
+    if stats is not None:
+        stats["gemini_calls"] = stats.get("gemini_calls", 0) + 1
+
+    return model.generate_content(prompt)
+
+def _get_response_text(response) -> Optional[str]:
+    """
+    Extract the text of the first candidate from a Gemini response
+
+    Args:
+        response: The raw Gemini response
+
+    Returns:
+        The stripped response text, or None if the response has no usable content
+    """
+    # Check if the response has candidates
+    if hasattr(response, 'candidates') and response.candidates:
+        if hasattr(response.candidates[0], 'content') and response.candidates[0].content:
+            if hasattr(response.candidates[0].content, 'parts') and response.candidates[0].content.parts:
+                return response.candidates[0].content.parts[0].text.strip()
+
+    # Check if there's prompt feedback indicating a block
+    if hasattr(response, 'prompt_feedback') and response.prompt_feedback:
+        if hasattr(response.prompt_feedback, 'block_reason') and response.prompt_feedback.block_reason:
+            logger.warning(f"Gemini blocked the word request: {response.prompt_feedback.block_reason}")
+
+    return None
+
+def _reply_finished(response) -> bool:
+    """
+    Check whether a Gemini reply ended on its own rather than being cut off
+
+    Args:
+        response: The raw Gemini response
+
+    Returns:
+        False if the first candidate stopped at the output token limit, True otherwise,
+        including replies without a finish reason
+    """
+    try:
+        reason = response.candidates[0].finish_reason
+    except (AttributeError, IndexError, TypeError):
+        return True
+    if reason is None:
+        return True
+
+    # The SDK reports an enum, compare its name
+    return str(getattr(reason, "name", reason)).upper() not in ("MAX_TOKENS", "LENGTH")
+
+def identify_uncommon_words(text: str, language: str, stats: Optional[Dict[str, int]] = None,
+                            chat_id: Optional[int] = None) -> List[str]:
     """
     Identify truly uncommon words in the given text based on language level A1
     Only selects words that would be genuinely difficult for beginners
@@ -25,6 +117,8 @@ def identify_uncommon_words(text: str, language: str) -> List[str]:
     Args:
         text: The text to analyze
         language: The language of the text
+        stats: Optional dictionary used to count Gemini calls
+        chat_id: Optional chat whose already learned words are skipped
 
     Returns:
         List of uncommon words
@@ -44,129 +138,29 @@ def identify_uncommon_words(text: str, language: str) -> List[str]:
             seen.add(word)
             unique_words.append(word)
 
+    # Skip the words this learner has already been shown often enough
+    if chat_id is not None:
+        unique_words = vocabulary_ledger.filter_known(chat_id, unique_words, language)
+
     # If no words to analyze, return empty list
     if not unique_words:
         return []
 
-    # Use a simple heuristic approach as fallback
-    # These are common words in various languages that are likely to be known at A1 level
-    common_words = {
-        "german": [
-            "ich", "du", "er", "sie", "es", "wir", "ihr", "sie", "und", "oder", "aber", "wenn", "dann",
-            "bin", "ist", "sind", "war", "waren", "haben", "hat", "hatte", "gehen", "kommen", "machen",
-            "gut", "schlecht", "ja", "nein", "bitte", "danke", "hallo", "tschüss", "auch", "schon",
-            "noch", "jetzt", "hier", "dort", "heute", "morgen", "gestern", "immer", "nie", "oft",
-            "manchmal", "viel", "wenig", "groß", "klein", "alt", "jung", "neu", "tag", "nacht",
-            "woche", "monat", "jahr", "zeit", "uhr", "minute", "stunde", "wasser", "essen", "trinken",
-            "sprechen", "sagen", "fragen", "antworten", "verstehen", "wissen", "kennen", "lernen",
-            "leben", "lieben", "mögen", "wollen", "können", "müssen", "sollen", "dürfen", "freund",
-            "familie", "mutter", "vater", "bruder", "schwester", "kind", "mann", "frau", "mensch",
-            "haus", "wohnung", "stadt", "land", "straße", "weg", "auto", "bus", "zug", "flugzeug",
-            "schule", "arbeit", "beruf", "geld", "preis", "farbe", "rot", "blau", "grün", "gelb",
-            "schwarz", "weiß", "musik", "buch", "film", "spiel", "sport", "fußball", "wetter", "sonne",
-            "regen", "schnee", "wind", "warm", "kalt", "schön", "hässlich", "leicht", "schwer", "schnell",
-            "langsam", "früh", "spät", "oben", "unten", "links", "rechts", "vorne", "hinten", "in", "an",
-            "auf", "unter", "über", "vor", "nach", "mit", "ohne", "für", "gegen", "weil", "dass", "ob",
-            "wie", "was", "wer", "wo", "wann", "warum", "eins", "zwei", "drei", "vier", "fünf", "sechs",
-            "sieben", "acht", "neun", "zehn", "hundert", "tausend", "million", "erste", "zweite", "letzte",
-            "nächste", "alle", "viele", "einige", "keine", "jeder", "dieser", "jener", "mein", "dein", "sein",
-            "ihr", "unser", "euer", "der", "die", "das", "ein", "eine", "kein", "keine", "mehr", "weniger",
-            "sehr", "zu", "nicht", "nur", "schon", "noch", "wieder", "immer", "nie", "vielleicht", "sicher",
-            "natürlich", "genau", "wirklich", "leider", "hoffentlich", "bitte", "danke", "entschuldigung",
-            "tut", "leid", "gern", "geschehen", "willkommen", "tschüss", "auf", "wiedersehen", "bis", "später",
-            "morgen", "bald", "guten", "tag", "abend", "nacht", "morgen", "woche", "ende", "schön", "toll",
-            "super", "prima", "gut", "schlecht", "richtig", "falsch", "wichtig", "interessant", "langweilig",
-            "einfach", "schwierig", "möglich", "unmöglich", "gleich", "anders", "ähnlich", "verschieden"
-        ],
-        "english": [
-            "i", "you", "he", "she", "it", "we", "they", "and", "or", "but", "if", "then", "am", "is",
-            "are", "was", "were", "have", "has", "had", "go", "come", "make", "good", "bad", "yes", "no",
-            "please", "thank", "hello", "bye", "also", "already", "still", "now", "here", "there", "today",
-            "tomorrow", "yesterday", "always", "never", "often", "sometimes", "much", "little", "big",
-            "small", "old", "young", "new", "day", "night", "week", "month", "year", "time", "clock",
-            "minute", "hour", "water", "eat", "drink", "speak", "say", "ask", "answer", "understand",
-            "know", "learn", "live", "love", "like", "want", "can", "must", "should", "may", "friend",
-            "family", "mother", "father", "brother", "sister", "child", "man", "woman", "person", "house",
-            "apartment", "city", "country", "street", "way", "car", "bus", "train", "plane", "school",
-            "work", "job", "money", "price", "color", "red", "blue", "green", "yellow", "black", "white",
-            "music", "book", "movie", "game", "sport", "football", "weather", "sun", "rain", "snow",
-            "wind", "warm", "cold", "beautiful", "ugly", "easy", "difficult", "fast", "slow", "early",
-            "late", "up", "down", "left", "right", "front", "back", "in", "at", "on", "under", "over",
-            "before", "after", "with", "without", "for", "against", "because", "that", "if", "how",
-            "what", "who", "where", "when", "why", "one", "two", "three", "four", "five", "six", "seven",
-            "eight", "nine", "ten", "hundred", "thousand", "million", "first", "second", "last", "next",
-            "all", "many", "some", "none", "every", "this", "that", "my", "your", "his", "her", "our",
-            "their", "the", "a", "an", "no", "more", "less", "very", "too", "not", "only", "already",
-            "still", "again", "always", "never", "maybe", "sure", "of course", "exactly", "really",
-            "unfortunately", "hopefully", "please", "thank you", "sorry", "you're welcome", "goodbye",
-            "see you", "later", "tomorrow", "soon", "good", "evening", "night", "morning", "weekend",
-            "nice", "great", "super", "excellent", "good", "bad", "right", "wrong", "important",
-            "interesting", "boring", "simple", "difficult", "possible", "impossible", "same", "different",
-            "similar", "various"
-        ],
-        "french": [
-            "je", "tu", "il", "elle", "nous", "vous", "ils", "elles", "et", "ou", "mais", "si", "suis",
-            "est", "sommes", "sont", "étais", "étaient", "avoir", "aller", "venir", "faire", "bon",
-            "mauvais", "oui", "non", "s'il", "merci", "bonjour", "au revoir", "aussi", "déjà", "encore",
-            "maintenant", "ici", "là", "aujourd'hui", "demain", "hier", "toujours", "jamais", "souvent",
-            "parfois", "beaucoup", "peu", "grand", "petit", "vieux", "jeune", "nouveau", "jour", "nuit",
-            "semaine", "mois", "année", "temps", "horloge", "minute", "heure", "eau", "manger", "boire",
-            "parler", "dire", "demander", "répondre", "comprendre", "savoir", "connaître", "apprendre",
-            "vivre", "aimer", "vouloir", "pouvoir", "devoir", "ami", "famille", "mère", "père", "frère",
-            "sœur", "enfant", "homme", "femme", "personne", "maison", "appartement", "ville", "pays",
-            "rue", "chemin", "voiture", "bus", "train", "avion", "école", "travail", "métier", "argent",
-            "prix", "couleur", "rouge", "bleu", "vert", "jaune", "noir", "blanc", "musique", "livre",
-            "film", "jeu", "sport", "football", "temps", "soleil", "pluie", "neige", "vent", "chaud",
-            "froid", "beau", "laid", "facile", "difficile", "rapide", "lent", "tôt", "tard", "haut",
-            "bas", "gauche", "droite", "avant", "arrière", "dans", "à", "sur", "sous", "au-dessus",
-            "avant", "après", "avec", "sans", "pour", "contre", "parce que", "que", "si", "comment",
-            "quoi", "qui", "où", "quand", "pourquoi", "un", "deux", "trois", "quatre", "cinq", "six",
-            "sept", "huit", "neuf", "dix", "cent", "mille", "million", "premier", "deuxième", "dernier",
-            "prochain", "tout", "beaucoup", "quelques", "aucun", "chaque", "ce", "cette", "mon", "ton",
-            "son", "notre", "votre", "leur", "le", "la", "les", "un", "une", "des", "plus", "moins",
-            "très", "trop", "ne pas", "seulement", "déjà", "encore", "toujours", "jamais", "peut-être",
-            "sûr", "bien sûr", "exactement", "vraiment", "malheureusement", "j'espère", "s'il vous plaît",
-            "merci", "désolé", "de rien", "au revoir", "à bientôt", "à demain", "bientôt", "bonjour",
-            "bonsoir", "bonne nuit", "bon matin", "week-end", "bien", "super", "excellent", "bon",
-            "mauvais", "correct", "faux", "important", "intéressant", "ennuyeux", "simple", "difficile",
-            "possible", "impossible", "même", "différent", "similaire", "divers"
-        ],
-        "spanish": [
-            "yo", "tú", "él", "ella", "nosotros", "vosotros", "ellos", "ellas", "y", "o", "pero", "si",
-            "soy", "es", "somos", "son", "era", "eran", "tener", "ir", "venir", "hacer", "bueno", "malo",
-            "sí", "no", "por favor", "gracias", "hola", "adiós", "también", "ya", "todavía", "ahora",
-            "aquí", "allí", "hoy", "mañana", "ayer", "siempre", "nunca", "a menudo", "a veces", "mucho",
-            "poco", "grande", "pequeño", "viejo", "joven", "nuevo", "día", "noche", "semana", "mes",
-            "año", "tiempo", "reloj", "minuto", "hora", "agua", "comer", "beber", "hablar", "decir",
-            "preguntar", "responder", "entender", "saber", "conocer", "aprender", "vivir", "amar",
-            "gustar", "querer", "poder", "deber", "amigo", "familia", "madre", "padre", "hermano",
-            "hermana", "niño", "hombre", "mujer", "persona", "casa", "apartamento", "ciudad", "país",
-            "calle", "camino", "coche", "autobús", "tren", "avión", "escuela", "trabajo", "profesión",
-            "dinero", "precio", "color", "rojo", "azul", "verde", "amarillo", "negro", "blanco", "música",
-            "libro", "película", "juego", "deporte", "fútbol", "tiempo", "sol", "lluvia", "nieve",
-            "viento", "caliente", "frío", "bonito", "feo", "fácil", "difícil", "rápido", "lento",
-            "temprano", "tarde", "arriba", "abajo", "izquierda", "derecha", "delante", "detrás", "en",
-            "a", "sobre", "bajo", "encima", "antes", "después", "con", "sin", "para", "contra", "porque",
-            "que", "si", "cómo", "qué", "quién", "dónde", "cuándo", "por qué", "uno", "dos", "tres",
-            "cuatro", "cinco", "seis", "siete", "ocho", "nueve", "diez", "cien", "mil", "millón",
-            "primero", "segundo", "último", "próximo", "todo", "muchos", "algunos", "ninguno", "cada",
-            "este", "ese", "mi", "tu", "su", "nuestro", "vuestro", "su", "el", "la", "los", "las", "un",
-            "una", "unos", "unas", "más", "menos", "muy", "demasiado", "no", "solo", "ya", "todavía",
-            "otra vez", "siempre", "nunca", "quizás", "seguro", "por supuesto", "exactamente", "realmente",
-            "desafortunadamente", "espero", "por favor", "gracias", "lo siento", "de nada", "adiós",
-            "hasta luego", "hasta mañana", "pronto", "buenos días", "buenas tardes", "buenas noches",
-            "buen día", "fin de semana", "bien", "genial", "excelente", "bueno", "malo", "correcto",
-            "incorrecto", "importante", "interesante", "aburrido", "simple", "difícil", "posible",
-            "imposible", "igual", "diferente", "similar", "varios"
-        ]
-    }
-
-    # Use Gemini to identify uncommon words
+    # Classify words locally with the CEFR index, only words it has never seen need Gemini
+    _, known_uncommon_words, unseen_words = cefr_index.classify_words(unique_words, language)
+
+    # Words Gemini already judged not uncommon need no request either
+    unseen_words = negative_cache.filter_unknown(unseen_words, language)
+
+    if not unseen_words:
+        return known_uncommon_words
+
+    # Use Gemini to identify uncommon words among the unseen ones
     try:
         prompt = f"""
         Analyze the following list of words in {language} and identify words that might be challenging for someone with A1 (beginner) language level.
 
-        Words: {', '.join(unique_words)}
+        Words: {', '.join(unseen_words)}
 
         Respond with ONLY the potentially challenging words separated by commas, nothing else. If there are no challenging words, respond with "NONE".
 
@@ -188,92 +182,49 @@ def identify_uncommon_words(text: str, language: str) -> List[str]:
         Be generous in your selection - it's better to include a word that might be familiar than to miss one that could be challenging.
         """
 
-        model = genai.GenerativeModel(
-            model_name=config.WORD_TRANSLATION_MODEL,
-            generation_config={
-                "temperature": config.WORD_TRANSLATION_TEMPERATURE,
-                "top_p": config.WORD_TRANSLATION_TOP_P,
-                "top_k": config.WORD_TRANSLATION_TOP_K,
-                "max_output_tokens": 100,
-            },
-            safety_settings=config.SAFETY_SETTINGS
-        )
-
-        response = model.generate_content(prompt)
+        response = _generate_word_content(prompt, 100, stats)
+        result = _get_response_text(response)
 
-        # Check if the response has candidates
-        if hasattr(response, 'candidates') and response.candidates:
-            if hasattr(response.candidates[0], 'content') and response.candidates[0].content:
-                if hasattr(response.candidates[0].content, 'parts') and response.candidates[0].content.parts:
-                    result = response.candidates[0].content.parts[0].text.strip()
+        if result is not None:
+            if result.upper() == "NONE":
+                negative_cache.add_many(unseen_words, language)
+                return known_uncommon_words
 
-                    if result.upper() == "NONE":
-                        return []
+            # Parse the response and return the list of uncommon words
+            uncommon_words = [word.strip() for word in result.split(',')]
 
-                    # Parse the response and return the list of uncommon words
-                    uncommon_words = [word.strip() for word in result.split(',')]
-                    return uncommon_words
+            if _reply_finished(response):
+                # Remember the words Gemini left out as not uncommon
+                selected = {word.lower() for word in uncommon_words}
+                negative_cache.add_many([word for word in unseen_words if word not in selected], language)
+            else:
+                # A cut-off reply didn't get to judge every word, and its last word may be incomplete
+                logger.warning(f"Uncommon word reply for {language} was cut off, not caching the words it left out")
+                uncommon_words = uncommon_words[:-1]
 
-        # If we get here, there was an issue with the response structure
-        # Check if there's prompt feedback indicating a block
-        if hasattr(response, 'prompt_feedback') and response.prompt_feedback:
-            if hasattr(response.prompt_feedback, 'block_reason') and response.prompt_feedback.block_reason:
-                logger.warning(f"Gemini blocked the uncommon words request: {response.prompt_feedback.block_reason}")
+            return known_uncommon_words + uncommon_words
 
         # Fall back to a simple heuristic approach
         logger.info(f"Falling back to heuristic approach for identifying uncommon words in {language}")
 
-        # Get the appropriate common words list based on language
-        lang_key = language.lower()
-        if lang_key in common_words:
-            common_word_list = common_words[lang_key]
-        else:
-            # Default to English if language not in our list
-            common_word_list = common_words["english"]
-
-        # Identify uncommon words based on our simple list
-        # Be less selective - include words longer than 4 characters that aren't in our common list
-        # Also include any words longer than 7 characters regardless of whether they're in the common list
-        # This helps ensure we're getting more words for translation
-        uncommon_words = [word for word in unique_words if
-                         (word.lower() not in common_word_list and len(word) > 4) or
-                         len(word) > 7]
-
-        # Limit to at most 5 words per sentence to provide more translations
-        return uncommon_words[:5]
-
     except Exception as e:
         logger.error(f"Error identifying uncommon words: {e}")
 
         # Fall back to a simple heuristic approach
         logger.info(f"Falling back to heuristic approach after exception for identifying uncommon words in {language}")
 
-        # Get the appropriate common words list based on language
-        lang_key = language.lower()
-        if lang_key in common_words:
-            common_word_list = common_words[lang_key]
-        else:
-            # Default to English if language not in our list
-            common_word_list = common_words["english"]
+    # Words the index has never seen are likely uncommon if they are longer than 4 characters
+    # Limit to at most 5 guessed words per sentence to provide more translations
+    return known_uncommon_words + [word for word in unseen_words if len(word) > 4][:5]
 
-        # Identify uncommon words based on our simple list
-        # Be less selective - include words longer than 4 characters that aren't in our common list
-        # Also include any words longer than 7 characters regardless of whether they're in the common list
-        # This helps ensure we're getting more words for translation
-        uncommon_words = [word for word in unique_words if
-                         (word.lower() not in common_word_list and len(word) > 4) or
-                         len(word) > 7]
-
-        # Limit to at most 5 words per sentence to provide more translations
-        return uncommon_words[:5]
-
-def translate_words(words: List[str], source_language: str) -> Dict[str, str]:
+def translate_words(words: List[str], source_language: str, stats: Optional[Dict[str, int]] = None) -> Dict[str, str]:
     """
     Translate a list of words from the source language to Turkish
 
     Args:
         words: List of words to translate
         source_language: The source language
+        stats: Optional dictionary used to count Gemini calls
 
     Returns:
         Dictionary mapping original words to their Turkish translations
@@ -281,86 +232,19 @@ def translate_words(words: List[str], source_language: str) -> Dict[str, str]:
     if not words:
         return {}
 
-    # Check cache first for all words
-    translations = {}
-    words_to_translate = []
-
-    for word in words:
-        cache_key = f"{word}_{source_language}_tr"
-        if cache_key in word_translation_cache:
-            translations[word] = word_translation_cache[cache_key]
-        else:
-            words_to_translate.append(word)
+    # Check the translation store first for all words
+    translations = translation_store.get_many(words, source_language)
+    words_to_translate = [word for word in words if word not in translations]
 
     if not words_to_translate:
         return translations
 
-    # Fallback translations for truly uncommon words
-    fallback_translations = {
-        # German
-        "aufmerksamkeit": "dikkat",
-        "übermensch": "üstün insan",
-        "philosophie": "felsefe",
-        "wissenschaft": "bilim",
-        "technologie": "teknoloji",
-        "psychologie": "psikoloji",
-        "mathematik": "matematik",
-        "universität": "üniversite",
-        "entwicklung": "gelişim",
-        "gesellschaft": "toplum",
-        "wirtschaft": "ekonomi",
-        "regierung": "hükümet",
-        "umgebung": "ortam",
-        "erfahrung": "deneyim",
-
-        # English
-        "philosophy": "felsefe",
-        "science": "bilim",
-        "technology": "teknoloji",
-        "psychology": "psikoloji",
-        "mathematics": "matematik",
-        "university": "üniversite",
-        "development": "gelişim",
-        "society": "toplum",
-        "economy": "ekonomi",
-        "government": "hükümet",
-        "environment": "ortam",
-        "experience": "deneyim",
-        "quantum": "kuantum",
-        "physics": "fizik",
-        "thermodynamics": "termodinamik",
-
-        # French
-        "philosophie": "felsefe",
-        "science": "bilim",
-        "technologie": "teknoloji",
-        "psychologie": "psikoloji",
-        "mathématiques": "matematik",
-        "université": "üniversite",
-        "développement": "gelişim",
-        "société": "toplum",
-        "économie": "ekonomi",
-        "gouvernement": "hükümet",
-        "environnement": "ortam",
-        "expérience": "deneyim",
-        "astrophysique": "astrofizik",
-
-        # Spanish
-        "filosofía": "felsefe",
-        "ciencia": "bilim",
-        "tecnología": "teknoloji",
-        "psicología": "psikoloji",
-        "matemáticas": "matematik",
-        "universidad": "üniversite",
-        "desarrollo": "gelişim",
-        "sociedad": "toplum",
-        "economía": "ekonomi",
-        "gobierno": "hükümet",
-        "ambiente": "ortam",
-        "experiencia": "deneyim",
-        "arquitectura": "mimarlık",
-        "neurociencia": "sinirbilim"
-    }
+    # Then the local dictionary, Gemini is only asked about the remaining words
+    translations.update(local_dictionary.lookup_many(words_to_translate, source_language))
+    words_to_translate = [word for word in words_to_translate if word not in translations]
+
+    if not words_to_translate:
+        return translations
 
     try:
         # Create a prompt to translate the words
@@ -377,198 +261,466 @@ def translate_words(words: List[str], source_language: str) -> Dict[str, str]:
         Keep the translations simple and appropriate for A1 (beginner) level.
         """
 
-        model = genai.GenerativeModel(
-            model_name=config.WORD_TRANSLATION_MODEL,
-            generation_config={
-                "temperature": config.WORD_TRANSLATION_TEMPERATURE,
-                "top_p": config.WORD_TRANSLATION_TOP_P,
-                "top_k": config.WORD_TRANSLATION_TOP_K,
-                "max_output_tokens": config.WORD_TRANSLATION_MAX_OUTPUT_TOKENS,
-            },
-            safety_settings=config.SAFETY_SETTINGS
-        )
+        response = _generate_word_content(prompt, config.WORD_TRANSLATION_MAX_OUTPUT_TOKENS, stats)
+        result = _get_response_text(response)
 
-        response = model.generate_content(prompt)
-
-        # Check if the response has candidates
-        if hasattr(response, 'candidates') and response.candidates:
-            if hasattr(response.candidates[0], 'content') and response.candidates[0].content:
-                if hasattr(response.candidates[0].content, 'parts') and response.candidates[0].content.parts:
-                    result = response.candidates[0].content.parts[0].text.strip()
-
-                    # Parse the response
-                    for line in result.split('\n'):
-                        if ':' in line:
-                            original, translation = line.split(':', 1)
-                            original = original.strip()
-                            translation = translation.strip()
-
-                            # Add to translations dictionary
-                            translations[original] = translation
-
-                            # Cache the result
-                            cache_key = f"{original}_{source_language}_tr"
-                            word_translation_cache[cache_key] = translation
-
-                    return translations
-
-        # If we get here, there was an issue with the response structure
-        # Check if there's prompt feedback indicating a block
-        if hasattr(response, 'prompt_feedback') and response.prompt_feedback:
-            if hasattr(response.prompt_feedback, 'block_reason') and response.prompt_feedback.block_reason:
-                logger.warning(f"Gemini blocked the translation request: {response.prompt_feedback.block_reason}")
-
-        # Fall back to our dictionary for any words we can translate
-        logger.info(f"Falling back to dictionary for translating words from {source_language}")
-        for word in words_to_translate:
-            word_lower = word.lower()
-            if word_lower in fallback_translations:
-                translations[word] = fallback_translations[word_lower]
-                # Cache the result
-                cache_key = f"{word}_{source_language}_tr"
-                word_translation_cache[cache_key] = fallback_translations[word_lower]
+        if result is not None:
+            # Parse the response
+            new_translations = _parse_translation_lines(result)
 
+            # Add to translations dictionary and store the results
+            translations.update(new_translations)
+            translation_store.put_many(new_translations, source_language)
+
+            return translations
+
+        logger.info(f"No usable translation response for words from {source_language}")
         return translations
 
     except Exception as e:
         logger.error(f"Error translating words to Turkish: {e}")
+        return translations  # Return what we have so far
 
-        # Fall back to our dictionary for any words we can translate
-        logger.info(f"Falling back to dictionary after exception for translating words from {source_language}")
-        for word in words_to_translate:
-            word_lower = word.lower()
-            if word_lower in fallback_translations:
-                translations[word] = fallback_translations[word_lower]
-                # Cache the result
-                cache_key = f"{word}_{source_language}_tr"
-                word_translation_cache[cache_key] = fallback_translations[word_lower]
+def _parse_translation_lines(result: str) -> Dict[str, str]:
+    """
+    Parse 'word: translation' lines returned by Gemini
 
-        return translations  # Return what we have so far
+    Args:
+        result: The raw response text
 
-def process_text_with_translations(text: str, language: str) -> str:
+    Returns:
+        Dictionary mapping original words to their translations, in response order
     """
-    Process text to add Turkish translations for truly uncommon words
-    Only translates words that are genuinely difficult for beginners
-    Places all translations at the very end of the response
-    Removes any existing 'wort schatz' sections from the text
+    translations = {}
+    for line in result.split('\n'):
+        if ':' in line:
+            original, translation = line.split(':', 1)
+            original = original.strip()
+            translation = translation.strip()
+            if original and translation:
+                translations[original] = translation
+    return translations
+
+def identify_and_translate_words(sentences: List[str], language: str, stats: Optional[Dict[str, int]] = None,
+                                 chat_id: Optional[int] = None) -> Optional[Dict[str, str]]:
+    """
+    Identify and translate the uncommon words of several sentences with a single Gemini call
 
     Args:
-        text: The text to process
-        language: The language of the text
+        sentences: The sentences to analyze
+        language: The language of the sentences
+        stats: Optional dictionary used to count Gemini calls
+        chat_id: Optional chat whose already learned words are skipped
 
     Returns:
-        Text with Turkish translations added for uncommon words only at the end
+        Dictionary mapping uncommon words to their Turkish translations,
+        or None if the batched request failed and the caller should fall back
     """
-    # Skip if the text is already in Turkish
-    if language.lower() == "turkish":
-        return text
+    # Collect the deduplicated candidate words of all sentences, preserving order
+    unique_words = []
+    seen = set()
+    for sentence in sentences:
+        for word in re.findall(r'\b\w+\b', sentence.lower()):
+            if word not in seen and len(word) > 2:
+                seen.add(word)
+                unique_words.append(word)
+
+    # Skip the words this learner has already been shown often enough
+    if chat_id is not None:
+        unique_words = vocabulary_ledger.filter_known(chat_id, unique_words, language)
+
+    # Drop A1 words locally, the CEFR index already knows the remaining harder words
+    _, known_uncommon_words, unseen_words = cefr_index.classify_words(unique_words, language)
+
+    # Words with a stored translation were judged uncommon before and need no request
+    translations = translation_store.get_many(known_uncommon_words + unseen_words, language)
+    # Words in the local dictionary are curated vocabulary and need no request either
+    translations.update(local_dictionary.lookup_many(
+        [word for word in known_uncommon_words + unseen_words if word not in translations], language))
+    known_uncommon_words = [word for word in known_uncommon_words if word not in translations]
+    unseen_words = [word for word in unseen_words if word not in translations]
+
+    # Words Gemini already judged not uncommon need no request either
+    unseen_words = negative_cache.filter_unknown(unseen_words, language)
+
+    # Long texts are split into word batches that are requested concurrently
+    if not known_uncommon_words and not unseen_words:
+        # No words are left to analyze, there is nothing more to translate
+        new_translations = {}
+    elif len(known_uncommon_words) + len(unseen_words) > config.GLOSSARY_BATCH_WORDS:
+        new_translations = _request_translations_parallel(known_uncommon_words, unseen_words, language, stats)
+    else:
+        new_translations = _request_translations(known_uncommon_words, unseen_words, language, stats)
+
+    if new_translations is None:
+        return None
+    translations.update(new_translations)
+
+    # List the words in the order they appear in the text
+    position = {word: index for index, word in enumerate(unique_words)}
+    return dict(sorted(translations.items(), key=lambda item: position.get(item[0].lower(), len(position))))
+
+def _request_translations(known_uncommon_words: List[str], unseen_words: List[str], language: str,
+                          stats: Optional[Dict[str, int]] = None) -> Optional[Dict[str, str]]:
+    """
+    Ask Gemini to translate the known uncommon words and to pick and translate the uncommon candidate words
+
+    Args:
+        known_uncommon_words: Words that are always translated
+        unseen_words: Candidate words Gemini decides about
+        language: The language of the words
+        stats: Optional dictionary used to count Gemini calls
+
+    Returns:
+        Dictionary mapping the selected words to their Turkish translations,
+        or None if the request failed
+    """
+    requested = {word.lower() for word in known_uncommon_words + unseen_words}
 
     try:
-        # Use a more comprehensive approach to clean the text
-        # Split the text into lines
-        lines = text.split('\n')
-        cleaned_lines = []
-
-        # Process each line
-        i = 0
-        while i < len(lines):
-            line = lines[i].strip()
-
-            # Skip 'wort schatz' lines and their associated translations
-            if line.lower() == 'wort schatz':
-                # Skip this line and any following translation lines (format: word = translation)
-                i += 1
-                while i < len(lines) and '=' in lines[i]:
-                    i += 1
+        prompt = f"""
+        Translate the following {language} words to Turkish.
+
+        Words to always translate: {', '.join(known_uncommon_words) if known_uncommon_words else 'NONE'}
+
+        Candidate words: {', '.join(unseen_words) if unseen_words else 'NONE'}
+
+        From the candidate words, translate ONLY the words that might be challenging for someone with A1 (beginner) language level.
+
+        Respond with ONLY the words and their translations in the following format:
+        original_word1: translation1
+        original_word2: translation2
+        ...
+
+        If there are no words to translate, respond with "NONE".
+
+        Be INCLUSIVE in your selection of candidate words - include technical or specialized terms, abstract concepts, words with nuanced meanings,
+        longer words or words with unusual spelling, and words that are less frequently used in everyday conversation (even if they're A2 level).
+        DO NOT include words that are among the 100-200 most basic words in {language} (like pronouns, basic verbs, numbers 1-10).
+
+        Keep the translations simple and appropriate for A1 (beginner) level.
+        """
+
+        response = _generate_word_content(prompt, config.WORD_TRANSLATION_BATCH_MAX_OUTPUT_TOKENS, stats)
+        result = _get_response_text(response)
+
+        if result is None:
+            return None
+
+        if result.upper() == "NONE":
+            negative_cache.add_many(unseen_words, language)
+            return {}
+
+        finished = _reply_finished(response)
+        if not finished:
+            # The reply hit the output limit: its last line may be cut off in the middle of a translation
+            logger.warning(f"Batched translation reply for {language} was cut off, not caching the words it left out")
+            result = result.rsplit('\n', 1)[0] if '\n' in result else ""
+
+        # Only keep translations for words that were actually requested
+        parsed_translations = _parse_translation_lines(result)
+        new_translations = {}
+        for original, translation in parsed_translations.items():
+            if original.lower() in requested:
+                new_translations[original] = translation
+
+        # Remember the candidate words Gemini left out as not uncommon (only if the answer was well-formed and complete)
+        if parsed_translations and finished:
+            translated = {word.lower() for word in new_translations}
+            negative_cache.add_many([word for word in unseen_words if word not in translated], language)
+
+        # Store the results
+        translation_store.put_many(new_translations, language)
+
+        return new_translations
+    except Exception as e:
+        logger.error(f"Error in batched word identification and translation: {e}")
+        return None
+
+def _request_translations_parallel(known_uncommon_words: List[str], unseen_words: List[str], language: str,
+                                   stats: Optional[Dict[str, int]] = None) -> Optional[Dict[str, str]]:
+    """
+    Split the words of a long text into batches and request them concurrently
+
+    At most GLOSSARY_MAX_IN_FLIGHT batches are requested at once. Batches that
+    haven't finished GLOSSARY_DEADLINE seconds after the start are left out,
+    and the results of the others are merged in batch order.
+
+    Args:
+        known_uncommon_words: Words that are always translated
+        unseen_words: Candidate words Gemini decides about
+        language: The language of the words
+        stats: Optional dictionary that receives 'gemini_calls', 'batches' and 'batches_missed'
+
+    Returns:
+        Dictionary mapping the selected words to their Turkish translations,
+        or None if every batch failed
+    """
+    # Keep the known and candidate words of each batch apart, as in a single request
+    words = [(word, True) for word in known_uncommon_words] + [(word, False) for word in unseen_words]
+    batches = [words[i:i + config.GLOSSARY_BATCH_WORDS] for i in range(0, len(words), config.GLOSSARY_BATCH_WORDS)]
+    batch_stats = [{"gemini_calls": 0} for _ in batches]
+
+    futures = [
+        glossary_batch_executor.submit(
+            _request_translations,
+            [word for word, known in batch if known],
+            [word for word, known in batch if not known],
+            language,
+            batch_stats[index]
+        )
+        for index, batch in enumerate(batches)
+    ]
+
+    # Wait for the batches until the deadline, then drop the ones still queued
+    done, not_done = concurrent.futures.wait(futures, timeout=config.GLOSSARY_DEADLINE)
+    for future in not_done:
+        future.cancel()
+
+    translations = {}
+    failed = 0
+    for future in futures:
+        result = future.result() if future in done else None
+        if result is None:
+            failed += 1
+            continue
+        for word, translation in result.items():
+            translations.setdefault(word, translation)
+
+    if stats is not None:
+        stats["gemini_calls"] = stats.get("gemini_calls", 0) + sum(batch["gemini_calls"] for batch in batch_stats)
+        stats["batches"] = len(batches)
+        stats["batches_missed"] = failed
+
+    logger.info(f"Requested {len(words)} words in {len(batches)} parallel batches, {len(not_done)} missed the deadline, {failed - len(not_done)} failed")
+
+    # Let the caller fall back only if no batch succeeded in time
+    if failed == len(batches) and not not_done:
+        return None
+    return translations
+
+def _translate_per_sentence(sentences: List[str], language: str, stats: Optional[Dict[str, int]] = None,
+                            chat_id: Optional[int] = None) -> Dict[str, str]:
+    """
+    Identify and translate uncommon words sentence by sentence (two Gemini calls per sentence)
+
+    Args:
+        sentences: The sentences to analyze
+        language: The language of the sentences
+        stats: Optional dictionary used to count Gemini calls
+        chat_id: Optional chat whose already learned words are skipped
+
+    Returns:
+        Dictionary mapping uncommon words to their Turkish translations
+    """
+    all_translations = {}
+
+    # Process each sentence to find uncommon words and their translations
+    for sentence in sentences:
+        try:
+            # Identify uncommon words in the sentence
+            uncommon_words = identify_uncommon_words(sentence, language, stats, chat_id)
+
+            # If no uncommon words, continue to next sentence
+            if not uncommon_words:
                 continue
 
-            # Skip lines that end with 'wort schatz' and the following line if it contains '='
-            if line.lower().endswith('wort schatz'):
-                i += 1
-                if i < len(lines) and '=' in lines[i]:
-                    i += 1
+            # Translate uncommon words to Turkish
+            translations = translate_words(uncommon_words, language, stats)
+
+            # If no translations were found, continue to next sentence
+            if not translations:
                 continue
 
-            # Skip standalone translation lines (format: word = translation)
-            if '=' in line and len(line.split('=')) == 2:
-                word_part = line.split('=')[0].strip().lower()
-                # Check if this looks like a translation line
-                if len(word_part) > 0 and not line.startswith('*') and not line.startswith('-'):
-                    i += 1
-                    continue
+            # Add translations to the collection
+            for word, translation in translations.items():
+                # Only include translations for words that were identified as uncommon
+                if word.lower() in [w.lower() for w in uncommon_words]:
+                    all_translations[word] = translation
 
-            # Add the line to our cleaned lines
-            cleaned_lines.append(line)
-            i += 1
+        except Exception as sentence_error:
+            logger.error(f"Error processing sentence for translations: {sentence_error}")
+            continue  # Continue to the next sentence on error
+
+    return all_translations
 
-        # Rejoin the cleaned lines
-        cleaned_text = '\n'.join(cleaned_lines)
+def remove_glossary_sections(text: str) -> str:
+    """
+    Remove any existing 'wort schatz' sections and translation lines from the text
 
-        # Split text into sentences for processing
-        sentences = re.split(r'(?<=[.!?])\s+', cleaned_text)
+    Args:
+        text: The text to clean
 
-        # Collect all translations
-        all_translations = {}
+    Returns:
+        The cleaned text
+    """
+    # Split the text into lines
+    lines = text.split('\n')
+    cleaned_lines = []
+
+    # Process each line
+    i = 0
+    while i < len(lines):
+        line = lines[i].strip()
+
+        # Skip 'wort schatz' lines and their associated translations
+        if line.lower() == 'wort schatz':
+            # Skip this line and any following translation lines (format: word = translation)
+            i += 1
+            while i < len(lines) and '=' in lines[i]:
+                i += 1
+            continue
+
+        # Skip lines that end with 'wort schatz' and the following line if it contains '='
+        if line.lower().endswith('wort schatz'):
+            i += 1
+            if i < len(lines) and '=' in lines[i]:
+                i += 1
+            continue
 
-        # Process each sentence to find uncommon words and their translations
-        for sentence in sentences:
-            # Skip empty sentences
-            if not sentence.strip():
+        # Skip standalone translation lines (format: word = translation)
+        if '=' in line and len(line.split('=')) == 2:
+            word_part = line.split('=')[0].strip().lower()
+            # Check if this looks like a translation line
+            if len(word_part) > 0 and not line.startswith('*') and not line.startswith('-'):
+                i += 1
                 continue
 
-            try:
-                # Identify uncommon words in the sentence
-                uncommon_words = identify_uncommon_words(sentence, language)
+        # Add the line to our cleaned lines
+        cleaned_lines.append(line)
+        i += 1
 
-                # If no uncommon words, continue to next sentence
-                if not uncommon_words:
-                    continue
+    # Rejoin the cleaned lines
+    return '\n'.join(cleaned_lines)
 
-                # Translate uncommon words to Turkish
-                translations = translate_words(uncommon_words, language)
+def build_glossary(text: str, language: str, stats: Optional[Dict[str, int]] = None,
+                   chat_id: Optional[int] = None) -> Dict[str, str]:
+    """
+    Find the uncommon words of an already cleaned text and translate them to Turkish
 
-                # If no translations were found, continue to next sentence
-                if not translations:
-                    continue
+    Uses a single batched Gemini request when WORD_TRANSLATION_BATCH_MODE is enabled
+    and falls back to the per-sentence pipeline if that request fails. When a
+    chat_id is given, words the learner has already been shown VOCAB_SKIP_AFTER_SEEN
+    times recently are skipped and the glossed words are recorded in their ledger.
 
-                # Add translations to the collection
-                for word, translation in translations.items():
-                    # Only include translations for words that were identified as uncommon
-                    if word.lower() in [w.lower() for w in uncommon_words]:
-                        all_translations[word] = translation
+    Args:
+        text: The cleaned text to analyze
+        language: The language of the text
+        stats: Optional dictionary that receives 'gemini_calls', 'mode' and 'sentences'
+        chat_id: Optional chat whose vocabulary ledger is consulted and updated
+
+    Returns:
+        Dictionary mapping uncommon words to their Turkish translations
+    """
+    if stats is None:
+        stats = {}
+    stats.setdefault("gemini_calls", 0)
 
-            except Exception as sentence_error:
-                logger.error(f"Error processing sentence for translations: {sentence_error}")
-                continue  # Continue to the next sentence on error
+    # Split text into sentences for processing, skipping empty ones
+    sentences = [sentence for sentence in re.split(r'(?<=[.!?])\s+', text) if sentence.strip()]
+    stats["sentences"] = len(sentences)
 
-        # If no translations were found, return the cleaned text
-        if not all_translations:
-            return cleaned_text
+    translations = None
+    if config.WORD_TRANSLATION_BATCH_MODE:
+        stats["mode"] = "batch"
+        translations = identify_and_translate_words(sentences, language, stats, chat_id)
+        if translations is None:
+            logger.info("Batched translation request failed, falling back to per-sentence translation")
 
-        # Format the final response with all translations at the end
-        result = cleaned_text
+    if translations is None:
+        stats["mode"] = "per_sentence"
+        translations = _translate_per_sentence(sentences, language, stats, chat_id)
+
+    # Remember what this learner has been shown
+    if chat_id is not None and translations:
+        vocabulary_ledger.record(chat_id, translations, language)
 
-        # Add a section for all translations at the end
-        result += "\n\nwort schatz"
-        for word, translation in all_translations.items():
-            result += f"\n{word} = {translation}"
+    return translations
 
-        # Add emoji to the last translation for a friendly touch
-        if all_translations:
-            result += " 😊"
+def append_glossary(text: str, translations: Dict[str, str]) -> str:
+    """
+    Append a 'wort schatz' section with the given translations to the end of the text
+
+    Args:
+        text: The cleaned text
+        translations: Dictionary mapping words to their Turkish translations
+
+    Returns:
+        Text with the translations at the end, or the text unchanged if there are none
+    """
+    if not translations:
+        return text
+
+    # Add a section for all translations at the end
+    return text + "\n\n" + format_glossary(translations)
+
+def format_glossary(translations: Dict[str, str]) -> str:
+    """
+    Format translations as a 'wort schatz' section
+
+    Args:
+        translations: Dictionary mapping words to their Turkish translations
 
-        return result
+    Returns:
+        The 'wort schatz' section
+    """
+    result = "wort schatz"
+    for word, translation in translations.items():
+        result += f"\n{word} = {translation}"
+
+    # Add emoji to the last translation for a friendly touch
+    result += " 😊"
+
+    return result
+
+def process_text_with_translations(text: str, language: str, stats: Optional[Dict[str, int]] = None,
+                                   chat_id: Optional[int] = None) -> str:
+    """
+    Process text to add Turkish translations for truly uncommon words
+    Only translates words that are genuinely difficult for beginners
+    Places all translations at the very end of the response
+    Removes any existing 'wort schatz' sections from the text
+
+    Args:
+        text: The text to process
+        language: The language of the text
+        stats: Optional dictionary that receives the number of Gemini calls used
+        chat_id: Optional chat whose already learned words are left out of the glossary
+
+    Returns:
+        Text with Turkish translations added for uncommon words only at the end
+    """
+    # Skip if the text is already in Turkish
+    if language.lower() == "turkish":
+        return text
+
+    if stats is None:
+        stats = {}
+
+    try:
+        # Remove any glossary the model may have written itself
+        cleaned_text = remove_glossary_sections(text)
+
+        # Collect all translations
+        all_translations = build_glossary(cleaned_text, language, stats, chat_id)
+        logger.info(f"Translation pass used {stats['gemini_calls']} Gemini call(s) in {stats['mode']} mode for {stats['sentences']} sentences")
+
+        # Format the final response with all translations at the end
+        return append_glossary(cleaned_text, all_translations)
     except Exception as e:
         logger.error(f"Error in process_text_with_translations: {e}")
         return text  # Return the original text on error
 
-def post_process_response(response: str, language: str) -> str:
+def post_process_response(response: str, language: str, stats: Optional[Dict[str, int]] = None,
+                          chat_id: Optional[int] = None) -> str:
     """
     Post-process the bot's response to add Turkish translations for all non-Turkish languages
 
     Args:
         response: The bot's response
         language: The detected language
+        stats: Optional dictionary that receives the number of Gemini calls used
+        chat_id: Optional chat whose already learned words are left out of the glossary
 
     Returns:
         Processed response with translations
@@ -585,7 +737,7 @@ def post_process_response(response: str, language: str) -> str:
 
         # Process all non-Turkish languages to add translations
         logger.info(f"Adding Turkish translations for uncommon words in {language} response")
-        processed_response = process_text_with_translations(response, language)
+        processed_response = process_text_with_translations(response, language, stats, chat_id)
 
         # If processing failed and returned None, return the original response
         if processed_response is None:
@@ -596,3 +748,44 @@ def post_process_response(response: str, language: str) -> str:
     except Exception as e:
         logger.error(f"Error in post_process_response: {e}")
         return response  # Return the original response on error
+
+async def post_process_response_async(response: str, language: str, stats: Optional[Dict[str, int]] = None,
+                                      chat_id: Optional[int] = None) -> str:
+    """
+    Non-blocking version of post_process_response for use inside coroutines
+
+    The translation pass runs in the translation thread pool, so at most
+    TRANSLATION_MAX_CONCURRENCY responses are annotated at once and the event
+    loop keeps serving other chats in the meantime.
+
+    Args:
+        response: The bot's response
+        language: The detected language
+        stats: Optional dictionary that receives the number of Gemini calls used
+        chat_id: Optional chat whose already learned words are left out of the glossary
+
+    Returns:
+        Processed response with translations
+    """
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(translation_executor, post_process_response, response, language, stats, chat_id)
+
+async def build_glossary_async(text: str, language: str, stats: Optional[Dict[str, int]] = None,
+                               chat_id: Optional[int] = None) -> Dict[str, str]:
+    """
+    Non-blocking version of build_glossary for two-phase delivery
+
+    Args:
+        text: The cleaned text to analyze
+        language: The language of the text
+        stats: Optional dictionary that receives the number of Gemini calls used
+        chat_id: Optional chat whose vocabulary ledger is consulted and updated
+
+    Returns:
+        Dictionary mapping uncommon words to their Turkish translations (empty for Turkish)
+    """
+    if language.lower() == "turkish" or not text:
+        return {}
+
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(translation_executor, build_glossary, text, language, stats, chat_id)